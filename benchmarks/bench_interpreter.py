@@ -0,0 +1,209 @@
+"""
+Reports interpreter throughput and where the time goes, stage by stage.
+
+    python benchmarks/bench_interpreter.py [--count N] [--names PATH]
+        [--against SPEC] [--repeat N] [--json PATH]
+
+Names come from benchmarks/corpus.py, or one per line from --names. Each
+stage of Interpreter.interpret() is timed by wrapping the method that
+implements it. Whatever is not spent in a stage, such as title cleanup
+and the wrappers themselves, is reported as "other".
+
+--against compares with another Interpreter implementation, given as
+git:REV for the interpreter at a commit, or path/to/file.py:Class. Every
+name must give the same result, and the speed of both is reported.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import defaultdict
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import corpus  # noqa: E402
+from mediascan.interpreter import Interpreter  # noqa: E402
+
+# Interpreter methods timed as stages, in the order interpret() calls them
+STAGES = [
+    "split_extension",
+    "remove_square_brackets",
+    "determine_delimiter",
+    "find_metadata",
+    "find_episode",
+    "find_season",
+    "find_date",
+    "find_year",
+    "clean_title",
+]
+
+
+def instrument(interpreter, totals):
+    """Wraps the stage methods of interpreter to add to totals."""
+    clock = time.perf_counter
+    for stage in STAGES:
+        method = getattr(interpreter, stage, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            start = clock()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                totals[_stage] += clock() - start
+
+        setattr(interpreter, stage, timed)
+
+
+def best_time(interpreter, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            interpreter.interpret(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def stage_times(names, repeat):
+    interpreter = Interpreter()
+    totals = defaultdict(float)
+    instrument(interpreter, totals)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name in names:
+            interpreter.interpret(name)
+    total = time.perf_counter() - start
+    report = {stage: totals[stage] / repeat for stage in STAGES}
+    report["other"] = total / repeat - sum(report.values())
+    return report
+
+
+def load_class(spec: str):
+    """Loads an Interpreter class from git:REV or path/to/file.py:Class."""
+    if spec.startswith("git:"):
+        return _load_from_git(spec[4:])
+    path, _, name = spec.rpartition(":")
+    module_spec = importlib.util.spec_from_file_location(
+        "against_interpreter", path
+    )
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+def _load_from_git(revision: str):
+    archive = subprocess.run(
+        ["git", "archive", revision, "src/mediascan"],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+    ).stdout
+    directory = tempfile.mkdtemp(prefix="mediascan-")
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+    # Import the old package under another name, next to the current one
+    package = os.path.join(directory, "src", "mediascan")
+    name = "mediascan_" + revision.replace("~", "_").replace("^", "_")
+    module_spec = importlib.util.spec_from_file_location(
+        name,
+        os.path.join(package, "__init__.py"),
+        submodule_search_locations=[package],
+    )
+    module = importlib.util.module_from_spec(module_spec)
+    sys.modules[name] = module
+    module_spec.loader.exec_module(module)
+    return importlib.import_module(f"{name}.interpreter").Interpreter
+
+
+def compare(names, against, repeat):
+    current = Interpreter()
+    other = against()
+    mismatches = 0
+    for name in names:
+        expected = other.interpret(name)
+        actual = current.interpret(name)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"Mismatch: {name}", file=sys.stderr)
+                for key in sorted(set(expected) | set(actual)):
+                    if expected.get(key) != actual.get(key):
+                        print(
+                            f"  {key}: {expected.get(key)!r} -> "
+                            f"{actual.get(key)!r}",
+                            file=sys.stderr,
+                        )
+    return {
+        "mismatches": mismatches,
+        "against": len(names) / best_time(other, names, repeat),
+        "current": len(names) / best_time(current, names, repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--names", help="File with one name per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--against",
+        help="Interpreter to compare with: git:REV or path/to/file.py:Class",
+    )
+    parser.add_argument("--json", help="Also write the results to PATH")
+    args = parser.parse_args()
+
+    if args.names:
+        with open(args.names, "r") as f:
+            names = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        names = corpus(args.count, args.seed)
+
+    interpreter = Interpreter()
+    elapsed = best_time(interpreter, names, args.repeat)
+    results = {"names": len(names), "names_per_second": len(names) / elapsed}
+    print(f"{len(names):,} names, {len(names) / elapsed:,.0f} names/s")
+
+    stages = stage_times(names, args.repeat)
+    results["stages"] = stages
+    total = sum(stages.values())
+    print(f"\n{'stage':>24} {'us/name':>9} {'share':>7}")
+    for stage, seconds in sorted(stages.items(), key=lambda s: -s[1]):
+        print(
+            f"{stage:>24} {seconds / len(names) * 1e6:>9.2f} "
+            f"{seconds / total:>7.1%}"
+        )
+
+    if args.against:
+        comparison = compare(names, load_class(args.against), args.repeat)
+        results["comparison"] = comparison
+        print(
+            f"\n{args.against}: {comparison['against']:,.0f} names/s, "
+            f"current: {comparison['current']:,.0f} names/s "
+            f"({comparison['current'] / comparison['against']:.2f}x), "
+            f"{comparison['mismatches']} mismatches"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.against and results["comparison"]["mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Times each stage of a scan over generated media trees.
+
+    python benchmarks/bench_scan.py [--entries N ...] [--output PATH]
+        [--compare PATH]
+
+For every tree size, a synthetic input tree is generated with realistic
+release names, nested download folders, sidecar files, samples and sparse
+video files of realistic apparent size. The walk, classify, interpret and
+plan stages are timed over the whole tree. The act stage is timed for
+every action on a smaller tree of --act-files files, so copies stay cheap.
+Results are written as JSON, tagged with the current commit, and can be
+compared with an earlier run using --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mediascan.logging import logger  # noqa: E402
+from mediascan.mediascan import MediaScan  # noqa: E402
+from mediascan.planner import Planner  # noqa: E402
+from mediascan.walker import walk  # noqa: E402
+
+ACTIONS = ["symlink", "link", "copy", "move"]
+
+WORDS = (
+    "the last dark night city blue river house star wars lost empire "
+    "silent hill breaking bad office crown north winter dragon secret "
+    "garden iron man planet earth doctor who black mirror"
+).split()
+RESOLUTIONS = ["480p", "720p", "1080p", "2160p"]
+SOURCES = ["BluRay", "WEB-DL", "WEBRip", "HDTV", "DVDRip", "BDRip"]
+VIDEO_CODECS = ["x264", "x265", "H.264", "HEVC", "XviD"]
+AUDIO_CODECS = ["AAC", "DTS", "AC3", "DDP5.1", "FLAC"]
+GROUPS = ["SPARKS", "NTb", "RARBG", "FLUX", "MeGusta", "YIFY"]
+VIDEO_EXTENSIONS = ["mkv", "mkv", "mkv", "mp4", "avi"]
+SIDECARS = ["nfo", "srt", "txt", "jpg", "sfv"]
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+class TreeGenerator:
+    """
+    Writes a deterministic tree of release folders below root.
+
+    About half of the entries are videos, split between movies, episodes
+    in season packs and dated shows, and a small share of audio. The rest
+    are sidecar files, samples and subtitles. Files are sparse, so large
+    trees cost little disk space.
+    """
+
+    def __init__(self, seed: int = 0, video_size=(200 * MB, 30 * GB)):
+        self.random = random.Random(seed)
+        self.video_size = video_size
+
+    def title(self, separator: str) -> str:
+        count = self.random.randint(1, 4)
+        words = self.random.sample(WORDS, count)
+        return separator.join(word.capitalize() for word in words)
+
+    def tags(self, separator: str) -> str:
+        tags = [self.random.choice(RESOLUTIONS)]
+        if self.random.random() < 0.8:
+            tags.append(self.random.choice(SOURCES))
+        if self.random.random() < 0.4:
+            tags.append(self.random.choice(AUDIO_CODECS))
+        tags.append(self.random.choice(VIDEO_CODECS))
+        return separator.join(tags) + f"-{self.random.choice(GROUPS)}"
+
+    def release(self):
+        """Returns a release folder name and the video names inside it."""
+        separator = self.random.choice([".", ".", " ", "_"])
+        title = self.title(separator)
+        tags = self.tags(separator)
+        kind = self.random.random()
+        if kind < 0.5:
+            year = self.random.randint(1950, 2024)
+            name = f"{title}{separator}{year}{separator}{tags}"
+            return name, [name]
+        if kind < 0.9:
+            season = self.random.randint(1, 12)
+            episodes = self.random.randint(1, 12)
+            folder = f"{title}{separator}S{season:02d}{separator}{tags}"
+            return folder, [
+                f"{title}{separator}S{season:02d}E{episode:02d}"
+                f"{separator}{tags}"
+                for episode in range(1, episodes + 1)
+            ]
+        date = f"20{self.random.randint(10, 24)}{separator}"
+        date += f"{self.random.randint(1, 12):02d}{separator}"
+        date += f"{self.random.randint(1, 28):02d}"
+        name = f"{title}{separator}{date}{separator}{tags}"
+        return name, [name]
+
+    def generate(self, root: Path, entries: int) -> int:
+        """Writes about entries files below root, returning the count."""
+        count = 0
+        batch = 0
+        while count < entries:
+            # Downloads arrive in batches, nested a few levels deep
+            parent = root
+            for _ in range(self.random.randint(0, 3)):
+                parent = parent / f"batch-{batch % 97:02d}"
+                batch += 1
+            folder, videos = self.release()
+            directory = parent / folder
+            directory.mkdir(parents=True, exist_ok=True)
+
+            extension = self.random.choice(VIDEO_EXTENSIONS)
+            for video in videos:
+                size = self.random.randint(*self.video_size)
+                self._touch(directory / f"{video}.{extension}", size)
+                count += 1
+            if self.random.random() < 0.3:
+                self._touch(directory / f"sample.{extension}", 20 * MB)
+                count += 1
+            if self.random.random() < 0.05:
+                audio = directory / "Soundtrack" / "01 - Theme.flac"
+                audio.parent.mkdir(exist_ok=True)
+                self._touch(audio, 30 * MB)
+                count += 1
+            for sidecar in self.random.sample(
+                SIDECARS, self.random.randint(0, 3)
+            ):
+                self._touch(directory / f"{folder}.{sidecar}", 4096)
+                count += 1
+        return count
+
+    @staticmethod
+    def _touch(path: Path, size: int):
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def stage(seconds: float, items: int) -> dict:
+    return {
+        "seconds": round(seconds, 6),
+        "items": items,
+        "rate": round(items / seconds, 1) if seconds else None,
+    }
+
+
+def scanner(input_path: Path, output_dir: Path, **kwargs) -> MediaScan:
+    return MediaScan(
+        input_path=str(input_path),
+        output_dir=str(output_dir),
+        interpret_cache_size=0,
+        prefer_existing_folders=False,
+        **kwargs,
+    )
+
+
+def bench_tree(work: Path, entries: int, args) -> dict:
+    input_path = work / "input"
+    input_path.mkdir()
+    seconds, files = timed(
+        lambda: TreeGenerator(args.seed).generate(input_path, entries)
+    )
+    print(f"Generated {files:,} files in {seconds:.1f}s", file=sys.stderr)
+
+    media_scan = scanner(input_path, work / "output", workers=args.workers)
+    results = {"files": files}
+
+    extensions = media_scan._candidate_extensions()
+    seconds, records = timed(lambda: list(walk(input_path, extensions)))
+    results["walk"] = stage(seconds, len(records))
+
+    seconds, media = timed(
+        lambda: [r for r in records if media_scan._is_media_record(r)]
+    )
+    results["classify"] = stage(seconds, len(records))
+
+    names = [media_scan._relative_name(Path(r.path)) for r in media]
+    interpreter = media_scan.interpreter
+    seconds, _ = timed(
+        lambda: list(interpreter.interpret_many(names, args.workers))
+    )
+    results["interpret"] = stage(seconds, len(names))
+
+    seconds, plan = timed(
+        lambda: list(Planner(media_scan, args.workers).plan())
+    )
+    results["plan"] = stage(seconds, len(plan))
+
+    results["act"] = bench_actions(work, args)
+    return results
+
+
+def bench_actions(work: Path, args) -> dict:
+    results = {}
+    for action in ACTIONS:
+        # Moves use up their input, so every action gets a fresh tree
+        input_path = work / f"act-{action}"
+        output_dir = work / f"act-{action}-output"
+        input_path.mkdir()
+        TreeGenerator(args.seed, (args.act_size, args.act_size)).generate(
+            input_path, args.act_files
+        )
+        media_scan = scanner(
+            input_path,
+            output_dir,
+            action=action,
+            min_video_size=min(args.act_size, 100 * MB),
+            workers=args.workers,
+        )
+        plan = [
+            entry
+            for entry in Planner(media_scan).plan()
+            if entry.action == action
+        ]
+        seconds, _ = timed(lambda: media_scan.scan(plan=plan))
+        results[action] = stage(seconds, len(plan))
+        shutil.rmtree(input_path)
+        shutil.rmtree(output_dir)
+    return results
+
+
+def git_revision() -> dict:
+    def git(*command):
+        return subprocess.run(
+            ["git", *command],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def compare(previous: dict, current: dict):
+    """Prints the change in rate of every stage present in both runs."""
+    print(
+        f"{'stage':>24} {'before':>12} {'after':>12} {'change':>8}",
+        file=sys.stderr,
+    )
+    for size, stages in current["trees"].items():
+        before = previous.get("trees", {}).get(size)
+        if before is None:
+            continue
+        rows = [(name, stages[name], before.get(name)) for name in stages]
+        rows += [
+            (f"act/{action}", result, before.get("act", {}).get(action))
+            for action, result in stages.get("act", {}).items()
+        ]
+        for name, after, old in rows:
+            if not isinstance(after, dict) or "rate" not in after:
+                continue
+            if not old or not old.get("rate") or not after["rate"]:
+                continue
+            change = after["rate"] / old["rate"] - 1
+            print(
+                f"{size + '/' + name:>24} {old['rate']:>12,.0f} "
+                f"{after['rate']:>12,.0f} {change:>+8.1%}",
+                file=sys.stderr,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--entries",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+        help="Tree sizes to benchmark, e.g. 1000 100000 1000000",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--act-files",
+        type=int,
+        default=200,
+        help="Files in the tree used to time each action",
+    )
+    parser.add_argument(
+        "--act-size",
+        type=int,
+        default=MB,
+        help="Size in bytes of each file in the action tree",
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="Where to generate trees (default: a temporary directory)",
+    )
+    parser.add_argument("--output", help="Write results as JSON to PATH")
+    parser.add_argument(
+        "--compare", help="Print the change against earlier JSON results"
+    )
+    args = parser.parse_args()
+
+    logger.remove()
+
+    results = {
+        **git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": args.workers,
+        "trees": {},
+    }
+    for entries in args.entries:
+        work = Path(tempfile.mkdtemp(prefix="mediascan-", dir=args.work_dir))
+        try:
+            results["trees"][str(entries)] = bench_tree(work, entries, args)
+        finally:
+            shutil.rmtree(work)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Times how long the mediascan command takes to start.
+
+    python benchmarks/bench_startup.py [--repeat N] [--imports N]
+        [--output PATH] [--compare PATH]
+
+Each case runs in a fresh interpreter, as a download client's completion
+hook would: importing the package, printing --help, and organizing a
+single file into an empty library. The best and median of --repeat runs
+are reported. --imports lists the modules slowest to import, from
+python -X importtime, for the single-file case.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_scan import git_revision
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+
+def cases(work: str) -> dict:
+    source = os.path.join(work, "Movie.Title.2001.1080p.BluRay.x264.mkv")
+    with open(source, "wb") as f:
+        f.truncate(200 * 1024 * 1024)
+    command = [
+        "-m",
+        "mediascan",
+        "--config",
+        os.path.join(work, "missing.yaml"),
+        "--quiet",
+    ]
+    return {
+        "import": ["-c", "import mediascan"],
+        "help": command + ["--help"],
+        "single_file": command
+        + [source, "--output-dir", os.path.join(work, "library")],
+    }
+
+
+def run(arguments, work: str) -> float:
+    # Every run starts from an empty library
+    shutil.rmtree(os.path.join(work, "library"), ignore_errors=True)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *arguments],
+        env={**os.environ, "PYTHONPATH": SRC},
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def slowest_imports(arguments, work: str, count: int) -> list:
+    shutil.rmtree(os.path.join(work, "library"), ignore_errors=True)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        env={**os.environ, "PYTHONPATH": SRC},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative), name.strip()))
+    imports.sort(reverse=True)
+    return [
+        {"module": name, "ms": round(micros / 1000, 1)}
+        for micros, name in imports[:count]
+    ]
+
+
+def compare(previous: dict, current: dict):
+    print(
+        f"{'case':>12} {'before':>9} {'after':>9} {'change':>8}",
+        file=sys.stderr,
+    )
+    for name, result in current["cases"].items():
+        old = previous.get("cases", {}).get(name)
+        if not old:
+            continue
+        change = result["best_ms"] / old["best_ms"] - 1
+        print(
+            f"{name:>12} {old['best_ms']:>7.1f}ms {result['best_ms']:>7.1f}ms "
+            f"{change:>+8.1%}",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--imports",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Also list the N slowest imports of the single file case",
+    )
+    parser.add_argument("--output", help="Write results as JSON to PATH")
+    parser.add_argument(
+        "--compare", help="Print the change against earlier JSON results"
+    )
+    args = parser.parse_args()
+
+    results = {**git_revision(), "python": sys.version.split()[0]}
+    results["cases"] = {}
+    work = tempfile.mkdtemp(prefix="mediascan-")
+    try:
+        for name, arguments in cases(work).items():
+            times = [run(arguments, work) for _ in range(args.repeat)]
+            results["cases"][name] = {
+                "best_ms": round(min(times) * 1000, 1),
+                "median_ms": round(statistics.median(times) * 1000, 1),
+            }
+            print(
+                f"{name:>12} best {min(times) * 1000:7.1f}ms, "
+                f"median {statistics.median(times) * 1000:7.1f}ms",
+                file=sys.stderr,
+            )
+        if args.imports:
+            arguments = cases(work)["single_file"]
+            results["imports"] = slowest_imports(arguments, work, args.imports)
+            for entry in results["imports"]:
+                print(
+                    f"{entry['ms']:>9.1f}ms {entry['module']}", file=sys.stderr
+                )
+    finally:
+        shutil.rmtree(work)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares single-pass metadata tokenizing with searching each metadata
+pattern separately.
+
+    python benchmarks/bench_tokenizer.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mediascan.interpreter import Interpreter  # noqa: E402
+
+EXAMPLES_PATH = os.path.join(ROOT, "tests", "examples.jsonl")
+
+
+def per_pattern(interpreter, name):
+    return {
+        "source": interpreter.find_source(name),
+        "language": interpreter.find_language(name),
+        "resolution": interpreter.find_resolution(name),
+        "audio_codec": interpreter.find_audio_codec(name),
+        "video_codec": interpreter.find_video_codec(name),
+        "proper": interpreter.is_proper_or_repack(name),
+    }
+
+
+def single_pass(interpreter, name):
+    return interpreter.find_metadata(name)
+
+
+def bench(function, interpreter, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            function(interpreter, name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(EXAMPLES_PATH, "r") as f:
+        names = [json.loads(line)["name"] for line in f]
+
+    interpreter = Interpreter()
+    for name in names:
+        if per_pattern(interpreter, name) != single_pass(interpreter, name):
+            print(f"Mismatch: {name}")
+            sys.exit(1)
+
+    results = {}
+    for function in [per_pattern, single_pass]:
+        elapsed = bench(function, interpreter, names, args.repeat)
+        results[function.__name__] = len(names) / elapsed
+        print(
+            f"{function.__name__:>12}: {len(names) / elapsed:>10,.0f} "
+            f"names/s"
+        )
+    speedup = results["single_pass"] / results["per_pattern"]
+    print(f"{'speedup':>12}: {speedup:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Generates a deterministic corpus of release names for benchmarking the
+interpreter.
+
+    python benchmarks/corpus.py [--count N] [--seed N] > names.txt
+
+Names mix the real examples from tests/examples.jsonl with generated
+movies, episodes, season packs, dated shows and anime releases in
+every delimiter style, with and without extensions, brackets, years in
+parentheses, languages and proper/repack tags.
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_PATH = os.path.join(ROOT, "tests", "examples.jsonl")
+
+WORDS = (
+    "the a of and last dark night city blue river house star wars lost "
+    "empire silent hill breaking bad office crown north winter dragon "
+    "secret garden iron man planet earth doctor who black mirror love "
+    "island game thrones street kings queen stranger things true "
+    "detective mr robot fargo westworld chernobyl succession ozark "
+    "expanse boys mandalorian witcher sopranos wire friends seinfeld"
+).split()
+RESOLUTIONS = ["480p", "576p", "720p", "1080p", "1080i", "2160p", "4K"]
+SOURCES = (
+    "BluRay BDRip BRRip WEB-DL WEBRip WEB HDTV DVDRip HDRip AMZN.WEB-DL "
+    "NF.WEBRip REMUX"
+).split()
+VIDEO_CODECS = ["x264", "x265", "H.264", "H264", "HEVC", "XviD", "AVC"]
+AUDIO_CODECS = "AAC AAC2.0 DTS DTS-HD.MA AC3 DDP5.1 TrueHD".split()
+LANGUAGES = ["FRENCH", "GERMAN", "iTALiAN", "SPANiSH", "MULTi", "SWESUB"]
+TAGS = ["PROPER", "REPACK", "EXTENDED", "UNRATED", "REMASTERED", "iNTERNAL"]
+GROUPS = (
+    "SPARKS NTb RARBG FLUX MeGusta YIFY LOL DIMENSION EVO TGx CAKES GECKOS "
+    "playWEB NOGRP"
+).split()
+EXTENSIONS = ["", "", ".mkv", ".mkv", ".mp4", ".avi", ".m4v"]
+DELIMITERS = [".", ".", ".", " ", "_", "-"]
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def title(self) -> List[str]:
+        words = self.random.sample(WORDS, self.random.randint(1, 5))
+        return [word.capitalize() for word in words]
+
+    def metadata(self) -> List[str]:
+        choice = self.random.choice
+        tokens = []
+        if self.random.random() < 0.1:
+            tokens.append(choice(TAGS))
+        if self.random.random() < 0.1:
+            tokens.append(choice(LANGUAGES))
+        if self.random.random() < 0.9:
+            tokens.append(choice(RESOLUTIONS))
+        if self.random.random() < 0.8:
+            tokens.append(choice(SOURCES))
+        if self.random.random() < 0.4:
+            tokens.append(choice(AUDIO_CODECS))
+        if self.random.random() < 0.8:
+            tokens.append(choice(VIDEO_CODECS))
+        return tokens
+
+    def marker(self) -> List[str]:
+        """Returns the tokens saying which movie or episode this is."""
+        kind = self.random.random()
+        season = self.random.randint(1, 30)
+        episode = self.random.randint(1, 30)
+        year = self.random.randint(1920, 2025)
+        if kind < 0.35:
+            if self.random.random() < 0.2:
+                return [f"({year})"]
+            return [str(year)]
+        if kind < 0.7:
+            marker = f"S{season:02d}E{episode:02d}"
+            if self.random.random() < 0.1:
+                marker += f"E{episode + 1:02d}"
+            if self.random.random() < 0.2:
+                return [str(year), marker]
+            return [marker]
+        if kind < 0.8:
+            return [f"S{season:02d}"]
+        if kind < 0.85:
+            return [f"{season}x{episode:02d}"]
+        if kind < 0.95:
+            month = self.random.randint(1, 12)
+            day = self.random.randint(1, 28)
+            return [f"{year}", f"{month:02d}", f"{day:02d}"]
+        return [f"Season {season}", f"Episode {episode}"]
+
+    def anime(self) -> str:
+        title = " ".join(self.title())
+        episode = self.random.randint(1, 500)
+        group = self.random.choice(GROUPS)
+        resolution = self.random.choice(RESOLUTIONS)
+        extension = self.random.choice(EXTENSIONS)
+        return f"[{group}] {title} - {episode:02d} [{resolution}]{extension}"
+
+    def name(self) -> str:
+        if self.random.random() < 0.05:
+            return self.anime()
+
+        delimiter = self.random.choice(DELIMITERS)
+        tokens = self.title() + self.marker() + self.metadata()
+        name = delimiter.join(tokens)
+        if self.random.random() < 0.85:
+            name += f"-{self.random.choice(GROUPS)}"
+        if self.random.random() < 0.1:
+            name += f"[{self.random.choice(['TGx', 'rarbg', 'eztv'])}]"
+        return name + self.random.choice(EXTENSIONS)
+
+    def generate(self, count: int) -> List[str]:
+        return [self.name() for _ in range(count)]
+
+
+def load_examples() -> List[str]:
+    with open(EXAMPLES_PATH, "r") as f:
+        return [json.loads(line)["name"] for line in f]
+
+
+def corpus(count: int = 30000, seed: int = 0) -> List[str]:
+    """Real examples first, then generated names up to count."""
+    names = load_examples()[:count]
+    return names + CorpusGenerator(seed).generate(count - len(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name in corpus(args.count, args.seed):
+        print(name)
+
+
+if __name__ == "__main__":
+    main()
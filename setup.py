@@ -29,12 +29,11 @@ setup(
         "License :: CC0 1.0 Universal (CC0 1.0) Public Domain Dedication",
         "Operating System :: OS Independent",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
     ],
-    python_requires=">=3.7",
+    python_requires=">=3.8",
     install_requires=[
         "requests",
         "pyyaml",
@@ -46,6 +45,7 @@ setup(
     entry_points={
         "console_scripts": [
             "mediascan=mediascan.__main__:main",
+            "mediascan-client=mediascan.client:main",
         ],
     },
 )
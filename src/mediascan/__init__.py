@@ -1,10 +1,32 @@
-from .interpreter import Interpreter
-from .mediascan import MediaScan
+import importlib
 
-__all__ = ["Interpreter", "MediaScan"]
+# Where each name in __all__ is defined
+_EXPORTS = {
+    "Interpreter": "interpreter",
+    "MediaScan": "mediascan",
+    "PathTemplate": "templates",
+}
+
+__all__ = ["Interpreter", "MediaScan", "PathTemplate"]
 __name__ = "mediascan"
 __version__ = "0.1.6"
 __author__ = "Philip Orange"
 __author_email__ = "git" + "@" + "philiporange.com"
 __description__ = "A Python package for scanning and organizing media files."
 __url__ = "http://github.com/philiporange/mediascan"
+
+
+def __getattr__(name):
+    # Imported on first use, so "import mediascan" stays cheap
+    if name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __package__)
+        return getattr(module, name)
+
+    # Submodules too, as "from mediascan import walker" would otherwise
+    # import them by __name__, which is the distribution name
+    try:
+        return importlib.import_module(f".{name}", __package__)
+    except ModuleNotFoundError as e:
+        if e.name != f"{__package__}.{name}":
+            raise
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
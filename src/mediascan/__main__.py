@@ -1,23 +1,26 @@
 import argparse
 import os
+import signal
 import sys
+import threading
 from pathlib import Path
 
-import yaml
-
-from mediascan.mediascan import MediaScan
 from mediascan.config import Config
-from mediascan.logging import configure_logging
+from mediascan.rules import KINDS
 
 
 def load_config(config_path):
     if os.path.exists(config_path):
+        import yaml
+
         with open(config_path, "r") as f:
             return yaml.safe_load(f)
     return None
 
 
 def save_config(config_path, config):
+    import yaml
+
     with open(config_path, "w") as f:
         yaml.dump(config, f)
 
@@ -33,11 +36,28 @@ def get_default_config():
         "episode_path": Config.EPISODE_PATH,
         "episode_path_no_year": Config.EPISODE_PATH_NO_YEAR,
         "dated_episode_path": Config.DATED_EPISODE_PATH,
+        "sanitize_paths": Config.SANITIZE_PATHS,
         "min_video_size": Config.MIN_VIDEO_SIZE,
         "min_audio_size": Config.MIN_AUDIO_SIZE,
+        "exclude": Config.EXCLUDE,
+        "exclude_patterns": Config.EXCLUDE_PATTERNS,
+        "include_patterns": Config.INCLUDE_PATTERNS,
         "delete_non_media": Config.DELETE_NON_MEDIA,
         "prefer_existing_folders": Config.PREFER_EXISTING_FOLDERS,
+        "directory_context": Config.DIRECTORY_CONTEXT,
         "clean": Config.CLEAN,
+        "index_path": None,
+        "dedup": None,
+        "workers": Config.WORKERS,
+        "executor": Config.EXECUTOR,
+        "interpret_cache_size": Config.INTERPRET_CACHE_SIZE,
+        "interpret_cache_path": None,
+        "transfers": Config.TRANSFERS,
+        "transfers_per_device": Config.TRANSFERS_PER_DEVICE,
+        "large_file_size": Config.LARGE_FILE_SIZE,
+        "bandwidth_limit": Config.BANDWIDTH_LIMIT,
+        "metrics_address": Config.METRICS_ADDRESS,
+        "log_sample_limit": Config.LOG_SAMPLE_LIMIT,
     }
 
 
@@ -64,14 +84,20 @@ def main():
         description="MediaScan - Organize your media files"
     )
     parser.add_argument(
-        "input_path",
-        nargs="?",
-        help="Override input path (file or directory)",
+        "inputs",
+        nargs="*",
+        metavar="input_path",
+        help="Override input paths (files or directories), each directory "
+        "walked by its own process",
     )
     parser.add_argument(
         "--config", default="~/.mediascan.yaml", help="Path to config file"
     )
-    parser.add_argument("--input-path", help="Input path to scan")
+    parser.add_argument(
+        "--input-path",
+        action="append",
+        help="Input path to scan, may be repeated",
+    )
     parser.add_argument(
         "--output-dir", help="Output directory for organized files"
     )
@@ -97,12 +123,38 @@ def main():
     parser.add_argument(
         "--dated-episode-path", help="Path template for dated TV episodes"
     )
+    parser.add_argument(
+        "--sanitize-paths",
+        action="store_true",
+        help="Remove characters invalid in file names from titles",
+    )
     parser.add_argument(
         "--min-video-size", type=int, help="Minimum video file size in bytes"
     )
     parser.add_argument(
         "--min-audio-size", type=int, help="Minimum audio file size in bytes"
     )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        choices=list(KINDS),
+        help="Kind of file to leave alone, may be repeated (default: sample)",
+    )
+    parser.add_argument(
+        "--exclude-pattern",
+        action="append",
+        dest="exclude_patterns",
+        metavar="GLOB",
+        help="Leave alone files whose name, or path if the glob has a '/', "
+        "matches GLOB; may be repeated",
+    )
+    parser.add_argument(
+        "--include-pattern",
+        action="append",
+        dest="include_patterns",
+        metavar="GLOB",
+        help="Only organize files matching GLOB; may be repeated",
+    )
     parser.add_argument(
         "--delete-non-media",
         action="store_true",
@@ -119,9 +171,228 @@ def main():
         action="store_true",
         help="Use existing output folders when possible",
     )
+    parser.add_argument(
+        "--directory-context",
+        action="store_true",
+        help="Interpret release folders, such as season packs, once and "
+        "complete the names of the files inside from them",
+    )
     parser.add_argument(
         "--clean", action="store_true", help="Clean up empty directories"
     )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Skip files unchanged since they were last organized, using "
+        "a scan index",
+    )
+    parser.add_argument(
+        "--index-path",
+        metavar="PATH",
+        help="Path to the scan index, which implies --index (default: "
+        f"{Config.INDEX_PATH})",
+    )
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="Forget all scan index entries and process every file again",
+    )
+    parser.add_argument(
+        "--dedup",
+        nargs="?",
+        const="skip",
+        choices=["skip", "report"],
+        help="Skip (default) or only report files whose content is already "
+        "in the library under another name, judged from sampled blocks",
+    )
+    parser.add_argument(
+        "--dedup-index",
+        dest="dedup_index_path",
+        help="Path to the library fingerprint index "
+        f"(default: {Config.DEDUP_INDEX_PATH})",
+    )
+    parser.add_argument(
+        "--dedup-verify",
+        action="store_true",
+        help="Compare the whole content of a suspected duplicate first",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of workers per pipeline stage (1 processes files "
+        "one at a time)",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["thread", "process"],
+        help="Pool used to interpret file names when --workers > 1",
+    )
+
+    parser.add_argument(
+        "--transfers",
+        type=int,
+        help="Number of copies or moves run at the same time",
+    )
+    parser.add_argument(
+        "--transfers-per-device",
+        type=int,
+        help="Number of copies or moves allowed per disk at the same time",
+    )
+    parser.add_argument(
+        "--large-file-size",
+        type=int,
+        help="Size in bytes from which files are transferred in a separate "
+        "lane, so they do not hold up small files",
+    )
+    parser.add_argument(
+        "--bandwidth-limit",
+        type=float,
+        help="Maximum MB/s used by all copies together (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--interpret-cache",
+        action="store_true",
+        help="Keep interpreted names in a cache shared across runs",
+    )
+    parser.add_argument(
+        "--interpret-cache-path",
+        metavar="PATH",
+        help="Path to the shared interpret cache, which implies "
+        f"--interpret-cache (default: {Config.INTERPRET_CACHE_PATH})",
+    )
+    parser.add_argument(
+        "--interpret-cache-size",
+        type=int,
+        help="Maximum number of interpreted names kept in memory "
+        "(0 disables the cache)",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Report the interpret cache hit rate after the scan",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print time spent per stage, I/O counters and files/s after "
+        "the run",
+    )
+    parser.add_argument(
+        "--profile-output",
+        dest="profile_path",
+        metavar="PATH",
+        help="Also write cProfile stats of the main thread to PATH, "
+        "readable with pstats or snakeviz",
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve Prometheus metrics at http://ADDRESS:PORT/metrics",
+    )
+    parser.add_argument(
+        "--metrics-address",
+        help="Address to serve metrics on (default: "
+        f"{Config.METRICS_ADDRESS})",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        metavar="PATH",
+        help="Write Prometheus metrics to PATH after every scan, for the "
+        "node exporter textfile collector",
+    )
+
+    parser.add_argument(
+        "--plan",
+        metavar="PATH",
+        help="Write what would be done to each file as JSON Lines to PATH "
+        "(- for stdout), without changing any files",
+    )
+    parser.add_argument(
+        "--execute-plan",
+        metavar="PATH",
+        help="Carry out a plan written by --plan (- reads stdin)",
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and organize files as they finish writing",
+    )
+    parser.add_argument(
+        "--settle-time",
+        type=float,
+        default=Config.WATCH_SETTLE_TIME,
+        help="Seconds a file must stop changing before it is organized "
+        "in watch mode",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=Config.WATCH_POLL_INTERVAL,
+        help="Seconds between checks for changes in watch mode",
+    )
+    parser.add_argument(
+        "--watch-backend",
+        choices=["auto", "inotify", "poll"],
+        default=Config.WATCH_BACKEND,
+        help="How to detect changes in watch mode",
+    )
+
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and organize the files sent by mediascan-client",
+    )
+    parser.add_argument(
+        "--socket",
+        default=Config.DAEMON_SOCKET,
+        help=f"Socket for --daemon (default: {Config.DAEMON_SOCKET})",
+    )
+
+    parser.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Queue the files of the inputs for --worker processes on any "
+        "host, instead of organizing them",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Organize files queued by a --coordinator until the job is "
+        "done; with --coordinator, also queue them",
+    )
+    parser.add_argument(
+        "--queue",
+        default=Config.QUEUE_URL,
+        metavar="URL",
+        help="Redis server shared by the coordinator and workers, as "
+        "redis://HOST:PORT/DB, or a redislite database file for a single "
+        f"host (default: {Config.QUEUE_URL})",
+    )
+    parser.add_argument(
+        "--queue-name",
+        default=Config.QUEUE_NAME,
+        help="Name of the job, when several share a server (default: "
+        f"{Config.QUEUE_NAME})",
+    )
+    parser.add_argument(
+        "--lease-time",
+        type=float,
+        default=Config.QUEUE_LEASE_TIME,
+        help="Seconds before the files of a worker that stopped responding "
+        f"are retried (default: {Config.QUEUE_LEASE_TIME:g})",
+    )
+    parser.add_argument(
+        "--clear-queue",
+        action="store_true",
+        help="Forget the files, reservations and outcomes of the job, such "
+        "as one whose coordinator was lost, before anything else",
+    )
 
     # Add quiet and verbose options
     parser.add_argument(
@@ -136,6 +407,13 @@ def main():
         action="store_true",
         help="Verbose mode (show debug messages)",
     )
+    parser.add_argument(
+        "--log-sample-limit",
+        type=int,
+        metavar="N",
+        help="Log only the first N files of a run at INFO, then progress "
+        f"(default: {Config.LOG_SAMPLE_LIMIT}, 0 logs every file)",
+    )
 
     args = parser.parse_args()
 
@@ -152,9 +430,23 @@ def main():
 
     config = get_config(args, config_path)
 
-    # Override input_path if provided as a positional argument
-    if args.input_path:
-        config["input_path"] = args.input_path
+    # Override input_path if provided as positional arguments
+    inputs = args.inputs or args.input_path
+    if inputs:
+        config["input_path"] = inputs[0] if len(inputs) == 1 else inputs
+
+    # A plan written over an input, such as the single file of a download
+    # hook, would destroy it
+    if args.plan and args.plan != "-" and os.path.exists(args.plan):
+        input_paths = config["input_path"]
+        if isinstance(input_paths, (str, Path)):
+            input_paths = [input_paths]
+        for input_path in input_paths:
+            input_path = os.path.expanduser(input_path)
+            if os.path.exists(input_path) and os.path.samefile(
+                args.plan, input_path
+            ):
+                parser.error(f"--plan would overwrite the input {args.plan}")
 
     # Configure logging based on quiet and verbose flags
     if args.quiet:
@@ -164,18 +456,129 @@ def main():
     else:
         log_level = Config.LOG_LEVEL
 
+    # Imported once the arguments are known to need them, so --help and
+    # --generate-config start quickly
+    from mediascan.logging import configure_logging, logger
+    from mediascan.mediascan import MediaScan
+    from mediascan.planner import read_plan, write_plan
+    from mediascan.templates import TemplateError
+
     configure_logging(log_level)
 
+    # The flags only turn on the index and cache, kept at their default
+    # paths unless others are given
+    if config.pop("index", False) and not config.get("index_path"):
+        config["index_path"] = Config.INDEX_PATH
+    if config.pop("interpret_cache", False) and not config.get(
+        "interpret_cache_path"
+    ):
+        config["interpret_cache_path"] = Config.INTERPRET_CACHE_PATH
+
     # Remove non-config arguments
-    for key in ["config", "generate_config", "quiet", "verbose"]:
+    for key in [
+        "config",
+        "inputs",
+        "generate_config",
+        "quiet",
+        "verbose",
+        "cache_stats",
+        "plan",
+        "execute_plan",
+        "watch",
+        "settle_time",
+        "poll_interval",
+        "watch_backend",
+        "daemon",
+        "socket",
+        "coordinator",
+        "worker",
+        "queue",
+        "queue_name",
+        "lease_time",
+        "clear_queue",
+    ]:
         if key in config:
             del config[key]
 
     # Create MediaScan instance
-    media_scan = MediaScan(**config)
+    try:
+        media_scan = MediaScan(**config)
+    except TemplateError as e:
+        parser.error(str(e))
 
     # Run the scan
-    media_scan.scan()
+    if args.plan:
+        entries = media_scan.plan()
+        if args.plan == "-":
+            count = write_plan(entries, sys.stdout)
+        else:
+            with open(args.plan, "w", encoding="utf-8") as f:
+                count = write_plan(entries, f)
+        logger.info(f"Planned {count} files")
+    elif args.execute_plan == "-":
+        media_scan.scan(plan=read_plan(sys.stdin))
+    elif args.execute_plan:
+        media_scan.scan(plan=args.execute_plan)
+    elif args.watch:
+        try:
+            media_scan.watch(
+                settle_time=args.settle_time,
+                poll_interval=args.poll_interval,
+                backend=args.watch_backend,
+            )
+        except KeyboardInterrupt:
+            pass
+    elif args.daemon:
+        # Shut down cleanly when stopped by a service manager
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            media_scan.serve(args.socket, stop)
+        except KeyboardInterrupt:
+            pass
+    elif args.coordinator or args.worker or args.clear_queue:
+        from mediascan.distributed import WorkQueue, connect
+
+        work_queue = WorkQueue(
+            connect(args.queue), args.queue_name, lease_time=args.lease_time
+        )
+        if args.clear_queue:
+            work_queue.clear()
+            logger.info(f"Cleared job '{args.queue_name}'")
+        if args.coordinator:
+            # Started first, so the worker waits for the files
+            try:
+                work_queue.start()
+            except RuntimeError as e:
+                logger.error(str(e))
+                sys.exit(1)
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        try:
+            if args.coordinator and not args.worker:
+                media_scan.coordinate(work_queue, stop)
+            elif args.worker and not args.coordinator:
+                media_scan.work(work_queue, stop)
+            elif args.coordinator:
+                coordinator = threading.Thread(
+                    target=media_scan.coordinate,
+                    args=(work_queue, stop),
+                    name="mediascan-coordinator",
+                    daemon=True,
+                )
+                coordinator.start()
+                media_scan.work(work_queue, stop)
+                coordinator.join()
+        except KeyboardInterrupt:
+            stop.set()
+    else:
+        media_scan.scan()
+
+    if media_scan.profiler.enabled:
+        media_scan.profiler.print_summary()
+
+    if args.cache_stats and media_scan.interpret_cache is not None:
+        print(media_scan.interpret_cache.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,188 @@
+import json
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from .interpreter import Interpreter
+
+
+def _sizeof(name: str, result: Dict) -> int:
+    """Approximates the memory held by one cache entry, in bytes."""
+    return (
+        sys.getsizeof(name)
+        + sys.getsizeof(result)
+        + sum(sys.getsizeof(value) for value in result.values())
+    )
+
+
+class InterpretCache:
+    """
+    Memoizes Interpreter.interpret() results.
+
+    Results are kept in a bounded in-memory LRU, capped both by entry count
+    and by approximate memory use. When a path is given, results are also
+    stored in a SQLite database shared across runs. Entries are keyed by
+    the interpreter version and the current year, since interpret() only
+    accepts years up to next year, so stale results are never returned.
+    """
+
+    def __init__(
+        self,
+        interpreter: Interpreter,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        path: Optional[Union[str, Path]] = None,
+        batch_size: int = 500,
+    ):
+        self.interpreter = interpreter
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.version = f"{interpreter.version}-{datetime.now().year}"
+
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self.path = None
+        self.connection = None
+        self._lock = threading.Lock()
+        self._pending = []
+        if path:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Used from whichever thread scans, always under the lock
+            self.connection = sqlite3.connect(
+                str(self.path), check_same_thread=False
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "version TEXT NOT NULL, "
+                "name TEXT NOT NULL, "
+                "result TEXT NOT NULL, "
+                "PRIMARY KEY (version, name))"
+            )
+            # Results from other interpreter versions can never be used
+            self.connection.execute(
+                "DELETE FROM results WHERE version != ?", (self.version,)
+            )
+            self.connection.commit()
+
+    def interpret(self, name: str) -> Dict:
+        result = self.get(name)
+        if result is None:
+            result = self.interpreter.interpret(name)
+            self.put(name, result)
+        return result
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get(name)
+
+    def _get(self, name: str) -> Optional[Dict]:
+        result = self.entries.get(name)
+        if result is not None:
+            self.entries.move_to_end(name)
+            self.hits += 1
+            return dict(result)
+
+        if self.connection is not None:
+            row = self.connection.execute(
+                "SELECT result FROM results WHERE version = ? AND name = ?",
+                (self.version, name),
+            ).fetchone()
+            if row is not None:
+                result = json.loads(row[0])
+                self._remember(name, result)
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(result)
+
+        self.misses += 1
+        return None
+
+    def put(self, name: str, result: Dict):
+        with self._lock:
+            self._remember(name, dict(result))
+            if self.connection is not None:
+                self._pending.append((self.version, name, json.dumps(result)))
+                if len(self._pending) >= self.batch_size:
+                    self._flush()
+
+    def _remember(self, name: str, result: Dict):
+        if self.max_entries <= 0:
+            return
+        previous = self.entries.pop(name, None)
+        if previous is not None:
+            self.bytes -= _sizeof(name, previous)
+        self.entries[name] = result
+        self.bytes += _sizeof(name, result)
+
+        while self.entries and (
+            len(self.entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            evicted_name, evicted = self.entries.popitem(last=False)
+            self.bytes -= _sizeof(evicted_name, evicted)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self.connection is None or not self._pending:
+            return
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO results (version, name, result) "
+            "VALUES (?, ?, ?)",
+            self._pending,
+        )
+        self.connection.commit()
+        self._pending = []
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+            self._pending = []
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM results")
+                self.connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hit_rate,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"Interpret cache: {self.hits} hits ({self.disk_hits} from "
+            f"disk), {self.misses} misses, hit rate {self.hit_rate:.1%}, "
+            f"{len(self.entries)} entries in memory"
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+from .logging import logger
+
+_O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+
+
+def prune_empty_directories(
+    root: Union[str, Path], directories: Iterable[Union[str, Path]]
+) -> List[str]:
+    """
+    Removes those of directories that are empty, then any of their
+    ancestors left empty, stopping at root, which is kept. Returns the
+    directories removed.
+
+    Only the given directories and their ancestors are visited, never the
+    rest of the tree, so the cost follows the number of files that left
+    rather than the size of the tree. Directories are visited deepest
+    first, one level at a time, so a parent is only tried once all of its
+    children have been. os.rmdir itself refuses directories that are not
+    empty, so nothing is listed. Siblings are removed through one file
+    descriptor of their parent.
+    """
+    root = os.path.abspath(root)
+    prefix = root.rstrip(os.sep) + os.sep
+    levels: Dict[int, Set[str]] = {}
+    for directory in directories:
+        directory = os.path.abspath(directory)
+        if directory.startswith(prefix):
+            levels.setdefault(directory.count(os.sep), set()).add(directory)
+
+    removed = []
+    while levels:
+        depth = max(levels)
+        children: Dict[str, List[str]] = {}
+        for directory in levels.pop(depth):
+            parent, name = os.path.split(directory)
+            children.setdefault(parent, []).append(name)
+
+        for parent, names in sorted(children.items()):
+            emptied = _remove_children(parent, sorted(names))
+            removed.extend(emptied)
+            if emptied and parent != root:
+                levels.setdefault(depth - 1, set()).add(parent)
+    return removed
+
+
+def _remove_children(parent: str, names: List[str]) -> List[str]:
+    if os.rmdir not in os.supports_dir_fd:
+        return [
+            path
+            for path in (os.path.join(parent, name) for name in names)
+            if _rmdir(path)
+        ]
+
+    try:
+        fd = os.open(parent, os.O_RDONLY | _O_DIRECTORY)
+    except OSError:
+        return []
+    try:
+        return [
+            os.path.join(parent, name)
+            for name in names
+            if _rmdir(name, fd, parent)
+        ]
+    finally:
+        os.close(fd)
+
+
+def _rmdir(name: str, dir_fd=None, parent: str = "") -> bool:
+    try:
+        os.rmdir(name, dir_fd=dir_fd)
+    except OSError:
+        # Not empty, already gone or not a directory
+        return False
+    logger.info(f"Removing empty folder: {os.path.join(parent, name)}")
+    return True
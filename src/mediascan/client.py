@@ -0,0 +1,132 @@
+"""
+Sends files to a running "mediascan --daemon" to be organized.
+
+    mediascan-client PATH... [--socket PATH] [--no-wait]
+
+Only the standard library is imported when XDG_RUNTIME_DIR is set, as it
+is in a login session, or when --socket is given, so the client starts
+quickly. A hook can also write the request itself, one JSON line per
+request:
+
+    echo '{"paths": ["/downloads/Movie.mkv"]}' | socat - UNIX:SOCKET
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Dict, List, Optional
+
+# Name of the socket in XDG_RUNTIME_DIR, as in Config.DAEMON_SOCKET
+SOCKET_NAME = "mediascan.sock"
+
+
+def default_socket() -> str:
+    """
+    Returns the socket the daemon listens on by default, importing the
+    package's configuration, and with it appdirs, only when needed.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_NAME)
+
+    from .config import Config
+
+    return Config.DAEMON_SOCKET
+
+
+def request(
+    message: Dict,
+    socket_path: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Dict:
+    """Sends one request to the daemon and returns its reply."""
+    socket_path = socket_path or default_socket()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(os.path.expanduser(socket_path))
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("The daemon closed the connection")
+    return json.loads(line)
+
+
+def organize(
+    paths: List[str],
+    socket_path: Optional[str] = None,
+    wait: bool = True,
+    timeout: Optional[float] = None,
+) -> Dict:
+    # The daemon may run in another directory
+    paths = [os.path.abspath(path) for path in paths]
+    return request({"paths": paths, "wait": wait}, socket_path, timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="*", help="Files or directories")
+    parser.add_argument(
+        "--socket",
+        help=f"Daemon socket (default: $XDG_RUNTIME_DIR/{SOCKET_NAME}, or "
+        "in the cache directory)",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Return once the paths are queued",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="Seconds to wait for the daemon"
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Print the daemon's queue length and files processed",
+    )
+    args = parser.parse_args()
+    args.socket = args.socket or default_socket()
+
+    try:
+        if args.status:
+            reply = request({"command": "status"}, args.socket, args.timeout)
+        elif args.paths:
+            reply = organize(
+                args.paths, args.socket, not args.no_wait, args.timeout
+            )
+        else:
+            parser.error("no paths given")
+    except OSError as e:
+        print(
+            f"Cannot reach the daemon at {args.socket}: {e}", file=sys.stderr
+        )
+        sys.exit(2)
+
+    if not reply.get("ok"):
+        print(reply.get("error", "Request failed"), file=sys.stderr)
+        sys.exit(1)
+
+    failed = False
+    for result in reply.get("results", []):
+        if "error" in result:
+            failed = True
+            print(
+                f"{result.get('source', '')}: {result['error']}",
+                file=sys.stderr,
+            )
+        elif result.get("destination"):
+            print(
+                f"{result['outcome']}: {result['source']} -> "
+                f"{result['destination']}"
+            )
+        else:
+            print(f"{result['outcome']}: {result['source']}")
+    if "results" not in reply:
+        print(json.dumps({k: v for k, v in reply.items() if k != "ok"}))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
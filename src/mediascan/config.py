@@ -1,10 +1,28 @@
 import os
 
-import dotenv
 import appdirs
 
 
-dotenv.load_dotenv()
+def _load_dotenv():
+    """
+    Loads the nearest .env file above this package, as dotenv.load_dotenv()
+    would, importing python-dotenv only when there is one.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            import dotenv
+
+            dotenv.load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+
+_load_dotenv()
 
 
 # Default values
@@ -15,6 +33,7 @@ TV_SHOWS_DIR = "TV Shows"
 
 CONFIG_DIR = appdirs.user_config_dir(APP_NAME)
 LOG_DIR = appdirs.user_log_dir(APP_NAME)
+CACHE_DIR = appdirs.user_cache_dir(APP_NAME)
 
 QUIET_LOG_LEVEL = "ERROR"
 VERBOSE_LOG_LEVEL = "DEBUG"
@@ -22,10 +41,16 @@ LOG_PATH = os.path.join(LOG_DIR, "MediaScan.log")
 LOG_LEVEL = "INFO"
 LOG_ROTATION = "1 week"
 LOG_RETENTION = "1 month"
+LOG_ENQUEUE = True  # Write logs from a background thread
+LOG_SAMPLE_LIMIT = 1000  # Files logged at INFO per run, 0 for all
+LOG_PROGRESS_INTERVAL = 30  # Seconds between progress lines
 
 ACTION = "symlink"  # symlink, link, copy, move
 MIN_VIDEO_SIZE = 100 * 1024 * 1024  # 100 MB
 MIN_AUDIO_SIZE = 3 * 1024 * 1024  # 3 MB
+EXCLUDE = ["sample"]  # Kinds of file never organized: sample, trailer, extras
+EXCLUDE_PATTERNS = []  # Globs of files never organized
+INCLUDE_PATTERNS = []  # Globs; when given, only matching files are organized
 MOVIE_PATH = "{title} ({year})/{title} ({year}) [{quality}].{ext}"
 MOVIE_PATH_NO_YEAR = "{title}/{title} [{quality}].{ext}"
 EPISODE_PATH = (
@@ -38,9 +63,38 @@ EPISODE_PATH_NO_YEAR = (
 DATED_EPISODE_PATH = (
     "{title} ({year})/Season {season}/{title} - {date} [{quality}].{ext}"
 )
+SANITIZE_PATHS = False  # Remove characters invalid on Windows from names
 DELETE_NON_MEDIA = False
 PREFER_EXISTING_FOLDERS = True
+DIRECTORY_CONTEXT = False  # Interpret release folders once per folder
 CLEAN = False
+INDEX_PATH = os.path.join(CACHE_DIR, "index.sqlite3")
+WORKERS = 1
+EXECUTOR = "thread"  # thread, process
+INTERPRET_CACHE_SIZE = 10000  # Entries, 0 to disable
+INTERPRET_CACHE_MEMORY = 64 * 1024 * 1024  # 64 MB
+INTERPRET_CACHE_PATH = os.path.join(CACHE_DIR, "interpret.sqlite3")
+WATCH_SETTLE_TIME = 5.0  # Seconds a file must stop changing before use
+WATCH_POLL_INTERVAL = 2.0  # Seconds
+WATCH_BACKEND = "auto"  # auto, inotify, poll
+TRANSFERS = 4  # Concurrent copies and moves, 1 to transfer one at a time
+TRANSFERS_PER_DEVICE = 2
+LARGE_FILE_SIZE = 1024 * 1024 * 1024  # 1 GB, transferred in their own lane
+BANDWIDTH_LIMIT = 0  # MB/s across all transfers, 0 for no limit
+DEDUP_INDEX_PATH = os.path.join(CACHE_DIR, "dedup.sqlite3")
+DEDUP_SAMPLES = 8  # Blocks read to fingerprint a file
+DEDUP_BLOCK_SIZE = 64 * 1024  # 64 KB
+METRICS_ADDRESS = "127.0.0.1"
+DAEMON_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or CACHE_DIR, "mediascan.sock"
+)
+QUEUE_URL = os.path.join(CACHE_DIR, "queue.db")  # Or redis://HOST:PORT/DB
+QUEUE_NAME = "mediascan"  # Prefix of the job's keys
+QUEUE_LEASE_TIME = 60.0  # Seconds before a crashed worker's files are retried
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_BATCH_SIZE = 16  # Files claimed by a worker at a time
+QUEUE_MAX_PENDING = 100000  # Files queued ahead of the workers
+QUEUE_POLL_INTERVAL = 1.0  # Seconds
 
 EXTENSIONS = {
     "video": [
@@ -78,14 +132,44 @@ class Config:
     ACTION = ACTION
     MIN_AUDIO_SIZE = MIN_AUDIO_SIZE
     MIN_VIDEO_SIZE = MIN_VIDEO_SIZE
+    EXCLUDE = EXCLUDE
+    EXCLUDE_PATTERNS = EXCLUDE_PATTERNS
+    INCLUDE_PATTERNS = INCLUDE_PATTERNS
     MOVIE_PATH = MOVIE_PATH
     MOVIE_PATH_NO_YEAR = MOVIE_PATH_NO_YEAR
     EPISODE_PATH = EPISODE_PATH
     EPISODE_PATH_NO_YEAR = EPISODE_PATH_NO_YEAR
     DATED_EPISODE_PATH = DATED_EPISODE_PATH
+    SANITIZE_PATHS = SANITIZE_PATHS
     DELETE_NON_MEDIA = DELETE_NON_MEDIA
     PREFER_EXISTING_FOLDERS = PREFER_EXISTING_FOLDERS
+    DIRECTORY_CONTEXT = DIRECTORY_CONTEXT
     CLEAN = CLEAN
+    INDEX_PATH = INDEX_PATH
+    WORKERS = WORKERS
+    EXECUTOR = EXECUTOR
+    INTERPRET_CACHE_SIZE = INTERPRET_CACHE_SIZE
+    INTERPRET_CACHE_MEMORY = INTERPRET_CACHE_MEMORY
+    INTERPRET_CACHE_PATH = INTERPRET_CACHE_PATH
+    WATCH_SETTLE_TIME = WATCH_SETTLE_TIME
+    WATCH_POLL_INTERVAL = WATCH_POLL_INTERVAL
+    WATCH_BACKEND = WATCH_BACKEND
+    TRANSFERS = TRANSFERS
+    TRANSFERS_PER_DEVICE = TRANSFERS_PER_DEVICE
+    LARGE_FILE_SIZE = LARGE_FILE_SIZE
+    BANDWIDTH_LIMIT = BANDWIDTH_LIMIT
+    DEDUP_INDEX_PATH = DEDUP_INDEX_PATH
+    DEDUP_SAMPLES = DEDUP_SAMPLES
+    DEDUP_BLOCK_SIZE = DEDUP_BLOCK_SIZE
+    METRICS_ADDRESS = METRICS_ADDRESS
+    DAEMON_SOCKET = DAEMON_SOCKET
+    QUEUE_URL = QUEUE_URL
+    QUEUE_NAME = QUEUE_NAME
+    QUEUE_LEASE_TIME = QUEUE_LEASE_TIME
+    QUEUE_MAX_ATTEMPTS = QUEUE_MAX_ATTEMPTS
+    QUEUE_BATCH_SIZE = QUEUE_BATCH_SIZE
+    QUEUE_MAX_PENDING = QUEUE_MAX_PENDING
+    QUEUE_POLL_INTERVAL = QUEUE_POLL_INTERVAL
 
     # Logging
     QUIET_LOG_LEVEL = QUIET_LOG_LEVEL
@@ -94,3 +178,6 @@ class Config:
     LOG_LEVEL = LOG_LEVEL
     LOG_ROTATION = LOG_ROTATION
     LOG_RETENTION = LOG_RETENTION
+    LOG_ENQUEUE = LOG_ENQUEUE
+    LOG_SAMPLE_LIMIT = LOG_SAMPLE_LIMIT
+    LOG_PROGRESS_INTERVAL = LOG_PROGRESS_INTERVAL
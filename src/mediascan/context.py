@@ -0,0 +1,113 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Fields that mark a directory as a release rather than a plain folder
+RELEASE_MARKERS = (
+    "year",
+    "season",
+    "date",
+    "resolution",
+    "source",
+    "video_codec",
+    "audio_codec",
+)
+# Fields a file takes from its release directory when its name lacks them
+INHERITED = (
+    "year",
+    "season",
+    "resolution",
+    "source",
+    "video_codec",
+    "audio_codec",
+    "language",
+)
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _words(title: str) -> List[str]:
+    return _WORD_PATTERN.findall(title.lower())
+
+
+def _is_bare(file_info: Dict) -> bool:
+    # A name that says nothing about the release, just a title
+    return file_info["episode"] is None and not any(
+        file_info[field] for field in RELEASE_MARKERS
+    )
+
+
+class DirectoryContext:
+    """
+    Interprets files together with the release directories they are in.
+
+    Each directory of a relative path is interpreted once, by name only,
+    and remembered, so the 24 files of a season pack share one reading of
+    the pack's folder. A file's own name is interpreted without its
+    directories, then completed from the folder: a file with no title, or
+    the same title in other words, takes the folder's title and any year,
+    season or quality it lacks. Titles and years are then consistent
+    across the pack. A file whose title differs keeps its own reading,
+    unless its name carries no release markers at all, as an obfuscated
+    "abc123.mkv" does, in which case a release folder names it.
+
+    Directories carrying no release markers, such as "Downloads", only
+    give a title to files that have none.
+    """
+
+    def __init__(self, interpreter, cache_size: int = 1024):
+        self.interpreter = interpreter
+        self.context = lru_cache(maxsize=cache_size)(self._context)
+
+    def merge(self, relative_name: str, file_info: Dict) -> Dict:
+        """
+        Returns file_info, the interpretation of the last part of
+        relative_name, completed from its directories.
+        """
+        directory = relative_name.rpartition("/")[0]
+        if not directory:
+            return file_info
+        context = self.context(directory)
+        if context is None or not context["title"]:
+            return file_info
+
+        title = file_info["title"]
+        if (
+            title
+            and _words(title) != _words(context["title"])
+            and not (context["release"] and _is_bare(file_info))
+        ):
+            return file_info
+
+        merged = dict(file_info)
+        merged["title"] = context["title"]
+        if context["release"]:
+            for field in INHERITED:
+                if merged[field] is None:
+                    merged[field] = context[field]
+            if merged["season"] is not None or merged["date"] is not None:
+                merged["type"] = "tv"
+        return merged
+
+    def _context(self, directory: str) -> Optional[Dict]:
+        # Parents first, each remembered in turn
+        parent, _, name = directory.rpartition("/")
+        context = self.context(parent) if parent else None
+        info = self.interpreter.interpret_directory(name)
+
+        if not any(info[field] for field in RELEASE_MARKERS):
+            if context is None and info["title"]:
+                return {**info, "release": False}
+            return context
+
+        if context is None or not context["release"]:
+            if not info["title"] and context is not None:
+                info = {**info, "title": context["title"]}
+            return {**info, "release": True}
+
+        # A folder inside a release, such as "Season 2", refines it
+        merged = dict(context)
+        for key, value in info.items():
+            if value:
+                merged[key] = value
+        return merged
@@ -0,0 +1,277 @@
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Tried in order until one works
+COPY_METHODS = ["reflink", "copy_file_range", "sendfile", "buffer"]
+BUFFER_SIZE = 8 * 1024 * 1024
+
+# _IOW(0x94, 9, int), from <linux/fs.h>
+FICLONE = 0x40049409
+
+# Largest count the kernel accepts in one copy_file_range/sendfile call
+_MAX_CHUNK = 0x7FFFF000
+
+# Errors meaning the method is not available for this pair of files
+_UNSUPPORTED = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSUP,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EXDEV,
+    getattr(errno, "ENOTSOCK", errno.EINVAL),
+}
+
+PathLike = Union[str, Path]
+Progress = Optional[Callable[[int], None]]
+
+
+class _Unsupported(Exception):
+    """Raised by a method that cannot continue, with the bytes copied."""
+
+    def __init__(self, offset: int):
+        super().__init__(offset)
+        self.offset = offset
+
+
+def _reflink(
+    fd_in: int, fd_out: int, offset: int, buffer_size: int, progress: Progress
+) -> int:
+    if fcntl is None or not sys.platform.startswith("linux") or offset:
+        raise _Unsupported(offset)
+    try:
+        fcntl.ioctl(fd_out, FICLONE, fd_in)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            raise _Unsupported(offset) from e
+        raise
+    return os.fstat(fd_in).st_size
+
+
+def _copy_file_range(
+    fd_in: int, fd_out: int, offset: int, buffer_size: int, progress: Progress
+) -> int:
+    if not hasattr(os, "copy_file_range"):
+        raise _Unsupported(offset)
+    # Copy in small chunks only when someone is watching the progress
+    chunk = _MAX_CHUNK if progress is None else buffer_size
+    while True:
+        try:
+            copied = os.copy_file_range(fd_in, fd_out, chunk, offset, offset)
+        except OSError as e:
+            if e.errno in _UNSUPPORTED:
+                raise _Unsupported(offset) from e
+            raise
+        if not copied:
+            if not offset:
+                # Some filesystems, like procfs and FUSE ones, report end of
+                # file from the start rather than refuse
+                raise _Unsupported(offset)
+            return offset
+        offset += copied
+        if progress is not None:
+            progress(copied)
+
+
+def _sendfile(
+    fd_in: int, fd_out: int, offset: int, buffer_size: int, progress: Progress
+) -> int:
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        raise _Unsupported(offset)
+    chunk = _MAX_CHUNK if progress is None else buffer_size
+    # sendfile writes at the current position of the output
+    os.lseek(fd_out, offset, os.SEEK_SET)
+    while True:
+        try:
+            copied = os.sendfile(fd_out, fd_in, offset, chunk)
+        except OSError as e:
+            if e.errno in _UNSUPPORTED:
+                raise _Unsupported(offset) from e
+            raise
+        if not copied:
+            if not offset:
+                # Some filesystems, like procfs and FUSE ones, report end of
+                # file from the start rather than refuse
+                raise _Unsupported(offset)
+            return offset
+        offset += copied
+        if progress is not None:
+            progress(copied)
+
+
+def _buffer(
+    fd_in: int, fd_out: int, offset: int, buffer_size: int, progress: Progress
+) -> int:
+    os.lseek(fd_in, offset, os.SEEK_SET)
+    os.lseek(fd_out, offset, os.SEEK_SET)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(fd_in, "rb", buffering=0, closefd=False) as src:
+        while True:
+            read = src.readinto(buffer)
+            if not read:
+                return offset
+            written = 0
+            while written < read:
+                written += os.write(fd_out, view[written:read])
+            offset += read
+            if progress is not None:
+                progress(read)
+
+
+_METHODS: Dict[str, Callable[[int, int, int, int, Progress], int]] = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "buffer": _buffer,
+}
+
+
+def _advise(fd: int, advice: str):
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+        except OSError:
+            pass
+
+
+def copy_file(
+    source: PathLike,
+    destination: PathLike,
+    methods: Sequence[str] = COPY_METHODS,
+    buffer_size: int = BUFFER_SIZE,
+    progress: Progress = None,
+) -> str:
+    """
+    Copies source to destination with its metadata, like shutil.copy2.
+
+    The methods are tried in order. A reflink shares the data blocks and
+    copies nothing, copy_file_range lets the kernel or filesystem copy
+    without passing through user space, and sendfile does the same on
+    older kernels. A method that fails part way hands over to the next one
+    at the same offset. Returns the name of the method that finished the
+    copy. The destination must not exist, and is removed if copying fails.
+
+    If given, progress is called with the size of every chunk copied.
+    """
+    for method in methods:
+        if method not in _METHODS:
+            raise ValueError(
+                f"Unknown copy method '{method}'. "
+                f"Expected one of: {', '.join(COPY_METHODS)}"
+            )
+
+    fd_in = os.open(source, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        fd_out = os.open(
+            destination,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+            0o666,
+        )
+        try:
+            _advise(fd_in, "POSIX_FADV_SEQUENTIAL")
+            used, copied = _copy(fd_in, fd_out, methods, buffer_size, progress)
+            size = os.fstat(fd_in).st_size
+            if copied != size:
+                raise OSError(
+                    errno.EIO,
+                    f"Copied {copied} of {size} bytes with {used}",
+                    os.fspath(source),
+                )
+            if used != "reflink":
+                # The data is not needed again, keep it out of the cache
+                _advise(fd_in, "POSIX_FADV_DONTNEED")
+        except BaseException:
+            os.close(fd_out)
+            os.unlink(destination)
+            raise
+        os.close(fd_out)
+    finally:
+        os.close(fd_in)
+
+    shutil.copystat(source, destination)
+    return used
+
+
+def _copy(
+    fd_in: int,
+    fd_out: int,
+    methods: Sequence[str],
+    buffer_size: int,
+    progress: Progress,
+) -> Tuple[str, int]:
+    # Returns the method that finished the copy and the bytes copied
+    offset = 0
+    for method in methods:
+        try:
+            offset = _METHODS[method](
+                fd_in, fd_out, offset, buffer_size, progress
+            )
+            return method, offset
+        except _Unsupported as e:
+            offset = e.offset
+    # Every method refused, finish with a plain buffered copy
+    return "buffer", _buffer(fd_in, fd_out, offset, buffer_size, progress)
+
+
+def move_file(
+    source: PathLike,
+    destination: PathLike,
+    methods: Sequence[str] = COPY_METHODS,
+    buffer_size: int = BUFFER_SIZE,
+    progress: Progress = None,
+) -> str:
+    """
+    Moves source to destination, like shutil.move, but never replaces an
+    existing destination: FileExistsError is raised instead, as it is by
+    copy_file.
+
+    Returns "rename" when the file could be renamed in place, otherwise
+    the copy method used to move it across devices.
+    """
+    try:
+        _rename(source, destination)
+        return "rename"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    if os.path.islink(source):
+        # Recreate the link rather than copying what it points to
+        os.symlink(os.readlink(source), destination)
+        os.unlink(source)
+        return "symlink"
+
+    used = copy_file(source, destination, methods, buffer_size, progress)
+    os.unlink(source)
+    return used
+
+
+def _rename(source: PathLike, destination: PathLike):
+    # os.rename silently replaces the destination, while a hard link fails
+    # if it exists, so the file is linked then unlinked where possible
+    try:
+        os.link(source, destination, follow_symlinks=False)
+    except OSError as e:
+        if e.errno in (errno.EEXIST, errno.EXDEV):
+            raise
+    else:
+        os.unlink(source)
+        return
+
+    # Filesystems without hard links
+    if os.path.lexists(destination):
+        raise FileExistsError(
+            errno.EEXIST, os.strerror(errno.EEXIST), os.fspath(destination)
+        )
+    os.rename(source, destination)
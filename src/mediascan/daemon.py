@@ -0,0 +1,274 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import Config
+from .logging import logger
+from .planner import UNCHANGED
+from .walker import stat_record
+
+# Longest request line accepted, in bytes
+MAX_REQUEST_SIZE = 1024 * 1024
+# Most requests handled between two flushes of the index and caches
+MAX_BATCH = 256
+
+
+class _Request:
+    __slots__ = ("paths", "results", "error", "done")
+
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.results: List[Dict] = []
+        # Set when the request could not be handled in full
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # A connection may send any number of requests, one per line
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE)
+            if not line:
+                return
+            reply = self.server.daemon.handle(line)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    daemon: "Daemon"
+
+
+def _is_listening(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+class Daemon:
+    """
+    Keeps a MediaScan resident and organizes files on request, so download
+    clients need not start a new process for every finished download.
+
+    Requests are JSON lines on a Unix domain socket, such as
+
+        {"paths": ["/downloads/Movie.2001.1080p.mkv"]}
+
+    Each path, a file or a directory, is organized as "mediascan PATH"
+    would. The reply lists the outcome and destination of every file, or
+    comes as soon as the paths are queued when "wait" is false. A single
+    worker takes requests off the queue in order. Requests that queue up
+    while it is busy are handled as one batch, flushing the scan index and
+    caches once. {"command": "ping"} and {"command": "status"} are also
+    understood. A file that fails is reported with an error in its
+    result, and a request that could not be handled in full is answered
+    with "ok": false.
+
+    The library index is loaded once and kept warm between requests,
+    seeing the daemon's own writes. Changes made to the library by anyone
+    else are only seen once it is reloaded: after a request fails, or on
+    {"command": "reload"}, before the next batch.
+    """
+
+    def __init__(self, media_scan, socket_path: str = Config.DAEMON_SOCKET):
+        self.media_scan = media_scan
+        self.socket_path = os.path.abspath(os.path.expanduser(socket_path))
+        self.queue: "queue.Queue[_Request]" = queue.Queue()
+        self.processed = 0
+        self.server: Optional[_Server] = None
+        # Whether the library index may no longer match the disk
+        self.stale = True
+
+    def run(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        self.server = self._bind()
+        threading.Thread(
+            target=self.server.serve_forever,
+            name="mediascan-daemon",
+            daemon=True,
+        ).start()
+        logger.info(f"Listening on {self.socket_path}")
+        try:
+            while not stop.is_set():
+                batch = self._next_batch(timeout=0.5)
+                if batch:
+                    self._process(batch)
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+            self._cancel_pending()
+
+    def _bind(self) -> _Server:
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if _is_listening(self.socket_path):
+                raise RuntimeError(
+                    f"A daemon is already listening on {self.socket_path}"
+                )
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.socket_path)
+
+        # Only the owner may connect, as requests can move and delete files
+        umask = os.umask(0o177)
+        try:
+            server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+        server.daemon = self
+        return server
+
+    def handle(self, line: bytes) -> Dict:
+        """Answers one request line, waiting for its files if asked to."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            return {"ok": False, "error": f"Invalid request: {e}"}
+
+        command = request.get("command", "organize")
+        if command == "ping":
+            return {"ok": True}
+        if command == "reload":
+            self.stale = True
+            return {"ok": True}
+        if command == "status":
+            return {
+                "ok": True,
+                "queued": self.queue.qsize(),
+                "processed": self.processed,
+            }
+        if command != "organize":
+            return {"ok": False, "error": f"Unknown command: {command}"}
+
+        paths = request.get("paths")
+        if paths is None and "path" in request:
+            paths = [request["path"]]
+        if (
+            not isinstance(paths, list)
+            or not paths
+            or not all(isinstance(path, str) for path in paths)
+        ):
+            return {"ok": False, "error": "Expected a list of paths"}
+
+        pending = _Request(paths)
+        self.queue.put(pending)
+        if not request.get("wait", True):
+            return {"ok": True, "queued": len(paths)}
+        pending.done.wait()
+        if pending.error is not None:
+            return {
+                "ok": False,
+                "error": pending.error,
+                "results": pending.results,
+            }
+        return {"ok": True, "results": pending.results}
+
+    def _next_batch(self, timeout: float) -> List[_Request]:
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: List[_Request]):
+        # Nothing raised here may stop the daemon, and no request may be
+        # answered as if it had been handled in full when it was not
+        media_scan = self.media_scan
+        finished = 0
+        try:
+            if self.stale:
+                self.stale = False
+                media_scan._load_library()
+            elif media_scan.prefer_existing_folders:
+                # Shows may have been added since the last batch
+                media_scan.existing_tv_shows = (
+                    media_scan._get_existing_tv_show_folders()
+                )
+            for request in batch:
+                for path in request.paths:
+                    request.results.extend(self._organize(path))
+                self.processed += len(request.paths)
+                finished += 1
+        except Exception as e:
+            logger.exception(f"Failed to process requests: {e}")
+            self.stale = True
+            for request in batch[finished:]:
+                request.error = str(e)
+        finally:
+            try:
+                media_scan._finish_scan()
+            except Exception as e:
+                logger.exception(f"Failed to finish requests: {e}")
+            for request in batch:
+                request.done.set()
+
+    def _organize(self, path: str) -> List[Dict]:
+        media_scan = self.media_scan
+        root = Path(os.path.abspath(path))
+        record = stat_record(root)
+        is_directory = record is None and root.is_dir()
+        if record is not None:
+            records = [record]
+        elif is_directory:
+            records = media_scan._walk_directory(root)
+        else:
+            return [{"source": str(root), "error": "No such file"}]
+
+        # Names are interpreted relative to the requested path
+        input_paths = media_scan.input_paths
+        media_scan.input_paths = [root]
+        results = []
+        try:
+            for record in records:
+                try:
+                    outcome, destination = media_scan._scan_record(record)
+                except OSError as e:
+                    logger.error(f"Failed to process {record.path}: {e}")
+                    # Possibly because the library changed behind our back
+                    self.stale = True
+                    results.append({"source": record.path, "error": str(e)})
+                    continue
+                except Exception as e:
+                    logger.exception(f"Failed to process {record.path}: {e}")
+                    results.append({"source": record.path, "error": repr(e)})
+                    continue
+                results.append(
+                    {
+                        "source": record.path,
+                        "outcome": outcome or UNCHANGED,
+                        "destination": destination and str(destination),
+                    }
+                )
+            if is_directory and media_scan.clean:
+                media_scan._clean_empty_folders(root)
+        finally:
+            media_scan.input_paths = input_paths
+        return results
+
+    def _cancel_pending(self):
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            request.error = "The daemon shut down"
+            request.done.set()
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Collection, Dict, Optional, Tuple, Union
+
+from .config import Config
+from .logging import logger
+from .walker import walk
+
+DEDUP_MODES = ["skip", "report"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL
+)
+"""
+
+# Read size when comparing whole files
+_CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint(
+    path: Union[str, Path],
+    samples: int = Config.DEDUP_SAMPLES,
+    block_size: int = Config.DEDUP_BLOCK_SIZE,
+) -> str:
+    """
+    Returns a digest of a file's size and a few blocks spread evenly over
+    it, from the first to the last. Large files cost samples reads of
+    block_size bytes, however big they are. Files smaller than that are
+    hashed whole.
+    """
+    if samples < 2:
+        raise ValueError(
+            "At least 2 samples are needed, for the first and last blocks"
+        )
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+        if size <= samples * block_size:
+            offsets = range(0, size, block_size)
+        else:
+            span = size - block_size
+            offsets = [i * span // (samples - 1) for i in range(samples)]
+        for offset in offsets:
+            digest.update(os.pread(fd, block_size, offset))
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+
+def same_content(first: Union[str, Path], second: Union[str, Path]) -> bool:
+    """Compares two files byte for byte, stopping at the first difference."""
+    first_stat = os.stat(first)
+    second_stat = os.stat(second)
+    if first_stat.st_size != second_stat.st_size:
+        return False
+    if (first_stat.st_dev, first_stat.st_ino) == (
+        second_stat.st_dev,
+        second_stat.st_ino,
+    ):
+        return True
+    with open(first, "rb") as a, open(second, "rb") as b:
+        while True:
+            chunk = a.read(_CHUNK_SIZE)
+            if chunk != b.read(_CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+
+class DuplicateIndex:
+    """
+    Persistent fingerprints of the files in the output library, used to
+    spot a release that is already in the library under another name.
+
+    The first lookup brings the index up to date with the library, only
+    fingerprinting files that are new or changed since they were last
+    seen. Fingerprints of files organized since are claimed before their
+    action starts, so two copies of one release in the same run are also
+    caught, whichever worker gets to them first. One index file can hold
+    several libraries, as each only loads the paths below its root.
+    """
+
+    def __init__(
+        self,
+        index_path: Union[str, Path],
+        root: Union[str, Path],
+        extensions: Optional[Collection[str]] = None,
+        batch_size: int = 500,
+    ):
+        self.index_path = Path(index_path)
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.batch_size = batch_size
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Used from the action workers, always under the lock
+        self.connection = sqlite3.connect(
+            str(self.index_path), check_same_thread=False
+        )
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+        self._lock = threading.Lock()
+        self._paths: Optional[Dict[str, Tuple[int, int, str]]] = None
+        self._fingerprints: Dict[str, str] = {}
+        self._pending = []
+
+    def _load(self) -> Dict[str, Tuple[int, int, str]]:
+        if self._paths is not None:
+            return self._paths
+
+        directory = self.root + os.sep
+        rows = self.connection.execute(
+            "SELECT path, size, mtime, fingerprint FROM fingerprints "
+            "WHERE substr(path, 1, ?) = ?",
+            (len(directory), directory),
+        )
+        known = {row[0]: row[1:] for row in rows}
+
+        paths = {}
+        added = 0
+        for record in walk(self.root, self.extensions):
+            entry = known.pop(record.path, None)
+            if entry is None or entry[:2] != (record.size, record.mtime):
+                try:
+                    entry = (
+                        record.size,
+                        record.mtime,
+                        fingerprint(record.path),
+                    )
+                except OSError:
+                    continue
+                self._pending.append((record.path, *entry))
+                added += 1
+            paths[record.path] = entry
+
+        # Gone from the library since the last run
+        self.connection.executemany(
+            "DELETE FROM fingerprints WHERE path = ?",
+            [(path,) for path in known],
+        )
+        self._paths = paths
+        self._fingerprints = {}
+        for path, (_, _, digest) in paths.items():
+            self._fingerprints.setdefault(digest, path)
+        self._flush()
+        logger.debug(
+            f"Loaded {len(paths)} fingerprints for {self.root}, "
+            f"{added} new, {len(known)} removed"
+        )
+        return paths
+
+    def load(self):
+        """Brings the index up to date with the library now."""
+        with self._lock:
+            self._load()
+
+    def claim(self, digest: str, path: Union[str, Path]) -> Optional[str]:
+        """
+        Reserves digest for path. Returns the library file that already
+        has it instead, if there is one.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            self._load()
+            existing = self._fingerprints.get(digest)
+            if existing is not None and existing != path:
+                return existing
+            self._fingerprints[digest] = path
+            return None
+
+    def release(self, digest: str, path: Union[str, Path]):
+        """Gives up a claim whose action did not go ahead."""
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._fingerprints.get(digest) == path:
+                del self._fingerprints[digest]
+
+    def add(self, digest: str, path: Union[str, Path]):
+        """Records a file organized into the library."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        entry = (st.st_size, st.st_mtime_ns, digest)
+        with self._lock:
+            self._load()[path] = entry
+            self._fingerprints.setdefault(digest, path)
+            self._pending.append((path, *entry))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(path, size, mtime, fingerprint) VALUES (?, ?, ?, ?)",
+                self._pending,
+            )
+            self._pending = []
+        self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
@@ -0,0 +1,457 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .config import Config
+from .logging import logger
+from .planner import UNCHANGED
+from .walker import FileRecord
+
+# States of a job, kept under its "state" key
+DISCOVERING = "discovering"
+DISCOVERED = "discovered"
+# Discovery stopped part way, leaving the files queued so far
+ABORTED = "aborted"
+
+# Starts a job, ARGV[1] being DISCOVERING, unless the last one is still
+# discovering or has files left. What an earlier job left behind, its
+# reservations above all, is forgotten. Returns why the job cannot start.
+_START = """
+local state = redis.call('GET', KEYS[1])
+if state == ARGV[1] then
+    return 'still discovering'
+end
+local left = redis.call('LLEN', KEYS[2]) + redis.call('ZCARD', KEYS[3])
+if left > 0 then
+    return left .. ' files left'
+end
+redis.call('DEL', unpack(KEYS))
+redis.call('SET', KEYS[1], ARGV[1])
+return false
+"""
+
+# Takes up to ARGV[2] items, those whose lease has run out first, and
+# leases them for ARGV[1] seconds. Items tried more than ARGV[3] times are
+# moved to the failed list instead. Time is the server's, so the clocks of
+# the nodes need not agree.
+_CLAIM = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local count = tonumber(ARGV[2])
+local items = redis.call(
+    'ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, count
+)
+while #items < count do
+    local item = redis.call('LPOP', KEYS[1])
+    if not item then break end
+    table.insert(items, item)
+end
+local claimed = {}
+for _, item in ipairs(items) do
+    if redis.call('HINCRBY', KEYS[3], item, 1) > tonumber(ARGV[3]) then
+        redis.call('ZREM', KEYS[2], item)
+        redis.call('HDEL', KEYS[3], item)
+        redis.call('RPUSH', KEYS[4], item)
+    else
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[1]), item)
+        table.insert(claimed, item)
+    end
+end
+return claimed
+"""
+
+# Extends the leases of those of ARGV[2...] that are still leased
+_RENEW = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[1]), ARGV[i])
+end
+return #ARGV - 1
+"""
+
+# Reserves destination ARGV[1] for source ARGV[2], returning the source
+# holding it if another one does
+_RESERVE = """
+local holder = redis.call('HGET', KEYS[1], ARGV[1])
+if not holder then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return false
+end
+if holder == ARGV[2] then
+    return false
+end
+return holder
+"""
+
+# Releases destination ARGV[1], only if source ARGV[2] holds it
+_RELEASE = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+def connect(url: str = Config.QUEUE_URL):
+    """
+    Connects to the Redis server at url, such as redis://nas:6379/0, or
+    else to the redislite database file at url, whose server is started on
+    first use and shared by every process of this host.
+    """
+    if "://" in url:
+        import redis
+
+        return redis.Redis.from_url(url)
+
+    import redislite
+
+    path = os.path.abspath(os.path.expanduser(url))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return redislite.Redis(path)
+
+
+def _encode(record: FileRecord) -> str:
+    return json.dumps(list(record))
+
+
+def _decode(item: bytes) -> FileRecord:
+    return FileRecord._make(json.loads(item))
+
+
+class WorkQueue:
+    """
+    The files of one organize job, shared by the nodes working on it
+    through a Redis server.
+
+    A coordinator pushes files as they are discovered. Workers claim a
+    few at a time, each under a lease that they renew while they work and
+    that lets other workers retry the files once it runs out, as when a
+    worker crashes. A file is tried at most max_attempts times, then moved
+    to the failed list. Workers also reserve each destination before
+    writing it, so two nodes never write the same target. Reservations
+    last as long as the job: the next one starts afresh, and sees what
+    was written in the library instead.
+
+    All keys start with name, so several jobs can share a server.
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str = Config.QUEUE_NAME,
+        lease_time: float = Config.QUEUE_LEASE_TIME,
+        max_attempts: int = Config.QUEUE_MAX_ATTEMPTS,
+    ):
+        self.client = client
+        self.name = name
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+
+        self.state_key = f"{name}:state"
+        self.pending_key = f"{name}:pending"
+        self.leases_key = f"{name}:leases"
+        self.attempts_key = f"{name}:attempts"
+        self.failed_key = f"{name}:failed"
+        self.reserved_key = f"{name}:reserved"
+        self.outcomes_key = f"{name}:outcomes"
+
+        self.started = False
+
+        self._start = client.register_script(_START)
+        self._claim = client.register_script(_CLAIM)
+        self._renew = client.register_script(_RENEW)
+        self._reserve = client.register_script(_RESERVE)
+        self._release = client.register_script(_RELEASE)
+
+    def start(self):
+        """
+        Starts a new job, marked as being discovered so workers wait for
+        files. Raises RuntimeError while an earlier job is unfinished.
+        """
+        if self.started:
+            return
+        busy = self._start(keys=self._keys(), args=[DISCOVERING])
+        if busy:
+            raise RuntimeError(
+                f"Job '{self.name}' is unfinished ({busy.decode()}). Run "
+                "workers to finish it, or clear it with --clear-queue."
+            )
+        self.started = True
+
+    def push(self, records: Iterable[FileRecord]) -> int:
+        items = [_encode(record) for record in records]
+        if items:
+            self.client.rpush(self.pending_key, *items)
+        return len(items)
+
+    def finish(self, aborted: bool = False):
+        """Marks discovery as over, so workers stop once the queue is."""
+        self.client.set(self.state_key, ABORTED if aborted else DISCOVERED)
+
+    def claim(self, count: int = 1) -> List[Tuple[bytes, FileRecord]]:
+        """Leases up to count files, returning each with its queue item."""
+        items = self._claim(
+            keys=[
+                self.pending_key,
+                self.leases_key,
+                self.attempts_key,
+                self.failed_key,
+            ],
+            args=[self.lease_time, count, self.max_attempts],
+        )
+        return [(item, _decode(item)) for item in items]
+
+    def renew(self, items: Iterable[bytes]):
+        items = list(items)
+        if items:
+            self._renew(keys=[self.leases_key], args=[self.lease_time, *items])
+
+    def done(self, item: bytes, outcome: str):
+        """Removes a file that was handled, counting its outcome."""
+        pipe = self.client.pipeline()
+        pipe.zrem(self.leases_key, item)
+        pipe.hdel(self.attempts_key, item)
+        pipe.hincrby(self.outcomes_key, outcome, 1)
+        pipe.execute()
+
+    def retry(self, item: bytes):
+        """Puts a file back at the end of the queue for any worker."""
+        pipe = self.client.pipeline()
+        pipe.zrem(self.leases_key, item)
+        pipe.rpush(self.pending_key, item)
+        pipe.execute()
+
+    def reserve(
+        self, destination: Union[str, Path], source: Union[str, Path]
+    ) -> Optional[str]:
+        """
+        Reserves destination for source. Returns None if source holds it,
+        as it does when retrying, otherwise the source that does.
+        """
+        holder = self._reserve(
+            keys=[self.reserved_key],
+            args=[os.fsencode(destination), os.fsencode(source)],
+        )
+        return os.fsdecode(holder) if holder else None
+
+    def release(self, destination: Union[str, Path], source: Union[str, Path]):
+        self._release(
+            keys=[self.reserved_key],
+            args=[os.fsencode(destination), os.fsencode(source)],
+        )
+
+    def is_done(self) -> bool:
+        """Whether discovery is over and every file has been handled."""
+        pipe = self.client.pipeline()
+        pipe.get(self.state_key)
+        pipe.llen(self.pending_key)
+        pipe.zcard(self.leases_key)
+        state, pending, leased = pipe.execute()
+        return (
+            state in (DISCOVERED.encode(), ABORTED.encode())
+            and not pending
+            and not leased
+        )
+
+    def status(self) -> Dict:
+        pipe = self.client.pipeline()
+        pipe.get(self.state_key)
+        pipe.llen(self.pending_key)
+        pipe.zcard(self.leases_key)
+        pipe.llen(self.failed_key)
+        pipe.hgetall(self.outcomes_key)
+        state, pending, leased, failed, outcomes = pipe.execute()
+        return {
+            "state": state.decode() if state else None,
+            "pending": pending,
+            "leased": leased,
+            "failed": failed,
+            "outcomes": {
+                key.decode(): int(value) for key, value in outcomes.items()
+            },
+        }
+
+    def failed(self) -> List[FileRecord]:
+        return [
+            _decode(item)
+            for item in self.client.lrange(self.failed_key, 0, -1)
+        ]
+
+    def clear(self):
+        """Forgets the job, its files, reservations and outcomes."""
+        self.client.delete(*self._keys())
+        self.started = False
+
+    def _keys(self) -> List[str]:
+        return [
+            self.state_key,
+            self.pending_key,
+            self.leases_key,
+            self.attempts_key,
+            self.failed_key,
+            self.reserved_key,
+            self.outcomes_key,
+        ]
+
+
+class Coordinator:
+    """
+    Walks the inputs of a MediaScan and queues their files for workers.
+
+    Only files that are media, or non-media files that are to be deleted,
+    are queued. At most max_pending files wait in the queue, so a huge
+    tree does not have to fit in the server's memory.
+    """
+
+    def __init__(
+        self,
+        media_scan,
+        work_queue: WorkQueue,
+        batch_size: int = 500,
+        max_pending: int = Config.QUEUE_MAX_PENDING,
+        poll_interval: float = Config.QUEUE_POLL_INTERVAL,
+    ):
+        self.media_scan = media_scan
+        self.queue = work_queue
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+
+    def run(self, stop: Optional[threading.Event] = None) -> int:
+        """Queues every file, returning how many were queued."""
+        stop = stop or threading.Event()
+        media_scan = self.media_scan
+        deleting = media_scan.action == "move" and media_scan.delete_non_media
+
+        self.queue.start()
+        queued = 0
+        complete = False
+        try:
+            batch: List[FileRecord] = []
+            for record in media_scan._input_records():
+                if not deleting and not media_scan._is_media_record(record):
+                    continue
+                batch.append(record)
+                if len(batch) < self.batch_size:
+                    continue
+                if not self._wait_for_room(stop):
+                    return queued
+                queued += self.queue.push(batch)
+                batch = []
+            queued += self.queue.push(batch)
+            complete = True
+        finally:
+            # Workers finish what was queued, then stop, however this ends
+            self.queue.finish(aborted=not complete)
+            if complete:
+                logger.info(f"Queued {queued} files")
+            else:
+                logger.warning(f"Stopped after queueing {queued} files")
+        return queued
+
+    def _wait_for_room(self, stop: threading.Event) -> bool:
+        # Returns False if stopped while the queue was full
+        client = self.queue.client
+        while (
+            self.max_pending
+            and client.llen(self.queue.pending_key) >= self.max_pending
+        ):
+            if stop.wait(self.poll_interval):
+                return False
+        return not stop.is_set()
+
+
+class Worker:
+    """
+    Organizes files claimed from a WorkQueue, as scan() would, until the
+    job is done or stop is set.
+
+    Every node must see the inputs and the library at the same paths. A
+    background thread renews the leases of claimed files while they are
+    handled, so long copies are not retried by another node. The queue
+    serves as the MediaScan's reservations, so destinations are reserved
+    before being written: the first source to reserve one wins, as the
+    first walked does in a local scan. A file that fails is put back for
+    any worker to retry.
+    """
+
+    def __init__(
+        self,
+        media_scan,
+        work_queue: WorkQueue,
+        batch_size: int = Config.QUEUE_BATCH_SIZE,
+        poll_interval: float = Config.QUEUE_POLL_INTERVAL,
+    ):
+        self.media_scan = media_scan
+        self.queue = work_queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._leased: Set[bytes] = set()
+        self._lock = threading.Lock()
+
+    def run(self, stop: Optional[threading.Event] = None, wait: bool = False):
+        """
+        Handles queued files until the job is done, or until stop is set
+        when wait is true.
+        """
+        stop = stop or threading.Event()
+        media_scan = self.media_scan
+        media_scan._load_library()
+        media_scan.reservations = self.queue
+
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(finished,),
+            name="mediascan-heartbeat",
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            while not stop.is_set():
+                claimed = self.queue.claim(self.batch_size)
+                if not claimed:
+                    if not wait and self.queue.is_done():
+                        break
+                    stop.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self._leased.update(item for item, _ in claimed)
+                for item, record in claimed:
+                    self._handle(item, record)
+            if media_scan.clean:
+                for path in media_scan.input_paths:
+                    if path.is_dir():
+                        media_scan._clean_empty_folders(path)
+        finally:
+            finished.set()
+            heartbeat.join()
+            media_scan.reservations = None
+            media_scan._finish_scan()
+        logger.info(f"Worker done, handled {self.processed} files")
+
+    def _heartbeat(self, finished: threading.Event):
+        while not finished.wait(self.queue.lease_time / 3):
+            with self._lock:
+                items = list(self._leased)
+            try:
+                self.queue.renew(items)
+            except Exception as e:
+                logger.warning(f"Could not renew leases: {e}")
+
+    def _handle(self, item: bytes, record: FileRecord):
+        try:
+            outcome, _ = self.media_scan._scan_record(record)
+        except Exception as e:
+            logger.error(f"Failed to organize {record.path}: {e}")
+            self.queue.retry(item)
+        else:
+            self.queue.done(item, outcome or UNCHANGED)
+            self.processed += 1
+        finally:
+            with self._lock:
+                self._leased.discard(item)
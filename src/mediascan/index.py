@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from .logging import logger
+from .walker import FileRecord
+
+# Outcomes recorded for each scanned file
+ORGANIZED = "organized"
+EXISTS = "exists"
+IGNORED = "ignored"
+DELETED = "deleted"
+DUPLICATE = "duplicate"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    settings TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    destination TEXT,
+    PRIMARY KEY (settings, path)
+)
+"""
+
+
+class ScanIndex:
+    """
+    Persistent record of files seen by previous scans.
+
+    Each entry is keyed by path and remembers the size, mtime and inode the
+    file had when it was processed, together with the outcome. A file whose
+    stat signature still matches its entry does not need to be processed
+    again.
+
+    Entries are kept apart by settings, a digest of whatever decides what
+    a scan does with a file, such as the output directory, action and
+    templates, so scanning the same input into another library does not
+    skip every file.
+    """
+
+    def __init__(
+        self,
+        index_path: Union[str, Path],
+        settings: str = "",
+        batch_size: int = 500,
+    ):
+        self.index_path = Path(index_path)
+        self.settings = settings
+        self.batch_size = batch_size
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Used from whichever thread scans, such as a watcher's, always
+        # under the lock
+        self.connection = sqlite3.connect(
+            str(self.index_path), check_same_thread=False
+        )
+        columns = [
+            row[1]
+            for row in self.connection.execute("PRAGMA table_info(files)")
+        ]
+        if columns and "settings" not in columns:
+            # Written before entries were kept apart by settings
+            logger.info(f"Rebuilding scan index: {self.index_path}")
+            self.connection.execute("DROP TABLE files")
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+        self._lock = threading.Lock()
+        self._entries = None
+        self._pending = []
+
+    def _load(self) -> Dict[str, Tuple[int, int, int]]:
+        if self._entries is None:
+            rows = self.connection.execute(
+                "SELECT path, size, mtime, inode FROM files "
+                "WHERE settings = ?",
+                (self.settings,),
+            )
+            self._entries = {
+                path: (size, mtime, inode) for path, size, mtime, inode in rows
+            }
+            logger.debug(
+                f"Loaded {len(self._entries)} entries from {self.index_path}"
+            )
+        return self._entries
+
+    def is_unchanged(self, record: FileRecord) -> bool:
+        with self._lock:
+            signature = self._load().get(record.path)
+        return signature == (record.size, record.mtime, record.inode)
+
+    def get(self, path: Union[str, Path]) -> Optional[Dict]:
+        with self._lock:
+            self._flush()
+            row = self.connection.execute(
+                "SELECT size, mtime, inode, outcome, destination FROM files "
+                "WHERE settings = ? AND path = ?",
+                (self.settings, os.fspath(path)),
+            ).fetchone()
+        if row is None:
+            return None
+        size, mtime, inode, outcome, destination = row
+        return {
+            "size": size,
+            "mtime": mtime,
+            "inode": inode,
+            "outcome": outcome,
+            "destination": destination,
+        }
+
+    def add(
+        self,
+        record: FileRecord,
+        outcome: str,
+        destination: Optional[Union[str, Path]] = None,
+    ):
+        signature = (record.size, record.mtime, record.inode)
+        with self._lock:
+            self._load()[record.path] = signature
+            self._pending.append(
+                (
+                    self.settings,
+                    record.path,
+                    *signature,
+                    outcome,
+                    os.fspath(destination) if destination else None,
+                )
+            )
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO files "
+            "(settings, path, size, mtime, inode, outcome, destination) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        self.connection.commit()
+        self._pending = []
+
+    def invalidate(self, prefix: Union[str, Path]) -> int:
+        """
+        Forgets every entry at or below the given path, so those files are
+        processed again on the next scan. Returns the number of entries
+        removed.
+        """
+        prefix = os.fspath(prefix).rstrip(os.sep)
+        directory = prefix + os.sep
+        with self._lock:
+            self._flush()
+            cursor = self.connection.execute(
+                "DELETE FROM files WHERE settings = ? "
+                "AND (path = ? OR substr(path, 1, ?) = ?)",
+                (self.settings, prefix, len(directory), directory),
+            )
+            self.connection.commit()
+            self._entries = None
+        return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self.connection.execute(
+                "DELETE FROM files WHERE settings = ?", (self.settings,)
+            )
+            self.connection.commit()
+            self._entries = {}
+        logger.info(f"Cleared scan index: {self.index_path}")
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
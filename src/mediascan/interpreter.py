@@ -1,128 +1,244 @@
+import hashlib
 import re
-from typing import Dict, Optional, Tuple, List, Union
+from collections import deque
+from functools import cached_property, lru_cache
+from itertools import islice
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Pattern,
+    Tuple,
+    List,
+    Union,
+)
 from datetime import datetime
 
+from .tokenizer import MetadataTokenizer
+
+YEAR_PATTERN = r"\b(19\d{2}|20\d{2})\b"
+
+AUDIO_CODECS = [
+    "MP3",
+    "AAC",
+    "AC3",
+    "DTS",
+    "FLAC",
+    "OGG",
+    "Vorbis",
+    "WMA",
+    "PCM",
+    "LPCM",
+    "DDP?5\\.1",
+    "Atmos",
+]
+VIDEO_CODECS = [
+    "XviD",
+    "x264",
+    "x265",
+    "HEVC",
+    "AVC",
+    "MPEG-2",
+    "MPEG-4",
+    "DivX",
+    "VP8",
+    "VP9",
+    "AV1",
+]
+RESOLUTIONS = [
+    "4320p",
+    "2160p",
+    "1080p",
+    "720p",
+    "480p",
+    "360p",
+    "240p",
+    "8K",
+    "4K",
+    "1080i",
+    "720i",
+    "576p",
+    "576i",
+    "480i",
+]
+BLURAY_SOURCES = ["BluRay", "Blu-Ray", "BDRip", "BRRip"]
+DVD_SOURCES = ["DVDRip", "HDDVD", "DVDScr"]
+WEB_SOURCES = ["WebRip", "WEB-DL", "WEBCap", "HDRip"]
+TV_SOURCES = ["HDTV", "PDTV", "SDTV"]
+CAM_SOURCES = [
+    "CAM",
+    "HDCam",
+    "TS",
+    "TC",
+    "HDTS",
+    "TELESYNC",
+    "Screener",
+    "VODRip",
+]
+LANGUAGES = [
+    "English",
+    "French",
+    "German",
+    "Spanish",
+    "Portuguese",
+    "Korean",
+    "Japanese",
+    "Polish",
+    "Italian",
+    "Hungarian",
+    "Russian",
+    "Chinese",
+    "Mandarin",
+    "Pashto",
+    "Thai",
+    "Indonesian",
+    "Arabic",
+    "Hindi",
+    "Turkish",
+    "Dutch",
+    "Vietnamese",
+    "Swedish",
+]
+EXTENSIONS = [
+    "mp4",
+    "mkv",
+    "avi",
+]
+
+
+@lru_cache(maxsize=None)
+def _compile(pattern: str, flags: int = 0) -> Pattern:
+    """Compiles a pattern once per process, shared by every Interpreter."""
+    return re.compile(pattern, flags)
+
+
+@lru_cache(maxsize=16)
+def _tokenizer(patterns: Tuple[Tuple[str, Pattern], ...]) -> MetadataTokenizer:
+    return MetadataTokenizer(dict(patterns))
+
+
+# Interpreter owned by each worker process
+_worker_interpreter = None
+
+
+def _init_worker(interpreter: "Interpreter"):
+    global _worker_interpreter
+    _worker_interpreter = interpreter
+
+
+def _interpret_chunk(
+    names: List[str], interpreter: Optional["Interpreter"] = None
+) -> List[Dict]:
+    interpreter = interpreter or _worker_interpreter
+    current_year = datetime.now().year
+    return [
+        interpreter._interpret(name, current_year=current_year)
+        for name in names
+    ]
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class Interpreter:
+    # Bump whenever a change to interpret() alters its results
+    VERSION = 1
+
+    # Attributes holding compiled patterns, which version covers
+    PATTERNS = (
+        "year_pattern",
+        "year_in_parentheses_pattern",
+        "episode_pattern",
+        "season_pattern",
+        "date_pattern",
+        "square_brackets_pattern",
+        "proper_repack_pattern",
+        "audio_codec_pattern",
+        "video_codec_pattern",
+        "resolution_pattern",
+        "source_pattern",
+        "language_pattern",
+    )
+
     def __init__(self):
-        self.year_pattern = re.compile(r"\b(19\d{2}|20\d{2})\b")
-        self.year_in_parentheses_pattern = re.compile(
-            r"\((" + self.year_pattern.pattern + r")\)"
-        )
-        self.episode_pattern = re.compile(
+        # Copies, so each instance can extend its own lists. Patterns are
+        # built from them on first use, see _compile().
+        self.audio_codecs = list(AUDIO_CODECS)
+        self.video_codecs = list(VIDEO_CODECS)
+        self.resolutions = list(RESOLUTIONS)
+        self.bluray_sources = list(BLURAY_SOURCES)
+        self.dvd_sources = list(DVD_SOURCES)
+        self.web_sources = list(WEB_SOURCES)
+        self.tv_sources = list(TV_SOURCES)
+        self.cam_sources = list(CAM_SOURCES)
+        self.languages = list(LANGUAGES)
+        self.extensions = list(EXTENSIONS)
+
+    @cached_property
+    def year_pattern(self) -> Pattern:
+        return _compile(YEAR_PATTERN)
+
+    @cached_property
+    def year_in_parentheses_pattern(self) -> Pattern:
+        return _compile(r"\((" + self.year_pattern.pattern + r")\)")
+
+    @cached_property
+    def episode_pattern(self) -> Pattern:
+        return _compile(
             r"S(\d{1,4})E(\d{1,3})|(\d{1,2})x(\d{1,3})", re.IGNORECASE
         )
-        self.season_pattern = re.compile(
+
+    @cached_property
+    def season_pattern(self) -> Pattern:
+        return _compile(
             r"\b(?:S(?:eason)?\s?(\d{1,2}))\b|\(Season\s?(\d{1,2})\)",
             re.IGNORECASE,
         )
-        self.date_pattern = re.compile(r"(\d{4})[-\.\s](\d{2})[-\.\s](\d{2})")
-        self.square_brackets_pattern = re.compile(r"\[.*?\]")
-        self.proper_repack_pattern = re.compile(r"\b(PROPER|REPACK)\b")
-
-        self.audio_codecs = [
-            "MP3",
-            "AAC",
-            "AC3",
-            "DTS",
-            "FLAC",
-            "OGG",
-            "Vorbis",
-            "WMA",
-            "PCM",
-            "LPCM",
-            "DDP?5\\.1",
-            "Atmos",
-        ]
-        self.video_codecs = [
-            "XviD",
-            "x264",
-            "x265",
-            "HEVC",
-            "AVC",
-            "MPEG-2",
-            "MPEG-4",
-            "DivX",
-            "VP8",
-            "VP9",
-            "AV1",
-        ]
-        self.resolutions = [
-            "4320p",
-            "2160p",
-            "1080p",
-            "720p",
-            "480p",
-            "360p",
-            "240p",
-            "8K",
-            "4K",
-            "1080i",
-            "720i",
-            "576p",
-            "576i",
-            "480i",
-        ]
 
-        self.bluray_sources = ["BluRay", "Blu-Ray", "BDRip", "BRRip"]
-        self.dvd_sources = ["DVDRip", "HDDVD", "DVDScr"]
-        self.web_sources = ["WebRip", "WEB-DL", "WEBCap", "HDRip"]
-        self.tv_sources = ["HDTV", "PDTV", "SDTV"]
-        self.cam_sources = [
-            "CAM",
-            "HDCam",
-            "TS",
-            "TC",
-            "HDTS",
-            "TELESYNC",
-            "Screener",
-            "VODRip",
-        ]
+    @cached_property
+    def date_pattern(self) -> Pattern:
+        return _compile(r"(\d{4})[-\.\s](\d{2})[-\.\s](\d{2})")
 
-        self.languages = [
-            "English",
-            "French",
-            "German",
-            "Spanish",
-            "Portuguese",
-            "Korean",
-            "Japanese",
-            "Polish",
-            "Italian",
-            "Hungarian",
-            "Russian",
-            "Chinese",
-            "Mandarin",
-            "Pashto",
-            "Thai",
-            "Indonesian",
-            "Arabic",
-            "Hindi",
-            "Turkish",
-            "Dutch",
-            "Vietnamese",
-            "Swedish",
-        ]
-        self.extensions = [
-            "mp4",
-            "mkv",
-            "avi",
-        ]
+    @cached_property
+    def square_brackets_pattern(self) -> Pattern:
+        return _compile(r"\[.*?\]")
 
-        self.audio_codec_pattern = re.compile(
+    @cached_property
+    def proper_repack_pattern(self) -> Pattern:
+        return _compile(r"\b(PROPER|REPACK)\b")
+
+    @cached_property
+    def audio_codec_pattern(self) -> Pattern:
+        return _compile(
             r"\b(" + "|".join(self.audio_codecs) + r")\b", re.IGNORECASE
         )
+
+    @cached_property
+    def video_codec_pattern(self) -> Pattern:
         # Escape special regex characters in codec names
         escaped_video_codecs = [
             re.escape(codec) for codec in self.video_codecs
         ]
-        self.video_codec_pattern = re.compile(
+        return _compile(
             r"\b(" + "|".join(escaped_video_codecs) + r")\b", re.IGNORECASE
         )
-        self.resolution_pattern = re.compile(
+
+    @cached_property
+    def resolution_pattern(self) -> Pattern:
+        return _compile(
             r"\b(" + "|".join(self.resolutions) + r")\b", re.IGNORECASE
         )
-        self.source_pattern = re.compile(
+
+    @cached_property
+    def source_pattern(self) -> Pattern:
+        return _compile(
             r"\b("
             + "|".join(
                 self.bluray_sources
@@ -134,10 +250,45 @@ class Interpreter:
             + r")\b",
             re.IGNORECASE,
         )
-        self.language_pattern = re.compile(
+
+    @cached_property
+    def language_pattern(self) -> Pattern:
+        return _compile(
             r"\b(" + "|".join(self.languages) + r")\b", re.IGNORECASE
         )
 
+    @cached_property
+    def tokenizer(self) -> MetadataTokenizer:
+        # All of the above metadata patterns, matched in a single pass
+        return _tokenizer(
+            (
+                ("source", self.source_pattern),
+                ("language", self.language_pattern),
+                ("resolution", self.resolution_pattern),
+                ("audio_codec", self.audio_codec_pattern),
+                ("video_codec", self.video_codec_pattern),
+                ("proper", self.proper_repack_pattern),
+            )
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Identifies the rules in use, so cached interpret() results can be
+        discarded when the patterns or token lists change.
+        """
+        parts = [type(self).__qualname__, str(self.VERSION)]
+        values = dict(vars(self))
+        for name in self.PATTERNS:
+            values[name] = getattr(self, name)
+        for key, value in sorted(values.items()):
+            if isinstance(value, re.Pattern):
+                parts.append(f"{key}={value.pattern}/{value.flags}")
+            elif isinstance(value, list):
+                parts.append(f"{key}={value}")
+        digest = hashlib.sha1("\n".join(parts).encode("utf-8"))
+        return digest.hexdigest()[:12]
+
     def remove_square_brackets(self, name: str) -> str:
         return self.square_brackets_pattern.sub("", name)
 
@@ -147,8 +298,11 @@ class Interpreter:
         counts = {delimiter: name.count(delimiter) for delimiter in delimiters}
         return max(counts, key=counts.get)
 
-    def find_year(self, name: str) -> Dict[str, Optional[Union[int, str]]]:
-        current_year = datetime.now().year
+    def find_year(
+        self, name: str, current_year: Optional[int] = None
+    ) -> Dict[str, Optional[Union[int, str]]]:
+        if current_year is None:
+            current_year = datetime.now().year
         # Years in parentheses are unambiguous
         year_matches = list(self.year_in_parentheses_pattern.finditer(name))
         if year_matches:
@@ -270,26 +424,27 @@ class Interpreter:
     def find_source(self, name: str) -> Dict[str, Optional[Union[str, int]]]:
         source_match = self.source_pattern.search(name)
         if source_match:
-            source = source_match.group().lower()
-            if any(x.lower() in source for x in self.bluray_sources):
-                value = "bluray"
-            elif any(x.lower() in source for x in self.dvd_sources):
-                value = "dvd"
-            elif any(x.lower() in source for x in self.web_sources):
-                value = "web"
-            elif any(x.lower() in source for x in self.tv_sources):
-                value = "tv"
-            elif any(x.lower() in source for x in self.cam_sources):
-                value = "cam"
-            else:
-                value = source
             return {
-                "value": value,
+                "value": self.source_type(source_match.group()),
                 "raw": source_match.group(),
                 "index": source_match.start(),
             }
         return {"value": None, "raw": None, "index": None}
 
+    def source_type(self, raw: str) -> str:
+        source = raw.lower()
+        if any(x.lower() in source for x in self.bluray_sources):
+            return "bluray"
+        elif any(x.lower() in source for x in self.dvd_sources):
+            return "dvd"
+        elif any(x.lower() in source for x in self.web_sources):
+            return "web"
+        elif any(x.lower() in source for x in self.tv_sources):
+            return "tv"
+        elif any(x.lower() in source for x in self.cam_sources):
+            return "cam"
+        return source
+
     def find_language(self, name: str) -> Dict[str, Optional[Union[str, int]]]:
         language_match = self.language_pattern.search(name)
         if language_match:
@@ -312,6 +467,35 @@ class Interpreter:
             }
         return {"value": False, "raw": None, "index": None}
 
+    def find_metadata(
+        self, name: str
+    ) -> Dict[str, Dict[str, Optional[Union[bool, str, int]]]]:
+        """
+        Finds the source, language, resolution, codecs and proper/repack
+        flag in a single pass over the name. Each entry is the same as the
+        result of the matching find_* method.
+        """
+        tokens = self.tokenizer.search(name)
+        metadata = {}
+        for category, token in tokens.items():
+            if token is None:
+                metadata[category] = {
+                    "value": False if category == "proper" else None,
+                    "raw": None,
+                    "index": None,
+                }
+                continue
+
+            raw, index = token
+            if category == "source":
+                value = self.source_type(raw)
+            elif category == "proper":
+                value = True
+            else:
+                value = raw
+            metadata[category] = {"value": value, "raw": raw, "index": index}
+        return metadata
+
     def split_extension(self, name: str) -> Tuple[str, str]:
         parts = name.rsplit(".", 1)
         if len(parts) == 1 or parts[1] not in self.extensions:
@@ -328,9 +512,59 @@ class Interpreter:
         self,
         name: str,
         match_title: bool = False,
+    ) -> Dict:
+        return self._interpret(name)
+
+    def interpret_directory(self, name: str) -> Dict:
+        """
+        Interprets a directory name, such as a release folder. Unlike a
+        file name, its last dotted part is never an extension.
+        """
+        return self._interpret(name, directory=True)
+
+    def interpret_many(
+        self,
+        names: Iterable[str],
+        processes: Optional[int] = None,
+        chunksize: int = 256,
+    ) -> Iterator[Dict]:
+        """
+        Interprets a stream of names, yielding one result per name in input
+        order. Results are identical to calling interpret() on each name.
+
+        Names are consumed lazily, so arbitrarily large iterables can be
+        processed. With processes > 1, chunks of names are fanned out to a
+        process pool, with only a few chunks per process in flight.
+        """
+        if not processes or processes <= 1:
+            current_year = datetime.now().year
+            interpret = self._interpret
+            for name in names:
+                yield interpret(name, current_year=current_year)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            pending = deque()
+            for chunk in _chunks(names, chunksize):
+                pending.append(executor.submit(_interpret_chunk, chunk))
+                if len(pending) >= processes * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _interpret(
+        self,
+        name: str,
+        current_year: Optional[int] = None,
+        directory: bool = False,
     ) -> Dict:
         # Handle filenames
-        name, extension = self.split_extension(name)
+        if not directory:
+            name, extension = self.split_extension(name)
 
         # Cleaning
         name = self.remove_square_brackets(name)
@@ -339,12 +573,13 @@ class Interpreter:
         delimiter = self.determine_delimiter(name)
 
         # Match the metadata tokens. These all appear at the end of the name
-        source_match = self.find_source(name)
-        language_match = self.find_language(name)
-        resolution_match = self.find_resolution(name)
-        audio_codec_match = self.find_audio_codec(name)
-        video_codec_match = self.find_video_codec(name)
-        proper_repack_match = self.is_proper_or_repack(name)
+        metadata = self.find_metadata(name)
+        source_match = metadata["source"]
+        language_match = metadata["language"]
+        resolution_match = metadata["resolution"]
+        audio_codec_match = metadata["audio_codec"]
+        video_codec_match = metadata["video_codec"]
+        proper_repack_match = metadata["proper"]
         metadata_matches = [
             source_match,
             language_match,
@@ -394,7 +629,7 @@ class Interpreter:
         name = name[:title_before].strip()
 
         # Find the year
-        year_match = self.find_year(name)
+        year_match = self.find_year(name, current_year)
         if year_match:
             name = name[: year_match["index"]].strip()
 
@@ -0,0 +1,132 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Set, Union
+
+from .logging import logger
+
+
+class LibraryIndex:
+    """
+    In-memory view of the directories and files in the output library.
+
+    The tree is read once with os.scandir by load(), after which existence
+    checks and directory creation are answered from memory and kept up to
+    date as files are added. Only directories that are really missing are
+    created on disk. Until the index is loaded, every call goes straight to
+    the filesystem, which is cheaper for runs that touch a single file.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = os.path.abspath(root)
+        self.loaded = False
+        self.directories: Set[str] = set()
+        self.files: Set[str] = set()
+        self.subdirectories: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        directories = {self.root}
+        files = set()
+        subdirectories = {self.root: set()}
+
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_directory = False
+                if is_directory:
+                    directories.add(entry.path)
+                    subdirectories[directory].add(entry.name)
+                    subdirectories[entry.path] = set()
+                    stack.append(entry.path)
+                else:
+                    files.add(entry.path)
+
+        with self._lock:
+            self.directories = directories
+            self.files = files
+            self.subdirectories = subdirectories
+            self.loaded = True
+        logger.debug(
+            f"Loaded library index: {len(directories)} directories, "
+            f"{len(files)} files"
+        )
+
+    def unload(self):
+        """Goes back to answering every call from the filesystem."""
+        with self._lock:
+            self.loaded = False
+            self.directories = set()
+            self.files = set()
+            self.subdirectories = {}
+
+    def _covers(self, path: str) -> bool:
+        return self.loaded and (
+            path == self.root or path.startswith(self.root + os.sep)
+        )
+
+    def exists(self, path: Union[str, Path]) -> bool:
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            return os.path.lexists(path)
+        return path in self.files or path in self.directories
+
+    def is_file(self, path: Union[str, Path]) -> bool:
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            return os.path.isfile(path)
+        return path in self.files
+
+    def makedirs(self, path: Union[str, Path]):
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            os.makedirs(path, exist_ok=True)
+            return
+
+        with self._lock:
+            # Find the nearest ancestor that is known to exist
+            missing = []
+            while path not in self.directories:
+                missing.append(path)
+                path = os.path.dirname(path)
+
+            for directory in reversed(missing):
+                try:
+                    os.mkdir(directory)
+                except FileExistsError:
+                    pass
+                self.directories.add(directory)
+                self.subdirectories[directory] = set()
+                parent, name = os.path.split(directory)
+                self.subdirectories[parent].add(name)
+
+    def add_file(self, path: Union[str, Path]):
+        path = os.path.abspath(path)
+        if self._covers(path):
+            with self._lock:
+                self.files.add(path)
+
+    def remove_file(self, path: Union[str, Path]):
+        path = os.path.abspath(path)
+        if self._covers(path):
+            with self._lock:
+                self.files.discard(path)
+
+    def list_subdirectories(self, path: Union[str, Path]) -> List[str]:
+        path = os.path.abspath(path)
+        if not self._covers(path):
+            try:
+                with os.scandir(path) as it:
+                    return sorted(entry.name for entry in it if entry.is_dir())
+            except OSError:
+                return []
+        return sorted(self.subdirectories.get(path, ()))
@@ -1,19 +1,35 @@
 from loguru import logger
 import sys
+import threading
+import time
+from collections import Counter
 
 from .config import Config
 
 
-def configure_logging(log_level=None):
+def configure_logging(log_level=None, enqueue=None):
+    """
+    Replaces any loguru handlers with the command line's file and console
+    sinks. Only called by entry points, so applications embedding
+    MediaScan keep their own logging setup.
+    """
     # Remove any existing handlers
     logger.remove()
 
+    # Sinks are written by a background thread, so slow disks and
+    # terminals do not hold up the scan
+    if enqueue is None:
+        enqueue = Config.LOG_ENQUEUE
+
     # Default logger
     logger.add(
         Config.LOG_PATH,
         level=log_level or Config.LOG_LEVEL,
         rotation=Config.LOG_ROTATION,
         retention=Config.LOG_RETENTION,
+        enqueue=enqueue,
+        # The log directory is only created once there is something to log
+        delay=True,
     )
 
     # Console output
@@ -21,7 +37,81 @@ def configure_logging(log_level=None):
         sys.stderr,
         level=log_level or Config.LOG_LEVEL,
         format="<level>{level}: {message}</level>",
+        enqueue=enqueue,
     )
 
 
-configure_logging()
+class FileLog:
+    """
+    Logs per-file messages for a run, sampling them on large runs.
+
+    The first limit files are logged at INFO, later ones at DEBUG, so
+    huge batches do not format and write a line per file. Outcomes are
+    tallied instead, with a progress line every interval seconds and a
+    summary when the run finishes. Messages take loguru style {} arguments,
+    which are only formatted when a sink accepts the level.
+    """
+
+    def __init__(
+        self,
+        limit: int = Config.LOG_SAMPLE_LIMIT,
+        interval: float = Config.LOG_PROGRESS_INTERVAL,
+    ):
+        self.limit = limit
+        self.interval = interval
+        self.files = 0
+        self.outcomes: Counter = Counter()
+        self._last_progress = time.monotonic()
+        self._lock = threading.Lock()
+
+    def file(self, message: str, *args):
+        with self._lock:
+            self.files += 1
+            files = self.files
+        if not self.limit or files <= self.limit:
+            logger.opt(depth=1).info(message, *args)
+            if files == self.limit:
+                logger.info(
+                    "Logged {} files, only progress is logged from here "
+                    "(use --verbose for every file)",
+                    files,
+                )
+        else:
+            logger.opt(depth=1).debug(message, *args)
+
+    def action(self, message: str, *args):
+        """Logs a message about the current file at the same level."""
+        if not self.limit or self.files <= self.limit:
+            logger.opt(depth=1).info(message, *args)
+        else:
+            logger.opt(depth=1).debug(message, *args)
+
+    def outcome(self, outcome: str):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            now = time.monotonic()
+            if now - self._last_progress < self.interval:
+                return
+            self._last_progress = now
+            files, tally = self.files, self._tally()
+        logger.info("Progress: {} files, {}", files, tally)
+
+    def finish(self):
+        """Logs a summary of the run and starts counting afresh."""
+        with self._lock:
+            if self.files:
+                logger.info(
+                    "Processed {} files, {}", self.files, self._tally()
+                )
+            self.files = 0
+            self.outcomes.clear()
+            self._last_progress = time.monotonic()
+
+    def _tally(self) -> str:
+        return (
+            ", ".join(
+                f"{count} {outcome}"
+                for outcome, count in sorted(self.outcomes.items())
+            )
+            or "none finished"
+        )
@@ -1,35 +1,99 @@
+import hashlib
+import json
 import os
 import re
-import shutil
-from typing import List, Dict, Tuple
+import threading
+import time
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from pathlib import Path
 
+from .cache import InterpretCache
+from .cleanup import prune_empty_directories
 from .config import Config
+from .context import DirectoryContext
+from .copier import copy_file, move_file
+from .index import ScanIndex, ORGANIZED, EXISTS, IGNORED, DELETED, DUPLICATE
 from .interpreter import Interpreter
-from .logging import logger
+from .library import LibraryIndex
+from .logging import FileLog, logger
+from .planner import PlanEntry, Planner, execute_plan, read_plan
+from .profiling import NullProfiler, Profiler
+from .rules import FileRules
+from .templates import (
+    DATED_EPISODE_FIELDS,
+    EPISODE_FIELDS,
+    MOVIE_FIELDS,
+    Template,
+    compile_template,
+    title_case,
+)
+from .transfer import BandwidthLimiter, TransferScheduler
+from .walker import FileRecord, stat_record, walk, walk_roots
+
+# An existing show folder, "Title (Year)"
+SHOW_FOLDER_PATTERN = re.compile(r"^(?P<title>.+?)\s*\((?P<year>\d{4})\)$")
 
 
 class MediaScan:
     def __init__(
         self,
-        input_path: str,
+        input_path: Union[str, Sequence[str]],
         output_dir: str,
         action: str = "link",
         movies_dir: str = Config.MOVIES_DIR,
         tv_shows_dir: str = Config.TV_SHOWS_DIR,
         extensions: dict = Config.EXTENSIONS,
-        movie_path: str = Config.MOVIE_PATH,
-        movie_path_no_year: str = Config.MOVIE_PATH_NO_YEAR,
-        episode_path: str = Config.EPISODE_PATH,
-        episode_path_no_year: str = Config.EPISODE_PATH_NO_YEAR,
-        dated_episode_path: str = Config.DATED_EPISODE_PATH,
+        movie_path: Template = Config.MOVIE_PATH,
+        movie_path_no_year: Template = Config.MOVIE_PATH_NO_YEAR,
+        episode_path: Template = Config.EPISODE_PATH,
+        episode_path_no_year: Template = Config.EPISODE_PATH_NO_YEAR,
+        dated_episode_path: Template = Config.DATED_EPISODE_PATH,
         min_video_size: int = Config.MIN_VIDEO_SIZE,
         min_audio_size: int = Config.MIN_AUDIO_SIZE,
+        exclude: Iterable[str] = Config.EXCLUDE,
+        exclude_patterns: Iterable[str] = Config.EXCLUDE_PATTERNS,
+        include_patterns: Iterable[str] = Config.INCLUDE_PATTERNS,
+        sanitize_paths: bool = Config.SANITIZE_PATHS,
         delete_non_media: bool = Config.DELETE_NON_MEDIA,
         prefer_existing_folders: bool = False,
+        directory_context: bool = Config.DIRECTORY_CONTEXT,
         clean: bool = Config.CLEAN,
+        index_path: Optional[str] = None,
+        rebuild_index: bool = False,
+        workers: int = Config.WORKERS,
+        executor: str = Config.EXECUTOR,
+        interpret_cache_size: int = Config.INTERPRET_CACHE_SIZE,
+        interpret_cache_memory: int = Config.INTERPRET_CACHE_MEMORY,
+        interpret_cache_path: Optional[str] = None,
+        transfers: int = Config.TRANSFERS,
+        transfers_per_device: int = Config.TRANSFERS_PER_DEVICE,
+        large_file_size: int = Config.LARGE_FILE_SIZE,
+        bandwidth_limit: float = Config.BANDWIDTH_LIMIT,
+        profile: bool = False,
+        profile_path: Optional[str] = None,
+        metrics_port: Optional[int] = None,
+        metrics_address: str = Config.METRICS_ADDRESS,
+        metrics_textfile: Optional[str] = None,
+        log_sample_limit: int = Config.LOG_SAMPLE_LIMIT,
+        dedup: Optional[str] = None,
+        dedup_index_path: str = Config.DEDUP_INDEX_PATH,
+        dedup_verify: bool = False,
     ):
-        self.input_path = Path(input_path)
+        # Several inputs, such as one per download disk, are organized
+        # into the one library by a single run
+        if isinstance(input_path, (str, os.PathLike)):
+            input_path = [input_path]
+        self.input_paths = _input_roots(input_path)
         self.output_dir = Path(output_dir)
         self.movies_path = self.output_dir / movies_dir
         self.tv_shows_path = self.output_dir / tv_shows_dir
@@ -37,92 +101,545 @@ class MediaScan:
         self.action = action
 
         self.extensions = extensions
-        self.movie_path = movie_path
-        self.movie_path_no_year = movie_path_no_year
-        self.episode_path = episode_path
-        self.episode_path_no_year = episode_path_no_year
-        self.dated_episode_path = dated_episode_path
+        # Parsed once, so a bad template fails here rather than mid-scan
+        self.movie_path = compile_template(
+            movie_path, MOVIE_FIELDS, sanitize_paths
+        )
+        self.movie_path_no_year = compile_template(
+            movie_path_no_year, MOVIE_FIELDS, sanitize_paths
+        )
+        self.episode_path = compile_template(
+            episode_path, EPISODE_FIELDS, sanitize_paths
+        )
+        self.episode_path_no_year = compile_template(
+            episode_path_no_year, EPISODE_FIELDS, sanitize_paths
+        )
+        self.dated_episode_path = compile_template(
+            dated_episode_path, DATED_EPISODE_FIELDS, sanitize_paths
+        )
         self.min_video_size = min_video_size
         self.min_audio_size = min_audio_size
+        # Which files are media, compiled once
+        self.rules = FileRules(
+            extensions,
+            {"video": min_video_size, "audio": min_audio_size},
+            exclude,
+            exclude_patterns,
+            include_patterns,
+        )
         self.delete_non_media = delete_non_media
         self.prefer_existing_folders = prefer_existing_folders
         self.clean = clean
+        # Directories files were moved or deleted from, for clean
+        self._emptied: Set[str] = set()
+        self.workers = workers
+        self.executor = executor
+        self.transfers = transfers
+        self.transfers_per_device = transfers_per_device
+        self.large_file_size = large_file_size
+
+        # Shared by every copy, in bytes per second
+        self.bandwidth_limiter = None
+        if bandwidth_limit:
+            self.bandwidth_limiter = BandwidthLimiter(
+                bandwidth_limit * 1024 * 1024
+            )
 
         self.interpreter = Interpreter()
 
-        if not self.input_path.exists():
-            raise FileNotFoundError(f"Input '{input_path}' does not exist.")
+        # Release folders interpreted once for all the files inside them
+        self.context = None
+        if directory_context:
+            self.context = DirectoryContext(self.interpreter)
+
+        # Per-file logging, sampled on large runs
+        self.file_log = FileLog(log_sample_limit)
+
+        # Per-stage timing, a no-op unless asked for
+        self.profiler = NullProfiler()
+        if profile or profile_path:
+            self.profiler = Profiler(profile_path)
+
+        # Prometheus metrics, served over HTTP or written after each scan
+        self.metrics = None
+        self.metrics_textfile = metrics_textfile
+        if metrics_port is not None or metrics_textfile:
+            from .metrics import Metrics
+
+            self.metrics = Metrics()
+            if metrics_port is not None:
+                self.metrics.serve(metrics_port, metrics_address)
+
+        # Memoize interpreter results, optionally across runs
+        self.interpret_cache = None
+        if interpret_cache_size > 0 or interpret_cache_path:
+            self.interpret_cache = InterpretCache(
+                self.interpreter,
+                max_entries=interpret_cache_size,
+                max_bytes=interpret_cache_memory,
+                path=(
+                    os.path.expanduser(interpret_cache_path)
+                    if interpret_cache_path
+                    else None
+                ),
+            )
+
+        # Remember processed files between runs
+        self.index = None
+        if index_path:
+            self.index = ScanIndex(
+                os.path.expanduser(index_path),
+                self._settings_digest(
+                    exclude, exclude_patterns, include_patterns
+                ),
+            )
+            if rebuild_index:
+                self.index.clear()
+
+        for path in self.input_paths:
+            if not path.exists():
+                raise FileNotFoundError(f"Input '{path}' does not exist.")
         if not self.output_dir.exists():
             os.makedirs(self.output_dir, exist_ok=True)
 
+        # Existence checks against the output tree
+        self.library = LibraryIndex(self.output_dir)
+        # Destinations shared with other nodes, such as a WorkQueue, which
+        # must be reserved before they are written
+        self.reservations = None
+
+        # Fingerprints of the library, to skip or report files already in
+        # it under another name
+        self.dedup = dedup
+        self.dedup_verify = dedup_verify
+        self.duplicates = None
+        if dedup:
+            from .dedup import DEDUP_MODES, DuplicateIndex
+
+            if dedup not in DEDUP_MODES:
+                raise ValueError(
+                    f"Unknown dedup mode '{dedup}'. "
+                    f"Expected one of: {', '.join(DEDUP_MODES)}"
+                )
+            self.duplicates = DuplicateIndex(
+                os.path.expanduser(dedup_index_path),
+                self.output_dir,
+                self._media_extensions(),
+            )
+
         # Load existing years
         self.existing_tv_shows = {}
         if self.prefer_existing_folders:
             self.existing_tv_shows = self._get_existing_tv_show_folders()
 
-    def scan(self):
-        logger.info(f"Scanning: {self.input_path}")
+    def _settings_digest(self, *rules) -> str:
+        """
+        Digest of the settings that decide what a scan does with a file,
+        under which the scan index remembers it.
+        """
+        templates = [
+            template.template
+            for template in (
+                self.movie_path,
+                self.movie_path_no_year,
+                self.episode_path,
+                self.episode_path_no_year,
+                self.dated_episode_path,
+            )
+        ]
+        settings = [
+            os.path.abspath(self.output_dir),
+            os.fspath(self.movies_path),
+            os.fspath(self.tv_shows_path),
+            self.action,
+            templates,
+            self.movie_path.sanitize,
+            self.extensions,
+            self.min_video_size,
+            self.min_audio_size,
+            [list(rule) for rule in rules],
+            self.delete_non_media,
+            self.prefer_existing_folders,
+            self.context is not None,
+        ]
+        encoded = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.blake2b(encoded.encode(), digest_size=8).hexdigest()
+
+    @property
+    def input_path(self) -> Path:
+        """The first input, or the only one."""
+        return self.input_paths[0]
+
+    def scan(
+        self, plan: Optional[Union[str, Path, Iterable[PlanEntry]]] = None
+    ):
+        """
+        Organizes the input path. When a plan is given, either a JSON Lines
+        file written by plan() or its entries, it is carried out instead.
+        """
+        if plan is not None:
+            self.profiler.start()
+            try:
+                self._execute_plan(plan)
+            finally:
+                self.profiler.stop()
+            return
 
-        if self.input_path.is_file():
-            self.process(self.input_path)
-        elif self.input_path.is_dir():
-            for file_path in self._walk_directory(self.input_path):
-                self.process(file_path)
-            if self.clean:
-                self._clean_empty_folders(self.input_path)
+        logger.info("Scanning: {}", ", ".join(map(str, self.input_paths)))
+
+        self.profiler.start()
+        try:
+            if len(self.input_paths) == 1 and self.input_path.is_file():
+                record = stat_record(self.input_path)
+                if record:
+                    self._scan_record(record)
+            elif len(self.input_paths) > 1 or self.input_path.is_dir():
+                self._load_library()
+                records = self._input_records()
+                if self.workers > 1 or self._uses_transfers():
+                    from .pipeline import Pipeline
+
+                    Pipeline(self, self.workers, self.executor).run(records)
+                else:
+                    for record in records:
+                        self._scan_record(record)
+                if self.clean:
+                    for path in self.input_paths:
+                        if path.is_dir():
+                            self._clean_empty_folders(path)
+            else:
+                logger.error(
+                    f"Input {self.input_path} is neither a file nor a "
+                    "directory"
+                )
+        finally:
+            self._finish_scan()
+            self.profiler.stop()
+
+    def plan(self) -> Iterator[PlanEntry]:
+        """
+        Yields what scan() would do with each file, without touching the
+        input or output trees.
+        """
+        return Planner(self, self.workers).plan()
+
+    def _execute_plan(self, plan: Union[str, Path, Iterable[PlanEntry]]):
+        if isinstance(plan, (str, Path)):
+            logger.info(f"Executing plan: {plan}")
+            with open(plan, encoding="utf-8") as f:
+                execute_plan(self, read_plan(f), self.workers)
         else:
-            logger.error(
-                f"Input {self.input_path} is neither a file nor a directory"
+            execute_plan(self, plan, self.workers)
+
+    def watch(
+        self,
+        settle_time: float = Config.WATCH_SETTLE_TIME,
+        poll_interval: float = Config.WATCH_POLL_INTERVAL,
+        backend: str = Config.WATCH_BACKEND,
+        stop: Optional[threading.Event] = None,
+    ):
+        """
+        Organizes the input directory, then keeps organizing files as they
+        finish writing until stop is set.
+        """
+        if len(self.input_paths) > 1:
+            raise ValueError("Only a single input directory can be watched")
+        if not self.input_path.is_dir():
+            raise NotADirectoryError(
+                f"Input '{self.input_path}' is not a directory."
             )
+        self.profiler.start()
+        try:
+            self._watch(settle_time, poll_interval, backend, stop)
+        finally:
+            self.profiler.stop()
+
+    def _watch(
+        self,
+        settle_time: float,
+        poll_interval: float,
+        backend: str,
+        stop: Optional[threading.Event],
+    ):
+        self.scan()
 
-    def process(self, file_path: Path) -> None:
-        logger.info(f"Processing file: {file_path}")
+        # Few files arrive at a time, so check the disk rather than risk
+        # acting on a stale view of the library
+        self.library.unload()
 
-        if self._is_media_file(file_path):
-            self._process_file(file_path)
-        elif self.action == "move" and self.delete_non_media:
-            logger.info(f"Deleting non-media file: {file_path}")
-            os.remove(file_path)
+        from .watch import Watcher
 
-    def _walk_directory(self, directory: Path) -> List[Path]:
-        for root, _, files in os.walk(directory):
-            for file in files:
-                yield Path(root) / file
+        Watcher(
+            self,
+            settle_time=settle_time,
+            poll_interval=poll_interval,
+            backend=backend,
+        ).run(stop)
 
-    def _is_media_file(self, file_path: Path) -> bool:
-        if not file_path.is_file():
-            return False
-
-        # Skip files with "sample" in the filename
-        if "sample" in file_path.stem.lower():
-            return False
-
-        # Skip files smaller than the minimum size
-        extension = file_path.suffix.lower()[1:]  # Remove the leading dot
-        size = file_path.stat().st_size
-
-        if (
-            extension in self.extensions["video"]
-            and size < self.min_video_size
-        ):
-            return False
-
-        if (
-            extension in self.extensions["audio"]
-            and size < self.min_audio_size
-        ):
-            return False
-
-        # Check if the file extension is known
-        return (
-            extension in self.extensions["video"]
-            or extension in self.extensions["audio"]
+    def serve(
+        self,
+        socket_path: str = Config.DAEMON_SOCKET,
+        stop: Optional[threading.Event] = None,
+    ):
+        """
+        Organizes the files and directories sent to the daemon socket, by
+        mediascan-client or any other client, until stop is set.
+        """
+        from .daemon import Daemon
+
+        self.profiler.start()
+        try:
+            Daemon(self, socket_path).run(stop)
+        finally:
+            self.profiler.stop()
+
+    def coordinate(self, work_queue, stop: Optional[threading.Event] = None):
+        """
+        Queues the files of the inputs in work_queue, a WorkQueue, for
+        work() to organize on any node.
+        """
+        from .distributed import Coordinator
+
+        logger.info("Queueing: {}", ", ".join(map(str, self.input_paths)))
+        self.profiler.start()
+        try:
+            Coordinator(self, work_queue).run(stop)
+        finally:
+            self.profiler.stop()
+
+    def work(
+        self,
+        work_queue,
+        stop: Optional[threading.Event] = None,
+        wait: bool = False,
+    ):
+        """
+        Organizes files queued in work_queue by coordinate(), until the job
+        is done, or until stop is set when wait is true.
+        """
+        from .distributed import Worker
+
+        self.profiler.start()
+        try:
+            Worker(self, work_queue).run(stop, wait)
+        finally:
+            self.profiler.stop()
+
+    def _uses_transfers(self) -> bool:
+        return self.action in ("copy", "move") and self.transfers > 1
+
+    def _create_transfer_scheduler(self) -> TransferScheduler:
+        return TransferScheduler(
+            workers=self.transfers,
+            per_device=self.transfers_per_device,
+            large_file_size=self.large_file_size,
         )
 
+    def _finish_scan(self):
+        if self.index is not None:
+            with self.profiler.stage("index"):
+                self.index.flush()
+        if self.duplicates is not None:
+            self.duplicates.flush()
+        if self.interpret_cache is not None:
+            self.interpret_cache.flush()
+            logger.debug(self.interpret_cache.summary())
+        self.file_log.finish()
+        if self.metrics is not None:
+            self.metrics.scan_finished()
+            if self.metrics_textfile:
+                self.metrics.write_textfile(self.metrics_textfile)
+
+    def _load_library(self):
+        with self.profiler.stage("library"):
+            self.library.load()
+        if self.duplicates is not None:
+            with self.profiler.stage("dedup"):
+                self.duplicates.load()
+        if self.prefer_existing_folders:
+            self.existing_tv_shows = self._get_existing_tv_show_folders()
+
+    def _scan_record(
+        self, record: FileRecord
+    ) -> Tuple[Optional[str], Optional[Path]]:
+        self._count_scanned()
+        if self.index is not None and self.index.is_unchanged(record):
+            logger.debug("Unchanged since last scan: {}", record.path)
+            self._count_skipped("unchanged")
+            return None, None
+
+        outcome, destination = self._process(record)
+        self._record_outcome(record, outcome, destination)
+        return outcome, destination
+
+    def _record_outcome(
+        self,
+        record: FileRecord,
+        outcome: Optional[str],
+        destination: Optional[Path],
+    ):
+        if outcome is not None:
+            self.file_log.outcome(outcome)
+            self.profiler.count(outcome)
+            if self.metrics is None:
+                pass
+            elif outcome == DELETED:
+                self.metrics.files_deleted.inc()
+            elif outcome != ORGANIZED:
+                # Organized files are counted by action in _perform_action
+                self._count_skipped(outcome)
+        if self.index is None or outcome in (None, DELETED):
+            return
+        # Moved files are gone from the input, so there is nothing to skip
+        if outcome == ORGANIZED and self.action == "move":
+            return
+        with self.profiler.stage("index"):
+            self.index.add(record, outcome, destination)
+
+    def _count_scanned(self, count: int = 1):
+        self.profiler.count("files", count)
+        if self.metrics is not None:
+            self.metrics.files_scanned.inc(count)
+
+    def _count_skipped(self, reason: str):
+        if self.metrics is not None:
+            self.metrics.files_skipped.inc(reason=reason)
+
+    def process(self, file_path: Path) -> Optional[str]:
+        record = stat_record(file_path)
+        if record is None:
+            logger.info(f"Not a file: {file_path}")
+            return None
+        outcome, _ = self._process(record)
+        return outcome
+
+    def _process(self, record: FileRecord) -> Tuple[str, Optional[Path]]:
+        self.file_log.file("Processing file: {}", record.path)
+
+        reason = self._rejection(record)
+        if reason is None:
+            return self._process_file(Path(record.path))
+        logger.debug("Not media ({}): {}", reason, record.path)
+        if self.action == "move" and self.delete_non_media:
+            return self._delete_file(record), None
+        return IGNORED, None
+
+    def _delete_file(self, record: FileRecord) -> str:
+        self.file_log.action("Deleting non-media file: {}", record.path)
+        start = time.perf_counter()
+        with self.profiler.stage("delete"):
+            os.remove(record.path)
+        self._source_removed(record.path)
+        if self.metrics is not None:
+            self.metrics.action_seconds.observe(
+                time.perf_counter() - start, action="delete"
+            )
+        return DELETED
+
+    def _input_records(self) -> Iterator[FileRecord]:
+        """
+        Yields a record for every input file. When there are several input
+        directories, each is walked by its own process.
+        """
+        directories = []
+        for path in self.input_paths:
+            if path.is_dir():
+                directories.append(path)
+            else:
+                record = stat_record(path)
+                if record is not None:
+                    yield record
+        if not directories:
+            return
+        yield from self.profiler.iterate(
+            "walk", walk_roots(directories, self._candidate_extensions())
+        )
+
+    def _walk_directory(self, directory: Path) -> Iterator[FileRecord]:
+        return self.profiler.iterate(
+            "walk", walk(directory, self._candidate_extensions())
+        )
+
+    def _candidate_extensions(self) -> Optional[Set[str]]:
+        # Non-media files are only of interest when they are to be deleted
+        if self.action == "move" and self.delete_non_media:
+            return None
+        return self._media_extensions()
+
+    def _media_extensions(self) -> Set[str]:
+        return self.rules.extensions
+
+    def _is_media_file(self, file_path: Path) -> bool:
+        record = stat_record(file_path)
+        return record is not None and self._is_media_record(record)
+
+    def _is_media_record(self, record: FileRecord) -> bool:
+        return self._rejection(record) is None
+
+    def _rejection(self, record: FileRecord) -> Optional[str]:
+        # Why the record is not media to organize, None if it is
+        return self.rules.reject(record)
+
     def _process_file(self, file_path: Path):
-        relative_path = file_path.relative_to(self.input_path).as_posix()
-        file_info = self.interpreter.interpret(relative_path)
+        file_info = self._interpret(self._interpret_key(file_path))
+        file_info = self._in_context(file_path, file_info)
+        new_path = self._get_destination(file_path, file_info)
+        if new_path:
+            return self._perform_action(file_path, new_path), new_path
+        return IGNORED, None
+
+    def _interpret(self, name: str) -> Dict:
+        with self.profiler.stage("interpret"):
+            if self.metrics is None:
+                return self._interpret_name(name)
+            start = time.perf_counter()
+            file_info = self._interpret_name(name)
+            self.metrics.interpret_seconds.observe(time.perf_counter() - start)
+            return file_info
+
+    def _interpret_name(self, name: str) -> Dict:
+        if self.interpret_cache is None:
+            return self.interpreter.interpret(name)
+        return self.interpret_cache.interpret(name)
+
+    def _interpret_key(self, file_path: Path) -> str:
+        """Returns the name interpreted for file_path."""
+        name = self._relative_name(file_path)
+        if self.context is not None:
+            # Its directories are interpreted separately, by _in_context
+            return name.rpartition("/")[2]
+        return name
+
+    def _in_context(self, file_path: Path, file_info: Dict) -> Dict:
+        if self.context is None:
+            return file_info
+        with self.profiler.stage("interpret"):
+            return self.context.merge(
+                self._relative_name(file_path), file_info
+            )
 
+    def _relative_name(self, file_path: Path) -> str:
+        root = self._input_root(file_path)
+        # A single file input is interpreted by its own name
+        if file_path == root:
+            return file_path.name
+        return file_path.relative_to(root).as_posix()
+
+    def _input_root(self, file_path: Path) -> Path:
+        if len(self.input_paths) == 1:
+            return self.input_paths[0]
+        path = os.fspath(file_path)
+        for root in self.input_paths:
+            prefix = os.fspath(root)
+            if path == prefix or path.startswith(
+                prefix.rstrip(os.sep) + os.sep
+            ):
+                return root
+        raise ValueError(f"{file_path} is not in any input")
+
+    def _get_destination(
+        self, file_path: Path, file_info: dict
+    ) -> Optional[Path]:
         # Use existing folder?
         if self.prefer_existing_folders and not file_info["year"]:
             title_norm = file_info["title"].strip().lower()
@@ -131,12 +648,9 @@ class MediaScan:
                 if year > 1920:
                     file_info["title"] = title
                     file_info["year"] = year
-                    print(f"Using existing year for {title}: {year}")
-                    logger.debug(f"Using existing year for {title}: {year}")
+                    logger.debug("Using existing year for {}: {}", title, year)
 
-        new_path = self._get_new_path(file_path, file_info)
-        if new_path:
-            self._perform_action(file_path, new_path)
+        return self._get_new_path(file_path, file_info)
 
     def _get_new_path(self, file_path: Path, file_info: dict) -> Path:
         new_path = None
@@ -147,7 +661,7 @@ class MediaScan:
         else:
             new_path = self._get_movie_path(file_path, file_info)
 
-        logger.debug(f"New path for {file_path}: {new_path}")
+        logger.debug("New path for {}: {}", file_path, new_path)
         return new_path
 
     def _get_tv_path(self, file_path: Path, file_info: dict) -> Path:
@@ -156,36 +670,45 @@ class MediaScan:
             if file_info["year"]
             else self.episode_path_no_year
         )
-        return self.tv_shows_path / path.format(
-            title=file_info["title"].title(),
-            year=file_info["year"] or "Unknown Year",
-            season=f"{file_info['season']:02d}",
-            episode=f"{file_info['episode']:02d}",
-            quality=file_info["resolution"] or "Unknown",
-            ext=file_path.suffix[1:],
+        return path.render(
+            self.tv_shows_path,
+            {
+                "title": title_case(file_info["title"]),
+                "year": file_info["year"] or "Unknown Year",
+                "season": f"{file_info['season']:02d}",
+                "episode": f"{file_info['episode']:02d}",
+                "quality": file_info["resolution"] or "Unknown",
+                "ext": file_path.suffix[1:],
+            },
         )
 
     def _get_dated_media_path(self, file_path: Path, file_info: dict) -> Path:
         date = file_info["date"]
         season = date[:4]  # Year
-        return self.tv_shows_path / self.dated_episode_path.format(
-            title=file_info["title"].title(),
-            year=file_info["year"] or "Unknown Year",
-            season=season,
-            date=date,
-            quality=file_info["resolution"] or "Unknown",
-            ext=file_path.suffix[1:],
+        return self.dated_episode_path.render(
+            self.tv_shows_path,
+            {
+                "title": title_case(file_info["title"]),
+                "year": file_info["year"] or "Unknown Year",
+                "season": season,
+                "date": date,
+                "quality": file_info["resolution"] or "Unknown",
+                "ext": file_path.suffix[1:],
+            },
         )
 
     def _get_movie_path(self, file_path: Path, file_info: dict) -> Path:
         path = (
             self.movie_path if file_info["year"] else self.movie_path_no_year
         )
-        return self.movies_path / path.format(
-            title=file_info["title"].title(),
-            year=file_info["year"] or "Unknown Year",
-            quality=file_info["resolution"] or "Unknown",
-            ext=file_path.suffix[1:],
+        return path.render(
+            self.movies_path,
+            {
+                "title": title_case(file_info["title"]),
+                "year": file_info["year"] or "Unknown Year",
+                "quality": file_info["resolution"] or "Unknown",
+                "ext": file_path.suffix[1:],
+            },
         )
 
     def _get_existing_tv_show_folders(self) -> Dict[str, Tuple[str, int]]:
@@ -197,69 +720,225 @@ class MediaScan:
         existing_shows = {}
         tv_shows_dir = self.tv_shows_path
 
-        if not tv_shows_dir.exists():
+        if not self.library.exists(tv_shows_dir):
             logger.debug(f"TV Shows directory does not exist: {tv_shows_dir}")
             return existing_shows
 
-        year_pattern = re.compile(r"^(?P<title>.+?)\s*\((?P<year>\d{4})\)$")
-
-        for folder in tv_shows_dir.iterdir():
-            if folder.is_dir():
-                match = year_pattern.match(folder.name)
-                if match:
-                    title = match.group("title")
-                    title_norm = title.strip().lower()
-                    year = int(match.group("year"))
-                    existing_shows[title_norm] = title, year
-                    logger.debug(
-                        f"Found existing TV show: '{title}' with year {year}"
-                    )
+        for folder in self.library.list_subdirectories(tv_shows_dir):
+            match = SHOW_FOLDER_PATTERN.match(folder)
+            if match:
+                title = match.group("title")
+                title_norm = title.strip().lower()
+                year = int(match.group("year"))
+                existing_shows[title_norm] = title, year
+                logger.debug(
+                    f"Found existing TV show: '{title}' with year {year}"
+                )
 
         return existing_shows
 
-    def _perform_action(self, source: Path, destination: Path, force=False):
-        if destination.exists():
-            if force and destination.is_file():
+    def _perform_action(
+        self,
+        source: Path,
+        destination: Path,
+        force=False,
+        action: Optional[str] = None,
+    ) -> str:
+        action = action or self.action
+        if self.library.exists(destination):
+            if force and self.library.is_file(destination):
                 logger.info(
                     f"Forcing overwrite of existing file {destination}"
                 )
                 os.remove(destination)
+                self.library.remove_file(destination)
             else:
-                logger.info(
-                    f"Destination already exists: {destination}. Skipping."
-                )
-                return
+                return self._destination_exists(destination)
+        if self.reservations is None:
+            return self._act(source, destination, action)
+
+        # Only the source holding a destination writes it, whichever node
+        # it is on
+        holder = self.reservations.reserve(destination, source)
+        if holder is not None:
+            self.file_log.action(
+                "Destination already claimed by {}: {}. Skipping.",
+                holder,
+                destination,
+            )
+            return EXISTS
+        try:
+            outcome = self._act(source, destination, action)
+        except BaseException:
+            self.reservations.release(destination, source)
+            raise
+        if outcome != ORGANIZED:
+            self.reservations.release(destination, source)
+        return outcome
+
+    def _act(self, source: Path, destination: Path, action: str) -> str:
+        # Checked before anything is written, as a second copy of a
+        # release can cost tens of GB
+        digest = None
+        if self.duplicates is not None:
+            digest, duplicate = self._check_duplicate(source, destination)
+            if duplicate is not None and self.dedup == "skip":
+                return DUPLICATE
+
+        self.library.makedirs(destination.parent)
+        self.file_log.action("{}: {} -> {}", action, source, destination)
+
+        start = time.perf_counter()
+        try:
+            with self.profiler.stage("act"):
+                if action == "symlink":
+                    self._create_symlink(source, destination)
+                elif action == "link":
+                    self._create_hard_link(source, destination)
+                elif action == "copy":
+                    method = copy_file(
+                        source, destination, progress=self._progress
+                    )
+                    self._copied(destination, method, action)
+                elif action == "move":
+                    method = move_file(
+                        source, destination, progress=self._progress
+                    )
+                    logger.debug("Moved {} using {}", destination, method)
+                    if method != "rename":
+                        self._copied(destination, method, action)
+        except FileExistsError:
+            # Created by someone else since the library was indexed
+            if digest is not None:
+                self.duplicates.release(digest, destination)
+            self.library.add_file(destination)
+            return self._destination_exists(destination)
+        except BaseException:
+            if digest is not None:
+                self.duplicates.release(digest, destination)
+            raise
+
+        self.library.add_file(destination)
+        if action == "move":
+            self._source_removed(source)
+        if digest is not None:
+            self.duplicates.add(digest, destination)
+        if self.metrics is not None:
+            self.metrics.action_seconds.observe(
+                time.perf_counter() - start, action=action
+            )
+            self.metrics.files_organized.inc(action=action)
+        return ORGANIZED
 
-        destination.parent.mkdir(parents=True, exist_ok=True)
-        logger.info(f"{self.action}: {source} -> {destination}")
+    def _check_duplicate(
+        self, source: Path, destination: Path
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns the fingerprint of source if it was claimed for
+        destination, and the library file source duplicates, if any.
+        """
+        from .dedup import fingerprint, same_content
+
+        with self.profiler.stage("dedup"):
+            digest = fingerprint(source)
+            duplicate = self.duplicates.claim(digest, destination)
+            if duplicate is None:
+                return digest, None
+            if self.dedup_verify and not same_content(source, duplicate):
+                logger.debug(
+                    "{} matches the fingerprint of {}, but not its content",
+                    source,
+                    duplicate,
+                )
+                return None, None
 
-        if self.action == "symlink":
-            self._create_symlink(source, destination)
-        elif self.action == "link":
-            self._create_hard_link(source, destination)
-        elif self.action == "copy":
-            shutil.copy2(source, destination)
-        elif self.action == "move":
-            shutil.move(source, destination)
+        if self.dedup == "skip":
+            self.file_log.action(
+                "Duplicate of {}: {}. Skipping.", duplicate, source
+            )
+        else:
+            logger.warning("Duplicate of {}: {}", duplicate, source)
+        return None, duplicate
+
+    def _copied(self, destination: Path, method: str, action: str):
+        logger.debug("Copied {} using {}", destination, method)
+        if self.profiler.enabled or self.metrics is not None:
+            size = os.path.getsize(destination)
+            self.profiler.count(f"copied with {method}")
+            self.profiler.count("bytes copied", size)
+            if self.metrics is not None:
+                self.metrics.bytes_transferred.inc(size, action=action)
+
+    @property
+    def _progress(self):
+        if self.bandwidth_limiter is None:
+            return None
+        return self.bandwidth_limiter.consume
+
+    def _destination_exists(self, destination: Path) -> str:
+        self.file_log.action(
+            "Destination already exists: {}. Skipping.", destination
+        )
+        return EXISTS
 
     def _create_hard_link(self, source: Path, destination: Path):
         try:
             os.link(source, destination)
+        except FileExistsError:
+            raise
         except OSError:
             # If hard linking fails, fall back to copying
-            shutil.copy2(source, destination)
+            method = copy_file(source, destination, progress=self._progress)
+            self._copied(destination, method, "link")
 
     def _create_symlink(self, source: Path, destination: Path):
         try:
             os.symlink(source, destination)
+        except FileExistsError:
+            raise
         except OSError:
             # If linking fails, fall back to copying
-            shutil.copy2(source, destination)
+            method = copy_file(source, destination, progress=self._progress)
+            self._copied(destination, method, "symlink")
+
+    def _source_removed(self, path: Union[str, Path]):
+        self._emptied.add(os.path.dirname(os.path.abspath(path)))
 
     def _clean_empty_folders(self, input_path: Path):
-        for root, dirs, files in os.walk(input_path, topdown=False):
-            for dir in dirs:
-                dir_path = os.path.join(root, dir)
-                if not os.listdir(dir_path):
-                    logger.info(f"Removing empty folder: {dir_path}")
-                    os.rmdir(dir_path)
+        """
+        Removes the folders below input_path that files were moved or
+        deleted from, and their parents, once they are empty.
+        """
+        prefix = os.path.abspath(input_path).rstrip(os.sep) + os.sep
+        directories = {
+            directory
+            for directory in self._emptied
+            if directory.startswith(prefix)
+        }
+        if not directories:
+            return
+        self._emptied -= directories
+        with self.profiler.stage("clean"):
+            prune_empty_directories(input_path, directories)
+
+
+def _input_roots(paths: Iterable[Union[str, os.PathLike]]) -> List[Path]:
+    """
+    Returns the input paths, dropping repeats and any path inside another
+    input, which would otherwise be walked twice.
+    """
+    roots: List[Path] = []
+    for path in map(Path, paths):
+        if path in roots:
+            continue
+        if any(root in path.parents for root in roots):
+            logger.warning("{} is inside another input, ignoring", path)
+            continue
+        nested = [root for root in roots if path in root.parents]
+        for root in nested:
+            logger.warning("{} is inside another input, ignoring", root)
+            roots.remove(root)
+        roots.append(path)
+    if not roots:
+        raise ValueError("No input path given")
+    return roots
@@ -0,0 +1,286 @@
+import abc
+import bisect
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .logging import logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, per file name
+INTERPRET_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+)
+# Seconds, per link, copy, move or delete
+ACTION_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0, 60.0, 300.0, 1800.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ] + self._samples()
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Returns the exposition lines of every labelled value."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self.values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} "
+            f"{_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = ACTION_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Labels -> per-bucket counts, sum and count
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, count: int = 1, **labels):
+        """Records count observations of value."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            buckets, totals = self.values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0, 0])
+            )
+            buckets[index] += count
+            totals[0] += value * count
+            totals[1] += count
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            values = sorted(
+                (key, (list(b), list(t)))
+                for key, (b, t) in self.values.items()
+            )
+        names = self.label_names + ("le",)
+        for key, (buckets, (total, count)) in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), buckets):
+                cumulative += bucket
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+class Metrics:
+    """
+    Counters and histograms for MediaScan runs, in the Prometheus text
+    exposition format.
+
+    They can be served over HTTP by serve(), for scraping long-running
+    watch processes, or written to a file for the node exporter textfile
+    collector by write_textfile(), which MediaScan does after every scan.
+    """
+
+    def __init__(self, namespace: str = "mediascan"):
+        def name(suffix):
+            return f"{namespace}_{suffix}"
+
+        self.files_scanned = Counter(
+            name("files_scanned_total"), "Files looked at by scans."
+        )
+        self.files_organized = Counter(
+            name("files_organized_total"),
+            "Files added to the library.",
+            ["action"],
+        )
+        self.files_skipped = Counter(
+            name("files_skipped_total"),
+            "Files left alone, by reason.",
+            ["reason"],
+        )
+        self.files_deleted = Counter(
+            name("files_deleted_total"), "Non-media files deleted."
+        )
+        self.bytes_transferred = Counter(
+            name("bytes_transferred_total"),
+            "Bytes copied or moved into the library.",
+            ["action"],
+        )
+        self.interpret_seconds = Histogram(
+            name("interpret_duration_seconds"),
+            "Time taken to interpret one file name.",
+            buckets=INTERPRET_BUCKETS,
+        )
+        self.action_seconds = Histogram(
+            name("action_duration_seconds"),
+            "Time taken to link, copy, move or delete one file.",
+            ["action"],
+            buckets=ACTION_BUCKETS,
+        )
+        self.watch_pending = Gauge(
+            name("watch_pending_files"),
+            "Files waiting to finish writing in watch mode.",
+        )
+        self.last_scan = Gauge(
+            name("last_scan_timestamp_seconds"),
+            "Unix time at which the last scan finished.",
+        )
+        self.metrics: List[_Metric] = [
+            self.files_scanned,
+            self.files_organized,
+            self.files_skipped,
+            self.files_deleted,
+            self.bytes_transferred,
+            self.interpret_seconds,
+            self.action_seconds,
+            self.watch_pending,
+            self.last_scan,
+        ]
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def scan_finished(self):
+        self.last_scan.set(time.time())
+
+    def write_textfile(self, path: str):
+        """Writes the metrics to path atomically, for textfile collectors."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".mediascan-", suffix=".prom", dir=directory
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> int:
+        """
+        Serves the metrics at /metrics from a background thread, returning
+        the port, which is chosen by the system when port is 0.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        self.server = ThreadingHTTPServer((address, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(
+            target=self.server.serve_forever,
+            name="mediascan-metrics",
+            daemon=True,
+        ).start()
+        port = self.server.server_address[1]
+        logger.info(f"Serving metrics at http://{address}:{port}/metrics")
+        return port
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
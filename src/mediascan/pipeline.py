@@ -0,0 +1,299 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .index import EXISTS, IGNORED
+from .interpreter import _init_worker, _interpret_chunk
+from .logging import logger
+from .walker import FileRecord
+
+EXECUTORS = ["thread", "process"]
+
+# A classified record: whether it is media, its name and cached file info
+Entry = Tuple[FileRecord, bool, Optional[str], Optional[Dict]]
+
+_DONE = object()
+
+
+def _interpret_timed(names: List[str], interpreter=None):
+    """Interprets names in a worker, also returning the time taken."""
+    start = time.perf_counter()
+    file_infos = _interpret_chunk(names, interpreter)
+    return file_infos, time.perf_counter() - start
+
+
+class Pipeline:
+    """
+    Runs a scan as overlapping stages. Discovery walks the input tree on
+    its own thread, classification interprets file names on a thread or
+    process pool, and filesystem actions run on a thread pool. Bounded
+    queues between the stages keep memory flat on large trees.
+
+    Destinations are claimed in discovery order, so when two sources map to
+    the same target the first one walked always wins, however the workers
+    happen to be scheduled.
+
+    Copies and moves go through a TransferScheduler instead of the action
+    pool when the scan uses one.
+    """
+
+    def __init__(
+        self,
+        media_scan,
+        workers: int = 4,
+        executor: str = "thread",
+        batch_size: int = 32,
+        queue_size: Optional[int] = None,
+    ):
+        if executor not in EXECUTORS:
+            raise ValueError(
+                f"Unknown executor '{executor}'. "
+                f"Expected one of: {', '.join(EXECUTORS)}"
+            )
+        self.media_scan = media_scan
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.batch_size = batch_size
+        # Number of batches allowed to wait between two stages
+        self.queue_size = queue_size or self.workers * 2
+        self.claimed: Dict[Path, str] = {}
+
+    def run(self, records: Iterable[FileRecord]):
+        discovered = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        discovery = threading.Thread(
+            target=self._discover,
+            args=(records, discovered, stop),
+            name="mediascan-discovery",
+            daemon=True,
+        )
+        discovery.start()
+
+        classifier = self._create_classifier()
+        actions = ThreadPoolExecutor(
+            self.workers, thread_name_prefix="mediascan-action"
+        )
+        transfers = None
+        if self.media_scan._uses_transfers():
+            transfers = self.media_scan._create_transfer_scheduler()
+        profiler = self.media_scan.profiler
+        classified = deque()
+        performed = {}
+        try:
+            while True:
+                batch = discovered.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+
+                with profiler.stage("classify"):
+                    classified.append(self._classify(classifier, batch))
+                if len(classified) >= self.queue_size:
+                    self._dispatch(
+                        *classified.popleft(), actions, transfers, performed
+                    )
+
+            while classified:
+                self._dispatch(
+                    *classified.popleft(), actions, transfers, performed
+                )
+            self._drain(performed, 0)
+        finally:
+            stop.set()
+            classifier.shutdown()
+            actions.shutdown()
+            if transfers is not None:
+                transfers.shutdown()
+            discovery.join()
+
+    def _create_classifier(self) -> Executor:
+        if self.executor == "process":
+            # Imported here, as it pulls in multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            return ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.media_scan.interpreter,),
+            )
+        return ThreadPoolExecutor(
+            self.workers, thread_name_prefix="mediascan-classify"
+        )
+
+    def _discover(
+        self,
+        records: Iterable[FileRecord],
+        discovered: queue.Queue,
+        stop: threading.Event,
+    ):
+        try:
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    if not self._put(discovered, batch, stop):
+                        return
+                    batch = []
+            if batch and not self._put(discovered, batch, stop):
+                return
+            self._put(discovered, _DONE, stop)
+        except BaseException as e:
+            self._put(discovered, e, stop)
+
+    @staticmethod
+    def _put(
+        discovered: queue.Queue, item: object, stop: threading.Event
+    ) -> bool:
+        while not stop.is_set():
+            try:
+                discovered.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _classify(
+        self, classifier: Executor, batch: List[FileRecord]
+    ) -> Tuple[List[Entry], Future]:
+        media_scan = self.media_scan
+        index = media_scan.index
+        cache = media_scan.interpret_cache
+
+        media_scan._count_scanned(len(batch))
+        entries = []
+        names = []
+        for record in batch:
+            if index is not None and index.is_unchanged(record):
+                logger.debug("Unchanged since last scan: {}", record.path)
+                media_scan._count_skipped("unchanged")
+                continue
+            reason = media_scan._rejection(record)
+            if reason is not None:
+                logger.debug("Not media ({}): {}", reason, record.path)
+                entries.append((record, False, None, None))
+                continue
+
+            # Only names missing from the cache are sent to the workers
+            name = media_scan._interpret_key(Path(record.path))
+            file_info = cache.get(name) if cache is not None else None
+            if file_info is None:
+                names.append(name)
+            entries.append((record, True, name, file_info))
+
+        if self.executor == "process":
+            future = classifier.submit(_interpret_timed, names)
+        else:
+            future = classifier.submit(
+                _interpret_timed, names, media_scan.interpreter
+            )
+        return entries, future
+
+    def _dispatch(
+        self,
+        entries: List[Entry],
+        interpreted: Future,
+        actions: Executor,
+        transfers,
+        performed: Dict,
+    ):
+        media_scan = self.media_scan
+        cache = media_scan.interpret_cache
+        # Time spent waiting for the classifier pool
+        with media_scan.profiler.stage("interpret"):
+            file_infos, elapsed = interpreted.result()
+        if media_scan.metrics is not None and file_infos:
+            media_scan.metrics.interpret_seconds.observe(
+                elapsed / len(file_infos), count=len(file_infos)
+            )
+        file_infos = iter(file_infos)
+
+        for record, is_media, name, file_info in entries:
+            media_scan.file_log.file("Processing file: {}", record.path)
+
+            if not is_media:
+                if media_scan.action == "move" and media_scan.delete_non_media:
+                    future = actions.submit(media_scan._delete_file, record)
+                    self._submitted(performed, record, None, future)
+                else:
+                    media_scan._record_outcome(record, IGNORED, None)
+                continue
+
+            if file_info is None:
+                file_info = next(file_infos)
+                if cache is not None:
+                    cache.put(name, file_info)
+
+            file_path = Path(record.path)
+            file_info = media_scan._in_context(file_path, file_info)
+            destination = media_scan._get_destination(file_path, file_info)
+            if destination is None:
+                media_scan._record_outcome(record, IGNORED, None)
+                continue
+
+            # Only the first source claiming a destination is acted on
+            claimant = self.claimed.get(destination)
+            if claimant is not None:
+                media_scan.file_log.action(
+                    "Destination already claimed by {}: {}. Skipping.",
+                    claimant,
+                    destination,
+                )
+                media_scan._record_outcome(record, EXISTS, destination)
+                continue
+            self.claimed[destination] = record.path
+
+            if transfers is not None:
+                future = transfers.submit(
+                    record.size,
+                    record.device,
+                    destination,
+                    media_scan._perform_action,
+                    file_path,
+                    destination,
+                )
+            else:
+                future = actions.submit(
+                    media_scan._perform_action, file_path, destination
+                )
+            self._submitted(performed, record, destination, future)
+
+    def _submitted(
+        self,
+        performed: Dict,
+        record: FileRecord,
+        destination: Optional[Path],
+        future: Future,
+    ):
+        performed[future] = record, destination
+        self._drain(performed, self.queue_size * self.batch_size)
+
+    def _drain(self, performed: Dict, limit: int):
+        # Whichever actions finish first are recorded first, so one long
+        # transfer does not hold up the rest
+        while len(performed) > limit:
+            done, _ = wait(list(performed), return_when=FIRST_COMPLETED)
+            for future in done:
+                self._finish(*performed.pop(future), future)
+
+    def _finish(
+        self,
+        record: FileRecord,
+        destination: Optional[Path],
+        future: Future,
+    ):
+        # Outcomes are recorded from this thread, which owns the index
+        self.media_scan._record_outcome(record, future.result(), destination)
+        # The library now answers for the destination, so the claim can go
+        if destination is not None:
+            self.claimed.pop(destination, None)
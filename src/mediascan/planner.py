@@ -0,0 +1,273 @@
+import json
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import (
+    IO,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .index import DUPLICATE, IGNORED
+from .logging import logger
+from .walker import FileRecord, stat_record
+
+# Plan actions besides the MediaScan actions
+DELETE = "delete"
+SKIP = "skip"
+
+# Why an entry was planned the way it was
+NEW = "new"
+DESTINATION_EXISTS = "destination exists"
+CLAIMED = "destination claimed"
+UNCHANGED = "unchanged"
+NOT_MEDIA = "not media"
+NON_MEDIA = "non-media"
+
+
+class PlanEntry(NamedTuple):
+    source: str
+    destination: Optional[str]
+    action: str
+    reason: str
+
+
+class Planner:
+    """
+    Decides what a scan would do with every file, without doing it.
+
+    The output tree is read once into the library index, so planning
+    costs no filesystem calls per destination. Names are interpreted as a
+    stream, on a process pool when workers > 1, and entries are yielded in
+    walk order as soon as they are decided. Destinations are reserved as
+    they are planned, so the first source walked wins a collision, as in
+    a real scan. So are fingerprints when the scan skips duplicates, for
+    the duration of the plan.
+    """
+
+    def __init__(self, media_scan, workers: int = 1):
+        self.media_scan = media_scan
+        self.workers = workers
+        self.claimed: Dict[Path, str] = {}
+        self.fingerprints: List[Tuple[str, Path]] = []
+
+    def plan(self) -> Iterator[PlanEntry]:
+        media_scan = self.media_scan
+        if (
+            len(media_scan.input_paths) == 1
+            and media_scan.input_path.is_file()
+        ):
+            record = stat_record(media_scan.input_path)
+            records = [record] if record else []
+        else:
+            media_scan._load_library()
+            records = media_scan._input_records()
+
+        try:
+            yield from self._plan_records(records)
+        finally:
+            # Nothing was organized, so the fingerprints are free again
+            for digest, destination in self.fingerprints:
+                media_scan.duplicates.release(digest, destination)
+            media_scan._finish_scan()
+
+    def _plan_records(
+        self, records: Iterable[FileRecord]
+    ) -> Iterator[PlanEntry]:
+        media_scan = self.media_scan
+        cache = media_scan.interpret_cache
+
+        # Entries waiting for the interpretation of their own or an
+        # earlier name, in walk order
+        pending: Deque = deque()
+
+        def misses() -> Iterator[str]:
+            for record in records:
+                entry = self._classify(record)
+                pending.append(entry)
+                _, name, file_info = entry
+                if name is not None and file_info is None:
+                    yield name
+
+        interpreted = media_scan.interpreter.interpret_many(
+            misses(), processes=self.workers
+        )
+        for file_info in interpreted:
+            while True:
+                record, name, decided = pending.popleft()
+                if name is not None and decided is None:
+                    if cache is not None:
+                        cache.put(name, file_info)
+                    yield self._decide(record, file_info)
+                    break
+                yield self._decide(record, decided)
+
+        while pending:
+            record, _, decided = pending.popleft()
+            yield self._decide(record, decided)
+
+    def _classify(self, record: FileRecord):
+        """
+        Returns the record with its name, if it needs interpreting, and
+        either its cached interpretation or the entry already decided.
+        """
+        media_scan = self.media_scan
+        source = record.path
+        if media_scan.index is not None and media_scan.index.is_unchanged(
+            record
+        ):
+            return record, None, PlanEntry(source, None, SKIP, UNCHANGED)
+        reason = media_scan._rejection(record)
+        if reason is not None:
+            if media_scan.action == "move" and media_scan.delete_non_media:
+                return record, None, PlanEntry(source, None, DELETE, NON_MEDIA)
+            return record, None, PlanEntry(source, None, SKIP, reason)
+
+        name = media_scan._interpret_key(Path(source))
+        cache = media_scan.interpret_cache
+        return record, name, cache.get(name) if cache is not None else None
+
+    def _decide(self, record: FileRecord, decided) -> PlanEntry:
+        if isinstance(decided, PlanEntry):
+            return decided
+
+        media_scan = self.media_scan
+        source = record.path
+        file_info = media_scan._in_context(Path(source), decided)
+        destination = media_scan._get_destination(Path(source), file_info)
+        if destination is None:
+            return PlanEntry(source, None, SKIP, NOT_MEDIA)
+        if media_scan.library.exists(destination):
+            return PlanEntry(
+                source, str(destination), SKIP, DESTINATION_EXISTS
+            )
+        if destination in self.claimed:
+            return PlanEntry(source, str(destination), SKIP, CLAIMED)
+        if media_scan.duplicates is not None:
+            # The same check as the scan, which reads a few blocks
+            digest, duplicate = media_scan._check_duplicate(
+                Path(source), destination
+            )
+            if digest is not None:
+                self.fingerprints.append((digest, destination))
+            if duplicate is not None and media_scan.dedup == "skip":
+                return PlanEntry(source, str(destination), SKIP, DUPLICATE)
+        self.claimed[destination] = source
+        return PlanEntry(source, str(destination), media_scan.action, NEW)
+
+
+def write_plan(entries: Iterable[PlanEntry], output: IO[str]) -> int:
+    """Writes entries as JSON Lines, returning the number written."""
+    count = 0
+    for entry in entries:
+        output.write(json.dumps(entry._asdict()) + "\n")
+        count += 1
+    return count
+
+
+def read_plan(source: IO[str]) -> Iterator[PlanEntry]:
+    for line_number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield PlanEntry(**json.loads(line))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid plan entry on line {line_number}: {e}")
+
+
+def execute_plan(
+    media_scan,
+    entries: Iterable[PlanEntry],
+    workers: int = 1,
+):
+    """
+    Carries out a plan made by Planner.
+
+    Entries run on a thread pool of the given size, with copies and moves
+    going through the transfer scheduler when the scan uses one. Every
+    source is checked again before it is acted on, and destinations that
+    appeared since planning are skipped. Outcomes are recorded in the scan
+    index as if the files had been scanned.
+    """
+    media_scan._load_library()
+    actions = ThreadPoolExecutor(
+        max(1, workers), thread_name_prefix="mediascan-plan"
+    )
+    transfers = None
+    if media_scan.transfers > 1:
+        transfers = media_scan._create_transfer_scheduler()
+
+    performed: Dict = {}
+    limit = max(1, workers) * 64
+    try:
+        for entry in entries:
+            if entry.action == SKIP:
+                continue
+            if entry.action in ("copy", "move") and transfers is not None:
+                record = stat_record(entry.source)
+                if record is None:
+                    logger.warning(f"Source no longer exists: {entry.source}")
+                    continue
+                future = transfers.submit(
+                    record.size,
+                    record.device,
+                    Path(entry.destination),
+                    _execute_entry,
+                    media_scan,
+                    entry,
+                    record,
+                )
+            else:
+                future = actions.submit(_execute_entry, media_scan, entry)
+            performed[future] = entry
+            _drain(media_scan, performed, limit)
+        _drain(media_scan, performed, 0)
+    finally:
+        actions.shutdown()
+        if transfers is not None:
+            transfers.shutdown()
+        media_scan._finish_scan()
+
+
+def _execute_entry(
+    media_scan, entry: PlanEntry, record: Optional[FileRecord] = None
+):
+    record = record or stat_record(entry.source)
+    if record is None:
+        logger.warning(f"Source no longer exists: {entry.source}")
+        return None, None, None
+
+    media_scan.file_log.file("Processing file: {}", entry.source)
+    media_scan._count_scanned()
+    if entry.action == DELETE:
+        return record, media_scan._delete_file(record), None
+
+    destination = Path(entry.destination)
+    if entry.action not in ("symlink", "link", "copy", "move"):
+        logger.error(f"Unknown plan action '{entry.action}': {entry.source}")
+        return record, IGNORED, None
+    outcome = media_scan._perform_action(
+        Path(entry.source), destination, action=entry.action
+    )
+    return record, outcome, destination
+
+
+def _drain(media_scan, performed: Dict, limit: int):
+    while len(performed) > limit:
+        done, _ = wait(list(performed), return_when=FIRST_COMPLETED)
+        for future in done:
+            entry = performed.pop(future)
+            try:
+                record, outcome, destination = future.result()
+            except OSError as e:
+                logger.error(f"Failed to execute {entry.source}: {e}")
+                continue
+            if record is not None:
+                media_scan._record_outcome(record, outcome, destination)
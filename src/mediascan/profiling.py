@@ -0,0 +1,191 @@
+import cProfile
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Per-process I/O counters, from /proc/self/io on Linux
+_PROC_IO = "/proc/self/io"
+_IO_FIELDS = {
+    "syscr": "read syscalls",
+    "syscw": "write syscalls",
+    "rchar": "bytes read",
+    "wchar": "bytes written",
+}
+
+
+def _read_io() -> Dict[str, int]:
+    try:
+        with open(_PROC_IO, "r") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return {}
+    return {key: int(fields[key]) for key in _IO_FIELDS if key in fields}
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Collects per-stage time and counters for MediaScan runs.
+
+    Stage times are summed over every thread, so with worker pools they
+    measure busy time rather than wall time, which is reported separately.
+    On Linux, the read and write syscalls and bytes of the whole process
+    are taken from /proc/self/io. When a path is given, the main thread is
+    also run under cProfile and its stats dumped there by stop().
+    """
+
+    enabled = True
+
+    def __init__(self, cprofile_path: Optional[str] = None):
+        self.cprofile_path = cprofile_path
+        self.times: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.wall = 0.0
+        self.io: Dict[str, int] = defaultdict(int)
+        self._started = None
+        self._depth = 0
+        self._io_start: Dict[str, int] = {}
+        self._profile = cProfile.Profile() if cprofile_path else None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Nested runs, like the scan at the start of watch(), count once
+        self._depth += 1
+        if self._depth > 1:
+            return
+        self._started = time.perf_counter()
+        self._io_start = _read_io()
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        self._depth -= 1
+        if self._depth > 0 or self._started is None:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile_path)
+        self.wall += time.perf_counter() - self._started
+        for key, value in _read_io().items():
+            self.io[key] += value - self._io_start.get(key, value)
+        self._started = None
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.times[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def iterate(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Yields from items, timing each step as the named stage."""
+        iterator = iter(items)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, clock() - start)
+                return
+            self.add_time(name, clock() - start)
+            yield item
+
+    def stats(self) -> Dict:
+        files = self.counters.get("files", 0)
+        return {
+            "wall": self.wall,
+            "files_per_second": files / self.wall if self.wall else 0.0,
+            "stages": {
+                name: {"seconds": seconds, "calls": self.calls[name]}
+                for name, seconds in self.times.items()
+            },
+            "counters": dict(self.counters),
+            "io": dict(self.io),
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        lines = [
+            f"Profile: {stats['wall']:.3f}s wall, "
+            f"{self.counters.get('files', 0)} files, "
+            f"{stats['files_per_second']:,.1f} files/s"
+        ]
+        for name, stage in sorted(
+            stats["stages"].items(), key=lambda item: -item[1]["seconds"]
+        ):
+            lines.append(
+                f"  {name:<28} {stage['seconds']:>11.3f}s "
+                f"{stage['calls']:>8} calls"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<28} {value:>12,}")
+        for key, label in _IO_FIELDS.items():
+            if key in self.io:
+                lines.append(f"  {label:<28} {self.io[key]:>12,}")
+        if self.cprofile_path:
+            lines.append(f"  cProfile stats written to {self.cprofile_path}")
+        return "\n".join(lines)
+
+    def print_summary(self, file=None):
+        print(self.summary(), file=file or sys.stderr)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullProfiler:
+    """Stands in for Profiler when profiling is off, doing nothing."""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stage(self, name: str) -> _NullStage:
+        return self._stage
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def iterate(self, name: str, items: Iterable[T]) -> Iterable[T]:
+        return items
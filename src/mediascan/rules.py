@@ -0,0 +1,122 @@
+import fnmatch
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Set
+
+from .walker import FileRecord
+
+# Why a file is not organized, besides the excluded kinds below
+NOT_MEDIA_EXTENSION = "not a media extension"
+TOO_SMALL = "too small"
+EXCLUDED_PATTERN = "excluded pattern"
+NOT_INCLUDED = "not included"
+
+# Kinds of file that can be excluded by name, found anywhere in it
+KINDS = {
+    "sample": r"sample",
+    "trailer": r"trailer",
+    "extras": r"(?<![a-z0-9])(?:extras?|featurettes?|behind[\W_]the[\W_]"
+    r"scenes|deleted[\W_]scenes?|bonus)(?![a-z0-9])",
+}
+
+
+def _globs(patterns: Iterable[str]) -> str:
+    return "|".join(
+        f"(?:{fnmatch.translate(pattern)})" for pattern in patterns
+    )
+
+
+def _compile(pattern: str) -> Optional[Pattern]:
+    return re.compile(pattern, re.IGNORECASE) if pattern else None
+
+
+class FileRules:
+    """
+    Decides which files are media to organize, and why others are not.
+
+    The rules are compiled once into a dictionary of extensions, one
+    regular expression for names and a size threshold per media type,
+    and tried cheapest first: the extension, then the name, then the
+    size, which walk() already read. A name is matched by a single
+    expression however many kinds and patterns are excluded. Kinds are
+    keys of KINDS. Patterns are globs, matched case-insensitively against
+    the file name, or the whole path when they contain a "/".
+    """
+
+    def __init__(
+        self,
+        extensions: Dict[str, List[str]],
+        min_sizes: Dict[str, int],
+        exclude: Iterable[str] = ("sample",),
+        exclude_patterns: Iterable[str] = (),
+        include_patterns: Iterable[str] = (),
+    ):
+        # Extension -> minimum size of its media type
+        self.min_sizes: Dict[str, int] = {}
+        for media_type in ("audio", "video"):
+            for extension in extensions.get(media_type, []):
+                self.min_sizes[extension.lower()] = min_sizes.get(
+                    media_type, 0
+                )
+
+        exclude = list(exclude)
+        unknown = [kind for kind in exclude if kind not in KINDS]
+        if unknown:
+            raise ValueError(
+                f"Unknown kind to exclude: {', '.join(unknown)}. "
+                f"Expected one of: {', '.join(KINDS)}"
+            )
+        exclude_patterns = list(exclude_patterns)
+        include_patterns = list(include_patterns)
+
+        alternatives = [f"(?P<{kind}>{KINDS[kind]})" for kind in exclude]
+        names = _globs(p for p in exclude_patterns if "/" not in p)
+        if names:
+            alternatives.append(f"(?P<excluded>^(?:{names}))")
+        self.name_pattern = _compile("|".join(alternatives))
+        self.path_pattern = _compile(
+            _globs(p for p in exclude_patterns if "/" in p)
+        )
+
+        # When given, only files matching one of these are media
+        self.include_names = _compile(
+            _globs(p for p in include_patterns if "/" not in p)
+        )
+        self.include_paths = _compile(
+            _globs(p for p in include_patterns if "/" in p)
+        )
+
+    @property
+    def extensions(self) -> Set[str]:
+        """The extensions of media files, which are worth a stat call."""
+        return set(self.min_sizes)
+
+    def reject(self, record: FileRecord) -> Optional[str]:
+        """Returns why record is not media to organize, or None if it is."""
+        min_size = self.min_sizes.get(record.extension)
+        if min_size is None:
+            return NOT_MEDIA_EXTENSION
+
+        name = os.path.basename(record.path)
+        if self.name_pattern is not None:
+            match = self.name_pattern.search(name)
+            if match:
+                if match.lastgroup == "excluded":
+                    return EXCLUDED_PATTERN
+                return match.lastgroup
+        if self.path_pattern is not None and self.path_pattern.match(
+            record.path
+        ):
+            return EXCLUDED_PATTERN
+        if (self.include_names or self.include_paths) and not (
+            (self.include_names and self.include_names.match(name))
+            or (self.include_paths and self.include_paths.match(record.path))
+        ):
+            return NOT_INCLUDED
+
+        if record.size < min_size:
+            return TOO_SMALL
+        return None
+
+    def accepts(self, record: FileRecord) -> bool:
+        return self.reject(record) is None
@@ -0,0 +1,155 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+from string import Formatter
+from typing import Dict, Iterable, List, Mapping, Tuple, Union
+
+MOVIE_FIELDS = ("title", "year", "quality", "ext")
+EPISODE_FIELDS = MOVIE_FIELDS + ("season", "episode")
+DATED_EPISODE_FIELDS = MOVIE_FIELDS + ("season", "date")
+
+# Values used to check that a template renders when it is created
+_SAMPLE = {
+    "title": "Title",
+    "year": 2000,
+    "quality": "1080p",
+    "ext": "mkv",
+    "season": "01",
+    "episode": "01",
+    "date": "2000-01-01",
+}
+
+# Characters that are invalid in file names on common filesystems
+_INVALID_CHARACTERS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def sanitize(value: str) -> str:
+    """Removes characters that are invalid in file names from value."""
+    return _INVALID_CHARACTERS.sub("", value)
+
+
+@lru_cache(maxsize=4096)
+def title_case(title: str) -> str:
+    """str.title(), remembered, as one title is rendered for many files."""
+    return title.title()
+
+
+def _fields(template: str) -> List[str]:
+    try:
+        parsed = list(Formatter().parse(template))
+    except ValueError as e:
+        raise TemplateError(f"Invalid template {template!r}: {e}") from None
+    fields = []
+    for _, field, _, _ in parsed:
+        if field is None:
+            continue
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+class PathTemplate:
+    """
+    A path template such as Config.MOVIE_PATH, parsed once.
+
+    Fields are checked when the template is created, so a typo fails at
+    start-up rather than on the first matching file. The template is
+    split at its last "/". The directory part is rendered once for each
+    distinct set of its fields and the Path reused, so many episodes of
+    one show share one parent Path. With sanitize, characters that are
+    invalid in file names are removed from field values.
+
+    Instances can be passed to MediaScan in place of template strings.
+    """
+
+    def __init__(
+        self,
+        template: str,
+        fields: Iterable[str] = EPISODE_FIELDS + ("date",),
+        sanitize: bool = False,
+        cache_size: int = 4096,
+    ):
+        self.template = template
+        self.sanitize = sanitize
+        self.cache_size = cache_size
+
+        directory, _, name = template.rpartition("/")
+        if not name:
+            raise TemplateError(
+                f"Template {template!r} must end with a file name"
+            )
+        self.directory_fields: Tuple[str, ...] = tuple(_fields(directory))
+        self.name_fields: Tuple[str, ...] = tuple(_fields(name))
+
+        self.check_fields(fields)
+        try:
+            template.format(**_SAMPLE)
+        except (ValueError, KeyError, IndexError, AttributeError) as e:
+            raise TemplateError(
+                f"Invalid template {template!r}: {e}"
+            ) from None
+
+        self._format_directory = directory.format if directory else None
+        self._format_name = name.format
+        self._parents: Dict[Tuple, Path] = {}
+
+    def check_fields(self, fields: Iterable[str]):
+        """Raises TemplateError if the template uses a field not in fields."""
+        allowed = set(fields)
+        for field in self.directory_fields + self.name_fields:
+            if field not in allowed:
+                raise TemplateError(
+                    f"Unknown field {{{field}}} in template "
+                    f"{self.template!r}, expected one of: "
+                    f"{', '.join(sorted(allowed))}"
+                )
+
+    def __repr__(self) -> str:
+        return f"PathTemplate({self.template!r})"
+
+    def render(self, root: Path, values: Mapping) -> Path:
+        """Returns the path below root for the given field values."""
+        if self.sanitize:
+            values = {
+                key: sanitize(value) if isinstance(value, str) else value
+                for key, value in values.items()
+            }
+        name = self._format_name(**values)
+        if self._format_directory is None:
+            return root / name
+
+        key = (root,) + tuple(values[field] for field in self.directory_fields)
+        parent = self._parents.get(key)
+        if parent is None:
+            if len(self._parents) >= self.cache_size:
+                self._parents.clear()
+            parent = root / self._format_directory(**values)
+            self._parents[key] = parent
+        return parent / name
+
+
+# A template string or a compiled PathTemplate
+Template = Union[str, PathTemplate]
+
+
+def compile_template(
+    template: Template,
+    fields: Iterable[str],
+    sanitize: bool = False,
+) -> PathTemplate:
+    """
+    Returns template compiled. A PathTemplate is checked against fields
+    too, and returned as is unless sanitize asks for a sanitizing copy.
+    """
+    if isinstance(template, PathTemplate):
+        template.check_fields(fields)
+        if sanitize and not template.sanitize:
+            return PathTemplate(
+                template.template, fields, sanitize, template.cache_size
+            )
+        return template
+    return PathTemplate(template, fields, sanitize)
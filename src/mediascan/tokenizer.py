@@ -0,0 +1,191 @@
+import re
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+
+# A token is its raw text and its index in the name
+Token = Tuple[str, int]
+
+# Characters that make a pattern fragment more than a plain literal
+_METACHARACTERS = set(".^$*+?{}[]()|")
+
+_ALTERNATION = re.compile(r"^\\b\((?P<alternatives>[^()]*)\)\\b$")
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _expand(fragment: str) -> Optional[List[str]]:
+    """
+    Lists every string matched by a simple pattern fragment made of
+    literals, escaped characters and optional characters, such as
+    "DDP?5\\.1". Returns None for anything more complex.
+    """
+    strings = [""]
+    i = 0
+    while i < len(fragment):
+        char = fragment[i]
+        if char == "\\":
+            if i + 1 >= len(fragment) or fragment[i + 1].isalnum():
+                return None
+            char = fragment[i + 1]
+            i += 2
+        elif char in _METACHARACTERS:
+            return None
+        else:
+            i += 1
+
+        if i < len(fragment) and fragment[i] == "?":
+            strings += [string + char for string in strings]
+            i += 1
+        else:
+            strings = [string + char for string in strings]
+    return strings
+
+
+def _language(pattern: Pattern) -> Optional[List[str]]:
+    """Lists the strings matched by a \\b(a|b|c)\\b pattern, lowercased."""
+    match = _ALTERNATION.match(pattern.pattern)
+    if not match:
+        return None
+    strings = []
+    for fragment in match.group("alternatives").split("|"):
+        expanded = _expand(fragment)
+        if expanded is None:
+            return None
+        strings += [string.lower() for string in expanded]
+    return strings
+
+
+def _trie_pattern(strings: List[str]) -> str:
+    """
+    Builds a regex matching any of the strings, with common prefixes
+    factored out so the regex engine branches on one character at a time.
+    """
+    trie = {}
+    for string in strings:
+        node = trie
+        for char in string:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if terminal else pattern
+
+    return build(trie)
+
+
+class MetadataTokenizer:
+    """
+    Finds the first match of several metadata patterns in a single pass.
+
+    Every pattern of the form \\b(a|b|c)\\b is expanded into the literal
+    strings it matches, and all of them are merged into one prefix tree
+    regex. Each match of the tree is dispatched to the categories owning
+    its text. Because a match consumes its text, it can hide a match of
+    another category that starts inside it; where that is possible, the
+    hidden category's own pattern is searched from the start of the match.
+    The result is always the same as searching each pattern separately.
+
+    Patterns that cannot be expanded are searched separately.
+    """
+
+    def __init__(self, patterns: Dict[str, Pattern]):
+        self.patterns = patterns
+
+        self.languages = {}
+        self.separate = []
+        self.owners = {}
+        for category, pattern in patterns.items():
+            language = _language(pattern)
+            if language is None:
+                self.separate.append(category)
+                continue
+            self.languages[category] = language
+            for string in language:
+                owners = self.owners.setdefault(string, [])
+                if category not in owners:
+                    owners.append(category)
+
+        self.master = re.compile(
+            r"\b" + _trie_pattern(list(self.owners)) + r"\b", re.IGNORECASE
+        )
+        self._suspects = {}
+
+    def suspects(self, text: str) -> FrozenSet[str]:
+        """
+        Returns the categories that could have a match overlapping a master
+        match of the given text, other than an exact match of the same text
+        at the same position.
+        """
+        suspects = self._suspects.get(text)
+        if suspects is None and text.lower() not in self.owners:
+            # Case folding matched a string outside the expanded languages
+            suspects = frozenset(self.languages)
+            self._suspects[text] = suspects
+        if suspects is None:
+            lowered = text.lower()
+            # Every pattern starts and ends at a word boundary
+            boundaries = {0, len(lowered)} | {
+                i
+                for i in range(1, len(lowered))
+                if _is_word(lowered[i - 1]) != _is_word(lowered[i])
+            }
+            suspects = frozenset(
+                category
+                for category, language in self.languages.items()
+                if any(
+                    self._overlaps(lowered, offset, string, boundaries)
+                    for offset in boundaries
+                    if offset < len(lowered)
+                    for string in language
+                )
+            )
+            self._suspects[text] = suspects
+        return suspects
+
+    @staticmethod
+    def _overlaps(text: str, offset: int, string: str, boundaries) -> bool:
+        rest = text[offset:]
+        if string.startswith(rest):
+            return offset > 0 or string != text
+        end = offset + len(string)
+        return rest.startswith(string) and end in boundaries
+
+    def search(self, name: str) -> Dict[str, Optional[Token]]:
+        found = dict.fromkeys(self.patterns)
+        patterns = self.patterns
+        for match in self.master.finditer(name):
+            text = match.group()
+            start = match.start()
+
+            for category in self.owners.get(text.lower(), ()):
+                if found[category] is None:
+                    exact = patterns[category].match(name, start)
+                    if exact is not None:
+                        found[category] = exact.group(), start
+
+            for category in self.suspects(text):
+                token = found[category]
+                if token is not None and token[1] <= start:
+                    continue
+                hidden = patterns[category].search(name, start)
+                if hidden is not None and hidden.start() < match.end():
+                    if token is None or hidden.start() < token[1]:
+                        found[category] = hidden.group(), hidden.start()
+
+        for category in self.separate:
+            match = patterns[category].search(name)
+            if match is not None:
+                found[category] = match.group(), match.start()
+        return found
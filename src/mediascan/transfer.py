@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by all transfers, refilled at rate bytes per
+    second. Copies report each chunk through consume(), which sleeps until
+    the chunk fits within the budget.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Bandwidth limit must be positive")
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            # Go into debt, so chunks larger than the burst still pass
+            self.tokens -= size
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class _Transfer:
+    __slots__ = ("devices", "large", "function", "args", "future")
+
+    def __init__(self, devices, large, function, args):
+        self.devices = devices
+        self.large = large
+        self.function = function
+        self.args = args
+        self.future = Future()
+
+
+class TransferScheduler:
+    """
+    Runs copies and moves concurrently.
+
+    A transfer only starts when fewer than per_device transfers are using
+    its source and destination devices, so files on different disks are
+    copied in parallel without thrashing a single disk. Files of at least
+    large_file_size run in their own lane of large_workers, leaving the
+    other workers free for small files. Waiting transfers start in the
+    order they were submitted whenever a slot frees up.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        per_device: int = 2,
+        large_file_size: int = 1024 * 1024 * 1024,
+        large_workers: int = 1,
+    ):
+        self.workers = max(1, workers)
+        self.per_device = max(1, per_device)
+        self.large_file_size = large_file_size
+        self.large_workers = max(1, large_workers)
+
+        self.pool = ThreadPoolExecutor(
+            self.workers + self.large_workers,
+            thread_name_prefix="mediascan-transfer",
+        )
+        self.waiting: List[_Transfer] = []
+        self.busy: Counter = Counter()
+        self.running = {False: 0, True: 0}
+        self._devices: Dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        size: int,
+        source_device: int,
+        destination: Path,
+        function: Callable,
+        *args,
+    ) -> Future:
+        """Schedules function(*args), which transfers size bytes."""
+        devices = tuple(
+            sorted({source_device, self._device(Path(destination).parent)})
+        )
+        transfer = _Transfer(
+            devices, size >= self.large_file_size, function, args
+        )
+        with self._lock:
+            self.waiting.append(transfer)
+            self._start_ready()
+        return transfer.future
+
+    def _device(self, directory: Path) -> int:
+        """Device of a directory, or of its closest existing ancestor."""
+        missing = []
+        device = None
+        for path in (directory, *directory.parents):
+            device = self._devices.get(path)
+            if device is not None:
+                break
+            try:
+                device = os.stat(path).st_dev
+                break
+            except OSError:
+                missing.append(path)
+        else:
+            device = -1
+        for path in missing + [path]:
+            self._devices[path] = device
+        return device
+
+    def _has_slot(self, transfer: _Transfer) -> bool:
+        limit = self.large_workers if transfer.large else self.workers
+        return self.running[transfer.large] < limit and all(
+            self.busy[device] < self.per_device for device in transfer.devices
+        )
+
+    def _start_ready(self):
+        for transfer in list(self.waiting):
+            if not self._has_slot(transfer):
+                continue
+            self.waiting.remove(transfer)
+            self.running[transfer.large] += 1
+            for device in transfer.devices:
+                self.busy[device] += 1
+            self.pool.submit(self._run, transfer)
+
+    def _run(self, transfer: _Transfer):
+        try:
+            result = transfer.function(*transfer.args)
+        except BaseException as e:
+            transfer.future.set_exception(e)
+        else:
+            transfer.future.set_result(result)
+        finally:
+            with self._lock:
+                self.running[transfer.large] -= 1
+                for device in transfer.devices:
+                    self.busy[device] -= 1
+                self._start_ready()
+
+    def pending(self) -> Tuple[int, int]:
+        """Numbers of waiting and running transfers."""
+        with self._lock:
+            return len(self.waiting), sum(self.running.values())
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            # Waiting transfers are submitted to the pool by running ones,
+            # so wait for those first
+            while True:
+                with self._lock:
+                    futures = [t.future for t in self.waiting]
+                if not futures:
+                    break
+                for future in futures:
+                    try:
+                        future.exception()
+                    except BaseException:
+                        pass
+        else:
+            with self._lock:
+                for transfer in self.waiting:
+                    transfer.future.cancel()
+                self.waiting = []
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,182 @@
+import os
+import stat
+from pathlib import Path
+from typing import (
+    Collection,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
+
+
+class FileRecord(NamedTuple):
+    path: str
+    size: int
+    mtime: int  # Nanoseconds
+    inode: int
+    device: int
+
+    @property
+    def extension(self) -> str:
+        return split_extension(os.path.basename(self.path))
+
+
+def split_extension(name: str) -> str:
+    """Returns the lowercased extension of a file name, without the dot."""
+    stem, dot, extension = name.rpartition(".")
+    if not dot or not stem:
+        return ""
+    return extension.lower()
+
+
+def stat_record(path: Union[str, Path]) -> Optional[FileRecord]:
+    """Builds a record for a single path, or None if it is not a file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return FileRecord(
+        os.fspath(path), st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev
+    )
+
+
+def walk(
+    root: Union[str, Path], extensions: Optional[Collection[str]] = None
+) -> Iterator[FileRecord]:
+    """
+    Yields a record for every regular file below root, in sorted order.
+
+    Directories are read with os.scandir, so file types come from the
+    directory listing itself. When extensions is given, names with any
+    other extension are discarded before they are stat'ed, so only
+    candidate files cost a stat call. Like os.walk, symlinked directories
+    are not followed.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirectories.append(entry.path)
+                    continue
+            except OSError:
+                continue
+
+            if (
+                extensions is not None
+                and split_extension(entry.name) not in extensions
+            ):
+                continue
+
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            yield FileRecord(
+                entry.path,
+                st.st_size,
+                st.st_mtime_ns,
+                st.st_ino,
+                st.st_dev,
+            )
+
+        # Visit subdirectories in sorted order
+        stack.extend(reversed(subdirectories))
+
+
+def _walk_root(
+    root: str,
+    extensions: Optional[Collection[str]],
+    batch_size: int,
+    results,
+):
+    # Runs in a walker process. Records are sent as plain tuples, which
+    # pickle faster, in batches to cut down on locking, then None once the
+    # root is done
+    try:
+        batch = []
+        for record in walk(root, extensions):
+            batch.append(tuple(record))
+            if len(batch) >= batch_size:
+                results.put(batch)
+                batch = []
+        if batch:
+            results.put(batch)
+    except BaseException as e:
+        results.put(e)
+    results.put(None)
+
+
+def walk_roots(
+    roots: Sequence[Union[str, Path]],
+    extensions: Optional[Collection[str]] = None,
+    batch_size: int = 256,
+) -> Iterator[FileRecord]:
+    """
+    Yields a record for every regular file below any of roots, walking
+    each root in its own process.
+
+    Roots on separate disks are then read in parallel, rather than one
+    after the other. Records of one root keep their walk order, but
+    those of different roots are interleaved in whatever order they
+    arrive. The processes are stopped if the iterator is closed early.
+    """
+    if len(roots) == 1:
+        yield from walk(roots[0], extensions)
+        return
+
+    # Imported here, as it is only needed with several roots
+    import multiprocessing
+    import queue
+
+    context = multiprocessing.get_context()
+    # Bounded, so fast walkers wait for a slow consumer
+    results = context.Queue(len(roots) * 4)
+    processes = [
+        context.Process(
+            target=_walk_root,
+            args=(os.fspath(root), extensions, batch_size, results),
+            name=f"mediascan-walk-{i}",
+            daemon=True,
+        )
+        for i, root in enumerate(roots)
+    ]
+    for process in processes:
+        process.start()
+
+    remaining = len(processes)
+    try:
+        while remaining:
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                if any(process.exitcode for process in processes):
+                    raise RuntimeError("A walker process exited unexpectedly")
+                continue
+            if message is None:
+                remaining -= 1
+            elif isinstance(message, BaseException):
+                raise message
+            else:
+                yield from map(FileRecord._make, message)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        results.close()
@@ -0,0 +1,332 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .logging import logger
+from .walker import FileRecord, split_extension, stat_record, walk
+
+BACKENDS = ["auto", "inotify", "poll"]
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """
+    Reports changed paths below root using Linux inotify.
+
+    Every directory gets its own watch, and directories created later are
+    watched as they appear. Files already inside a new directory are
+    reported too, since they may have been written before the watch was
+    added. On queue overflow the whole tree is reported.
+    """
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+
+        self.root = root
+        self.libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches: Dict[int, str] = {}
+        self._watch_tree(root)
+
+    def _watch(self, directory: str) -> bool:
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), WATCH_MASK
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            logger.warning(f"Cannot watch {directory}: {os.strerror(error)}")
+            return False
+        self.watches[wd] = directory
+        return True
+
+    def _watch_tree(self, root: str) -> List[str]:
+        """Watches root and its subdirectories, returning the files found."""
+        files = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            if not self._watch(directory):
+                continue
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            files.append(entry.path)
+            except OSError:
+                continue
+        return files
+
+    def poll(self, timeout: float) -> Set[str]:
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                end = offset + length
+                name = data[offset:end].rstrip(b"\0")
+                offset = end
+                changed |= self._handle(wd, mask, os.fsdecode(name))
+        return changed
+
+    def _handle(self, wd: int, mask: int, name: str) -> Set[str]:
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("inotify queue overflowed, rescanning")
+            return {record.path for record in walk(self.root)}
+
+        directory = self.watches.get(wd)
+        if directory is None:
+            return set()
+        if mask & IN_IGNORED:
+            del self.watches[wd]
+            return set()
+        if not name:
+            return set()
+
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                return set(self._watch_tree(path))
+            return set()
+        if mask & IN_MOVED_FROM:
+            return set()
+        return {path}
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """
+    Reports changed paths below root by polling directory mtimes.
+
+    Each poll costs one stat per directory. Only directories whose mtime
+    changed are listed again, and only files whose size or mtime differ
+    from the previous listing are reported.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.directories: Dict[str, int] = {}
+        self.subdirectories: Dict[str, List[str]] = {}
+        self.files: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._refresh()
+
+    def poll(self, timeout: float) -> Set[str]:
+        time.sleep(timeout)
+        return self._refresh()
+
+    def _refresh(self) -> Set[str]:
+        changed = set()
+        seen = set()
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            seen.add(directory)
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+
+            if self.directories.get(directory) == mtime:
+                # Unchanged, but subdirectories may have changed
+                stack.extend(self.subdirectories[directory])
+                continue
+
+            previous = self.files.get(directory, {})
+            current = {}
+            subdirectories = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        signature = st.st_size, st.st_mtime_ns
+                        current[entry.path] = signature
+                        if previous.get(entry.path) != signature:
+                            changed.add(entry.path)
+            except OSError:
+                continue
+
+            self.directories[directory] = mtime
+            self.subdirectories[directory] = subdirectories
+            self.files[directory] = current
+            stack.extend(subdirectories)
+
+        # Forget directories that disappeared
+        for directory in set(self.directories) - seen:
+            del self.directories[directory]
+            del self.subdirectories[directory]
+            self.files.pop(directory, None)
+
+        return changed
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """
+    Organizes files as they appear in the input directory.
+
+    Changed paths reported by the backend are held back until their size
+    and mtime have not changed for settle_time seconds, so files that are
+    still being written are left alone. Files that settle together are
+    processed as one batch through MediaScan.
+    """
+
+    def __init__(
+        self,
+        media_scan,
+        settle_time: float = 5.0,
+        poll_interval: float = 2.0,
+        backend: str = "auto",
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown watch backend '{backend}'. "
+                f"Expected one of: {', '.join(BACKENDS)}"
+            )
+        self.media_scan = media_scan
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.backend_name = backend
+        self.extensions = media_scan._candidate_extensions()
+
+        # Path -> (last seen size and mtime, time of last change)
+        self.pending: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+
+    def _create_backend(self):
+        root = os.fspath(self.media_scan.input_path)
+        if self.backend_name in ("auto", "inotify"):
+            try:
+                backend = InotifyBackend(root)
+                logger.debug(f"Watching {root} with inotify")
+                return backend
+            except (OSError, AttributeError) as e:
+                if self.backend_name == "inotify":
+                    raise
+                logger.debug(f"inotify unavailable ({e}), polling instead")
+        return PollingBackend(root)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        backend = self._create_backend()
+        logger.info(f"Watching: {self.media_scan.input_path}")
+        try:
+            while not stop.is_set():
+                timeout = self.poll_interval
+                if self.pending:
+                    timeout = min(timeout, self.settle_time / 2)
+                for path in backend.poll(timeout):
+                    self._changed(path)
+                self._process_ready()
+                if self.media_scan.metrics is not None:
+                    self.media_scan.metrics.watch_pending.set(
+                        len(self.pending)
+                    )
+        finally:
+            backend.close()
+
+    def _changed(self, path: str):
+        if (
+            self.extensions is not None
+            and split_extension(os.path.basename(path)) not in self.extensions
+        ):
+            return
+        signature, _ = self.pending.get(path, (None, 0.0))
+        self.pending[path] = signature, time.monotonic()
+
+    def _ready(self) -> List[FileRecord]:
+        now = time.monotonic()
+        ready = []
+        for path, (signature, changed_at) in list(self.pending.items()):
+            if now - changed_at < self.settle_time:
+                continue
+
+            record = stat_record(path)
+            if record is None:
+                # Deleted, renamed or not a regular file
+                del self.pending[path]
+                continue
+
+            current = record.size, record.mtime
+            if current != signature:
+                # Still growing, wait for it to settle
+                self.pending[path] = current, now
+                continue
+
+            del self.pending[path]
+            ready.append(record)
+        return sorted(ready)
+
+    def _process_ready(self):
+        ready = self._ready()
+        if not ready:
+            return
+
+        logger.info(f"Processing {len(ready)} settled file(s)")
+        media_scan = self.media_scan
+        for record in ready:
+            try:
+                media_scan._scan_record(record)
+            except OSError as e:
+                logger.error(f"Failed to process {record.path}: {e}")
+        media_scan._finish_scan()
+        if media_scan.clean:
+            media_scan._clean_empty_folders(media_scan.input_path)
@@ -0,0 +1,87 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+
+from src.mediascan.cache import InterpretCache
+from src.mediascan.interpreter import Interpreter
+
+
+class TestInterpretCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, "interpret.sqlite3")
+        self.interpreter = Interpreter()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_hits_and_misses(self):
+        cache = InterpretCache(self.interpreter)
+        name = "The.Matrix.1999.1080p.BluRay.x264"
+        result = cache.interpret(name)
+        self.assertEqual(result, self.interpreter.interpret(name))
+
+        # Callers may modify the result without affecting the cache
+        result["title"] = "Changed"
+        self.assertEqual(cache.interpret(name)["title"], "The Matrix")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_entry_limit(self):
+        cache = InterpretCache(self.interpreter, max_entries=2)
+        for name in ["a.2001", "b.2002", "a.2001", "c.2003"]:
+            cache.interpret(name)
+        # "b" was least recently used
+        self.assertEqual(list(cache.entries), ["a.2001", "c.2003"])
+
+    def test_memory_limit(self):
+        cache = InterpretCache(self.interpreter, max_bytes=2000)
+        for year in range(2000, 2020):
+            cache.interpret(f"Movie.{year}")
+        self.assertLessEqual(cache.bytes, 2000)
+        self.assertLess(len(cache), 20)
+
+    def test_persistent_cache(self):
+        cache = InterpretCache(self.interpreter, path=self.cache_path)
+        cache.interpret("Show.S01E01.720p")
+        cache.close()
+
+        cache = InterpretCache(self.interpreter, path=self.cache_path)
+        result = cache.interpret("Show.S01E01.720p")
+        self.assertEqual(result["episode"], 1)
+        self.assertEqual(cache.disk_hits, 1)
+        cache.close()
+
+    def test_version_change_discards_persistent_results(self):
+        cache = InterpretCache(self.interpreter, path=self.cache_path)
+        cache.interpret("Show.S01E01.720p")
+        cache.close()
+
+        self.interpreter.resolutions.append("900p")
+        cache = InterpretCache(self.interpreter, path=self.cache_path)
+        cache.interpret("Show.S01E01.720p")
+        self.assertEqual(cache.disk_hits, 0)
+        cache.close()
+
+    def test_persistent_cache_used_from_another_thread(self):
+        cache = InterpretCache(self.interpreter, path=self.cache_path)
+        errors = []
+
+        def interpret():
+            try:
+                cache.interpret("Show.S01E01.720p")
+                cache.flush()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=interpret)
+        thread.start()
+        thread.join()
+        self.assertEqual(errors, [])
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
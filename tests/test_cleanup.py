@@ -0,0 +1,126 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.cleanup import prune_empty_directories
+from src.mediascan.mediascan import MediaScan
+
+
+class TestPruneEmptyDirectories(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make(self, *paths):
+        for path in paths:
+            os.makedirs(os.path.join(self.root, path), exist_ok=True)
+
+    def exists(self, path):
+        return os.path.isdir(os.path.join(self.root, path))
+
+    def test_prunes_ancestors_but_not_root(self):
+        self.make("a/b/c", "a/d/e")
+        removed = prune_empty_directories(
+            self.root,
+            [os.path.join(self.root, "a/b/c"), os.path.join(self.root, "a/d")],
+        )
+        self.assertEqual(
+            removed,
+            [
+                os.path.join(self.root, "a/b/c"),
+                os.path.join(self.root, "a/b"),
+            ],
+        )
+        self.assertTrue(self.exists("a/d/e"))
+
+        # Once every child is gone, shared parents go too
+        prune_empty_directories(self.root, [os.path.join(self.root, "a/d/e")])
+        self.assertFalse(self.exists("a"))
+        self.assertTrue(os.path.isdir(self.root))
+
+    def test_children_before_parents(self):
+        # A shallow candidate must wait for a deep one in another branch
+        self.make("a/b", "a/c/d/e")
+        prune_empty_directories(
+            self.root,
+            [os.path.join(self.root, path) for path in ["a/b", "a/c/d/e"]],
+        )
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_keeps_non_empty_and_other_directories(self):
+        self.make("a/b", "untouched")
+        Path(self.root, "a", "file").touch()
+        prune_empty_directories(self.root, [os.path.join(self.root, "a/b")])
+        self.assertFalse(self.exists("a/b"))
+        self.assertTrue(self.exists("a"))
+        self.assertTrue(self.exists("untouched"))
+
+    def test_ignores_paths_outside_root(self):
+        outside = tempfile.mkdtemp()
+        try:
+            prune_empty_directories(self.root, [outside, self.root])
+            self.assertTrue(os.path.isdir(outside))
+            self.assertTrue(os.path.isdir(self.root))
+        finally:
+            os.rmdir(outside)
+
+    def test_missing_directories(self):
+        self.assertEqual(
+            prune_empty_directories(
+                self.root, [os.path.join(self.root, "gone/deeper")]
+            ),
+            [],
+        )
+
+
+class TestMediaScanClean(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        for name in [
+            "Show.S01/Episodes/Show.S01E01.mkv",
+            "Show.S01/Episodes/Show.S01E02.mkv",
+            "Movie.2001/Movie.2001.mkv",
+            "Kept/Movie.2002.mkv",
+            "Kept/notes.txt",
+        ]:
+            path = Path(self.input_path, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+        os.makedirs(os.path.join(self.input_path, "Empty", "Before"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_removes_only_folders_emptied_by_the_run(self):
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="move",
+            min_video_size=0,
+            clean=True,
+        )
+        with mock.patch("os.walk") as walk, mock.patch("os.listdir") as ls:
+            media_scan.scan()
+        walk.assert_not_called()
+        ls.assert_not_called()
+
+        self.assertEqual(
+            sorted(os.listdir(self.input_path)), ["Empty", "Kept"]
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(self.input_path, "Kept")), ["notes.txt"]
+        )
+        self.assertTrue(
+            os.path.isdir(os.path.join(self.input_path, "Empty", "Before"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.config import Config
+from src.mediascan.context import DirectoryContext
+from src.mediascan.interpreter import Interpreter
+from src.mediascan.mediascan import MediaScan
+
+
+class TestDirectoryContext(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = Interpreter()
+        self.context = DirectoryContext(self.interpreter)
+
+    def interpret(self, relative_name: str) -> dict:
+        leaf = relative_name.rpartition("/")[2]
+        return self.context.merge(
+            relative_name, self.interpreter.interpret(leaf)
+        )
+
+    def assertInterpreted(self, relative_name, **expected):
+        file_info = self.interpret(relative_name)
+        self.assertEqual(
+            {key: file_info[key] for key in expected},
+            expected,
+            relative_name,
+        )
+
+    def test_season_pack(self):
+        for name in [
+            "Show.Name.S02.1080p/S02E03.mkv",
+            "Show.Name.S02.1080p/Show.Name.S02E03.mkv",
+            "Show.Name.S02.1080p/show name s02e03.mkv",
+        ]:
+            self.assertInterpreted(
+                name,
+                title="Show Name",
+                season=2,
+                episode=3,
+                resolution="1080p",
+            )
+
+    def test_release_folder(self):
+        self.assertInterpreted(
+            "Movie.Name.2019.1080p.BluRay/movie.name.mkv",
+            type="movie",
+            title="Movie Name",
+            year=2019,
+            resolution="1080p",
+        )
+
+    def test_show_and_season_folders(self):
+        self.assertInterpreted(
+            "Show Name (2019)/Season 2/S02E05.mkv",
+            type="tv",
+            title="Show Name",
+            year=2019,
+            season=2,
+            episode=5,
+        )
+        self.assertInterpreted(
+            "Show Name/Season 01/S01E04.mkv",
+            title="Show Name",
+            season=1,
+            episode=4,
+        )
+
+    def test_other_titles_keep_their_own_reading(self):
+        self.assertInterpreted(
+            "Downloads/Show.Name.S01E01.720p.mkv",
+            title="Show Name",
+            season=1,
+            episode=1,
+        )
+        self.assertInterpreted(
+            "Movies 2019 1080p/Other.Movie.2001.mkv",
+            title="Other Movie",
+            year=2001,
+            resolution=None,
+        )
+
+    def test_bare_names_take_the_release(self):
+        self.assertInterpreted(
+            "Movie.2010.1080p/abc123.mkv",
+            type="movie",
+            title="Movie",
+            year=2010,
+            resolution="1080p",
+        )
+        # Unless the folder is not a release
+        self.assertInterpreted(
+            "Downloads/abc123.mkv", title="abc123", year=None
+        )
+
+    def test_plain_folders_only_give_titles(self):
+        self.assertInterpreted(
+            "Show Name/S01E04.mkv", title="Show Name", year=None
+        )
+
+    def test_each_directory_interpreted_once(self):
+        with mock.patch.object(
+            self.interpreter,
+            "interpret_directory",
+            wraps=self.interpreter.interpret_directory,
+        ) as interpret_directory:
+            for episode in range(1, 25):
+                self.interpret(
+                    f"Downloads/Show.Name.S01.720p/S01E{episode:02d}.mkv"
+                )
+        self.assertEqual(
+            [call.args[0] for call in interpret_directory.call_args_list],
+            ["Downloads", "Show.Name.S01.720p"],
+        )
+
+    def test_top_level_file_unchanged(self):
+        file_info = self.interpreter.interpret("Show.Name.S01E01.mkv")
+        self.assertIs(
+            self.context.merge("Show.Name.S01E01.mkv", file_info), file_info
+        )
+
+
+class TestMediaScanDirectoryContext(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        pack = os.path.join(self.input_path, "Show.Name.S01.720p.WEB")
+        os.makedirs(pack)
+        for episode in range(1, 4):
+            Path(pack, f"s01e{episode:02d}.mkv").touch()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_scan(self):
+        season = os.path.join(
+            self.output_dir, Config.TV_SHOWS_DIR, "Show Name", "Season 01"
+        )
+        for workers in [1, 4]:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            MediaScan(
+                self.input_path,
+                self.output_dir,
+                min_video_size=0,
+                directory_context=True,
+                workers=workers,
+            ).scan()
+            self.assertEqual(
+                sorted(os.listdir(season)),
+                [
+                    f"Show Name - S01E{episode:02d} [720p].mkv"
+                    for episode in range(1, 4)
+                ],
+            )
+
+    def test_plan(self):
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            min_video_size=0,
+            directory_context=True,
+        )
+        destinations = [entry.destination for entry in media_scan.plan()]
+        self.assertEqual(len(destinations), 3)
+        for destination in destinations:
+            self.assertIn(os.path.join("Show Name", "Season 01"), destination)
+
+
+if __name__ == "__main__":
+    unittest.main()
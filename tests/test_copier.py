@@ -0,0 +1,226 @@
+import unittest
+import errno
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+
+from src.mediascan import copier
+from src.mediascan.copier import COPY_METHODS, copy_file, move_file
+
+# Mounting images needs root and loop devices, so it is opt-in
+LOOPBACK = os.environ.get("MEDIASCAN_LOOPBACK_TESTS") == "1"
+
+
+class TestCopyFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, "source.mkv")
+        self.data = os.urandom(3 * 1024 * 1024 + 123)
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+        os.utime(self.source, (1000000000, 1000000000))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assertCopied(self, destination):
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.stat(destination).st_mtime, 1000000000)
+
+    def test_each_method(self):
+        for method in COPY_METHODS:
+            with self.subTest(method=method):
+                destination = os.path.join(self.temp_dir, f"{method}.mkv")
+                used = copy_file(
+                    self.source, destination, [method], buffer_size=65536
+                )
+                # Reflink is not supported everywhere
+                self.assertIn(used, [method, "buffer"])
+                self.assertCopied(destination)
+
+    def test_falls_back_from_the_offset_reached(self):
+        def partial(fd_in, fd_out, offset, buffer_size, progress):
+            os.write(fd_out, self.data[:1000])
+            raise copier._Unsupported(1000)
+
+        destination = os.path.join(self.temp_dir, "copy.mkv")
+        with mock.patch.dict(copier._METHODS, {"reflink": partial}):
+            used = copy_file(self.source, destination, ["reflink", "buffer"])
+        self.assertEqual(used, "buffer")
+        self.assertCopied(destination)
+
+    def test_zero_at_start_falls_back(self):
+        # As copy_file_range and sendfile do on procfs and some FUSE mounts
+        for method, call in [
+            ("copy_file_range", "os.copy_file_range"),
+            ("sendfile", "os.sendfile"),
+        ]:
+            with self.subTest(method=method):
+                destination = os.path.join(self.temp_dir, f"{method}.mkv")
+                with mock.patch(call, return_value=0, create=True):
+                    used = copy_file(
+                        self.source, destination, [method, "buffer"]
+                    )
+                self.assertEqual(used, "buffer")
+                self.assertCopied(destination)
+
+    def test_short_copy_fails(self):
+        def short(fd_in, fd_out, offset, buffer_size, progress):
+            os.write(fd_out, self.data[:1000])
+            return 1000
+
+        destination = os.path.join(self.temp_dir, "moved.mkv")
+        error = OSError(errno.EXDEV, "Invalid cross-device link")
+        with mock.patch.dict(copier._METHODS, {"buffer": short}):
+            with mock.patch("os.link", side_effect=error):
+                with self.assertRaises(OSError):
+                    move_file(self.source, destination, ["buffer"])
+        self.assertFalse(os.path.exists(destination))
+        # The source is kept when the copy falls short
+        self.assertTrue(os.path.exists(self.source))
+
+    def test_existing_destination(self):
+        destination = os.path.join(self.temp_dir, "copy.mkv")
+        with open(destination, "wb") as f:
+            f.write(b"existing")
+        with self.assertRaises(FileExistsError):
+            copy_file(self.source, destination)
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), b"existing")
+
+    def test_failed_copy_removes_destination(self):
+        def failing(fd_in, fd_out, offset, buffer_size, progress):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        destination = os.path.join(self.temp_dir, "copy.mkv")
+        with mock.patch.dict(copier._METHODS, {"buffer": failing}):
+            with self.assertRaises(OSError):
+                copy_file(self.source, destination, ["buffer"])
+        self.assertFalse(os.path.exists(destination))
+
+    def test_progress(self):
+        for method in ["copy_file_range", "sendfile", "buffer"]:
+            with self.subTest(method=method):
+                chunks = []
+                destination = os.path.join(self.temp_dir, f"{method}.mkv")
+                copy_file(
+                    self.source,
+                    destination,
+                    [method],
+                    buffer_size=1024 * 1024,
+                    progress=chunks.append,
+                )
+                self.assertEqual(sum(chunks), len(self.data))
+                self.assertLessEqual(max(chunks), 1024 * 1024)
+
+    def test_unknown_method(self):
+        destination = os.path.join(self.temp_dir, "copy.mkv")
+        with self.assertRaises(ValueError):
+            copy_file(self.source, destination, ["rsync"])
+
+    def test_move_renames_on_same_device(self):
+        destination = os.path.join(self.temp_dir, "moved.mkv")
+        self.assertEqual(move_file(self.source, destination), "rename")
+        self.assertFalse(os.path.exists(self.source))
+        self.assertCopied(destination)
+
+    def test_move_across_devices_copies(self):
+        destination = os.path.join(self.temp_dir, "moved.mkv")
+        error = OSError(errno.EXDEV, "Invalid cross-device link")
+        with mock.patch("os.link", side_effect=error):
+            used = move_file(self.source, destination)
+        self.assertIn(used, COPY_METHODS)
+        self.assertFalse(os.path.exists(self.source))
+        self.assertCopied(destination)
+
+    def test_move_keeps_existing_destination(self):
+        destination = os.path.join(self.temp_dir, "moved.mkv")
+        with open(destination, "wb") as f:
+            f.write(b"existing")
+        # With hard links, and on filesystems without them
+        error = OSError(errno.EPERM, "Operation not permitted")
+        for link in [os.link, mock.Mock(side_effect=error)]:
+            with self.subTest(link=link):
+                with mock.patch("os.link", link):
+                    with self.assertRaises(FileExistsError):
+                        move_file(self.source, destination)
+                with open(destination, "rb") as f:
+                    self.assertEqual(f.read(), b"existing")
+                self.assertTrue(os.path.exists(self.source))
+
+    def test_move_without_hard_links(self):
+        destination = os.path.join(self.temp_dir, "moved.mkv")
+        error = OSError(errno.EPERM, "Operation not permitted")
+        with mock.patch("os.link", side_effect=error):
+            self.assertEqual(move_file(self.source, destination), "rename")
+        self.assertFalse(os.path.exists(self.source))
+        self.assertCopied(destination)
+
+
+@unittest.skipUnless(LOOPBACK, "set MEDIASCAN_LOOPBACK_TESTS=1 to run")
+class TestCopyFileOnLoopbackImages(unittest.TestCase):
+    """Copies between real tmpfs and ext4 filesystems."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.mounts = []
+        self.ext4 = self._mount_ext4("ext4")
+        self.other_ext4 = self._mount_ext4("other_ext4")
+        self.tmpfs = self._mount("tmpfs", ["-t", "tmpfs", "tmpfs"])
+
+        self.data = os.urandom(5 * 1024 * 1024)
+        self.source = os.path.join(self.ext4, "source.mkv")
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        for mount in reversed(self.mounts):
+            subprocess.run(["umount", mount], check=False)
+        shutil.rmtree(self.temp_dir)
+
+    def _mount(self, name, args):
+        mount = os.path.join(self.temp_dir, name)
+        os.mkdir(mount)
+        subprocess.run(["mount", *args, mount], check=True)
+        self.mounts.append(mount)
+        return mount
+
+    def _mount_ext4(self, name):
+        image = os.path.join(self.temp_dir, f"{name}.img")
+        with open(image, "wb") as f:
+            f.truncate(64 * 1024 * 1024)
+        subprocess.run(["mkfs.ext4", "-q", "-F", image], check=True)
+        return self._mount(name, ["-o", "loop", image])
+
+    def assertCopied(self, destination):
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_same_filesystem(self):
+        destination = os.path.join(self.ext4, "copy.mkv")
+        used = copy_file(self.source, destination)
+        # ext4 has no reflinks, but copies within the filesystem
+        self.assertEqual(used, "copy_file_range")
+        self.assertCopied(destination)
+
+    def test_between_filesystems(self):
+        for mount in [self.other_ext4, self.tmpfs]:
+            with self.subTest(mount=mount):
+                destination = os.path.join(mount, "copy.mkv")
+                used = copy_file(self.source, destination)
+                self.assertIn(used, ["copy_file_range", "sendfile"])
+                self.assertCopied(destination)
+
+    def test_move_between_filesystems(self):
+        destination = os.path.join(self.tmpfs, "moved.mkv")
+        used = move_file(self.source, destination)
+        self.assertIn(used, ["copy_file_range", "sendfile"])
+        self.assertFalse(os.path.exists(self.source))
+        self.assertCopied(destination)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import unittest
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.client import organize, request
+from src.mediascan.daemon import Daemon
+from src.mediascan.mediascan import MediaScan
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        self.socket_path = os.path.join(self.temp_dir, "mediascan.sock")
+        os.makedirs(self.input_path)
+
+        self.media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            transfers=1,
+        )
+        self.daemon = Daemon(self.media_scan, self.socket_path)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self.daemon.run, args=(self.stop,)
+        )
+        self.thread.start()
+        self.wait_for_socket()
+
+    def tearDown(self):
+        self.stop.set()
+        self.thread.join()
+        shutil.rmtree(self.temp_dir)
+
+    def wait_for_socket(self):
+        for _ in range(100):
+            if self.daemon.server is not None:
+                return
+            threading.Event().wait(0.01)
+        self.fail("The daemon did not start")
+
+    def touch(self, *parts) -> str:
+        path = os.path.join(self.input_path, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Path(path).touch()
+        return path
+
+    def test_organize_file(self):
+        path = self.touch("downloads", "Movie.Name.2021.1080p.mkv")
+        reply = organize([path], self.socket_path, timeout=10)
+
+        destination = os.path.join(
+            self.output_dir,
+            "Movies",
+            "Movie Name (2021)",
+            "Movie Name (2021) [1080p].mkv",
+        )
+        self.assertEqual(
+            reply,
+            {
+                "ok": True,
+                "results": [
+                    {
+                        "source": path,
+                        "outcome": "organized",
+                        "destination": destination,
+                    }
+                ],
+            },
+        )
+        self.assertTrue(os.path.isfile(destination))
+
+        # Asking again finds the destination taken
+        reply = organize([path], self.socket_path, timeout=10)
+        self.assertEqual(reply["results"][0]["outcome"], "exists")
+
+    def test_organize_directory_names_files_relative_to_it(self):
+        self.touch("Show.Name.S01.720p", "Show.Name.S01E01.720p.mkv")
+        self.touch("Show.Name.S01.720p", "Show.Name.S01E02.720p.mkv")
+        directory = os.path.join(self.input_path, "Show.Name.S01.720p")
+
+        reply = organize([directory], self.socket_path, timeout=10)
+        destinations = sorted(
+            result["destination"] for result in reply["results"]
+        )
+        season = os.path.join(
+            self.output_dir, "TV Shows", "Show Name", "Season 01"
+        )
+        self.assertEqual(
+            destinations,
+            [
+                os.path.join(season, "Show Name - S01E01 [720p].mkv"),
+                os.path.join(season, "Show Name - S01E02 [720p].mkv"),
+            ],
+        )
+        self.assertEqual(self.media_scan.input_path, Path(self.input_path))
+
+    def test_library_kept_loaded_until_reload(self):
+        path = self.touch("Movie.Name.2021.mkv")
+        organize([path], self.socket_path, timeout=10)
+        self.assertTrue(self.media_scan.library.loaded)
+
+        # Removed behind the daemon's back, so not seen until a reload
+        shutil.rmtree(os.path.join(self.output_dir, "Movies"))
+        reply = organize([path], self.socket_path, timeout=10)
+        self.assertEqual(reply["results"][0]["outcome"], "exists")
+
+        self.assertEqual(
+            request({"command": "reload"}, self.socket_path, 10), {"ok": True}
+        )
+        reply = organize([path], self.socket_path, timeout=10)
+        self.assertEqual(reply["results"][0]["outcome"], "organized")
+
+    def test_missing_path(self):
+        missing = os.path.join(self.input_path, "missing.mkv")
+        reply = organize([missing], self.socket_path, timeout=10)
+        self.assertEqual(
+            reply["results"], [{"source": missing, "error": "No such file"}]
+        )
+
+    def test_failed_file_is_reported(self):
+        first = self.touch("Movie.Name.2021.mkv")
+        second = self.touch("Other.Movie.2001.mkv")
+        scan_record = self.media_scan._scan_record
+
+        def failing(record):
+            if record.path == first:
+                raise KeyError("season")
+            return scan_record(record)
+
+        with mock.patch.object(
+            self.media_scan, "_scan_record", side_effect=failing
+        ):
+            reply = organize([first, second], self.socket_path, timeout=10)
+        self.assertTrue(reply["ok"])
+        self.assertEqual(
+            reply["results"][0],
+            {"source": first, "error": "KeyError('season')"},
+        )
+        self.assertEqual(reply["results"][1]["outcome"], "organized")
+        # The daemon keeps serving
+        self.assertTrue(self.thread.is_alive())
+
+    def test_failed_request_is_not_ok(self):
+        path = self.touch("Movie.Name.2021.mkv")
+        self.daemon.stale = True
+        with mock.patch.object(
+            self.media_scan,
+            "_load_library",
+            side_effect=sqlite3.ProgrammingError("closed"),
+        ):
+            reply = organize([path], self.socket_path, timeout=10)
+        self.assertEqual(
+            reply, {"ok": False, "error": "closed", "results": []}
+        )
+        self.assertTrue(self.thread.is_alive())
+        reply = organize([path], self.socket_path, timeout=10)
+        self.assertEqual(reply["results"][0]["outcome"], "organized")
+
+    def test_no_wait_and_status(self):
+        path = self.touch("Movie.2001.mkv")
+        reply = organize([path], self.socket_path, wait=False, timeout=10)
+        self.assertEqual(reply, {"ok": True, "queued": 1})
+
+        for _ in range(100):
+            status = request({"command": "status"}, self.socket_path, 10)
+            if status["processed"] == 1:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(status, {"ok": True, "queued": 0, "processed": 1})
+
+    def test_invalid_requests(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(10)
+            sock.connect(self.socket_path)
+            with sock.makefile("rwb") as f:
+                for line in [b"not json\n", b"[]\n", b'{"paths": "x"}\n']:
+                    f.write(line)
+                    f.flush()
+                    self.assertIn(b'"ok": false', f.readline())
+
+    def test_socket_is_private(self):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    def test_second_daemon_refuses_to_start(self):
+        with self.assertRaises(RuntimeError):
+            Daemon(self.media_scan, self.socket_path).run(threading.Event())
+
+
+class TestClient(unittest.TestCase):
+    def test_default_socket_without_config(self):
+        # The configuration imports appdirs, and may load a .env file
+        code = (
+            "import sys, mediascan.client as client; "
+            "print(client.default_socket()); "
+            "print('mediascan.config' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.join(os.path.dirname(__file__), "..", "src"),
+            env={**os.environ, "XDG_RUNTIME_DIR": "/run/user/1000"},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        self.assertEqual(output, ["/run/user/1000/mediascan.sock", "False"])
+
+
+if __name__ == "__main__":
+    unittest.main()
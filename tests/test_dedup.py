@@ -0,0 +1,247 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.mediascan.dedup import DuplicateIndex, fingerprint, same_content
+from src.mediascan.index import DUPLICATE, ORGANIZED
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.planner import SKIP
+
+
+def write(path, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_same_content_same_fingerprint(self):
+        data = os.urandom(100_000)
+        first = write(self.path("a"), data)
+        second = write(self.path("b"), data)
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertTrue(same_content(first, second))
+
+    def test_size_and_sampled_blocks_differ(self):
+        data = bytearray(os.urandom(1_000_000))
+        original = write(self.path("a"), bytes(data))
+        longer = write(self.path("b"), bytes(data) + b"x")
+        data[-1] ^= 0xFF
+        last_byte = write(self.path("c"), bytes(data))
+
+        digests = {fingerprint(path, 4, 1024) for path in [original, longer]}
+        self.assertEqual(len(digests), 2)
+        # The last block is always sampled
+        self.assertNotEqual(
+            fingerprint(original, 4, 1024), fingerprint(last_byte, 4, 1024)
+        )
+        self.assertFalse(same_content(original, last_byte))
+
+    def test_needs_two_samples(self):
+        path = write(self.path("a"), os.urandom(10_000))
+        with self.assertRaises(ValueError):
+            fingerprint(path, 1, 1024)
+
+    def test_unsampled_difference_needs_verification(self):
+        data = bytearray(os.urandom(1_000_000))
+        original = write(self.path("a"), bytes(data))
+        data[2000] ^= 0xFF
+        changed = write(self.path("b"), bytes(data))
+
+        self.assertEqual(
+            fingerprint(original, 4, 1024), fingerprint(changed, 4, 1024)
+        )
+        self.assertFalse(same_content(original, changed))
+
+    def test_empty_file(self):
+        empty = write(self.path("a"), b"")
+        self.assertEqual(fingerprint(empty), fingerprint(empty))
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.library = os.path.join(self.temp_dir, "library")
+        self.index_path = os.path.join(self.temp_dir, "dedup.sqlite3")
+        self.movie = write(
+            os.path.join(self.library, "Movie (2001)", "Movie (2001).mkv"),
+            b"movie",
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_finds_library_files(self):
+        digest = fingerprint(self.movie)
+        other = os.path.join(self.library, "Other.mkv")
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertEqual(len(index), 1)
+            self.assertEqual(index.claim(digest, other), self.movie)
+            # A file is no duplicate of itself
+            self.assertIsNone(index.claim(digest, self.movie))
+
+    def test_claims_and_persistence(self):
+        digest = fingerprint(write(os.path.join(self.temp_dir, "new"), b"x"))
+        destination = os.path.join(self.library, "New.mkv")
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertIsNone(index.claim(digest, destination))
+            self.assertEqual(index.claim(digest, "elsewhere"), destination)
+            index.release(digest, destination)
+            self.assertIsNone(index.claim(digest, destination))
+            write(destination, b"x")
+            index.add(digest, destination)
+
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertEqual(index.claim(digest, "elsewhere"), destination)
+
+        # Removed from the library
+        os.remove(destination)
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertIsNone(index.claim(digest, "elsewhere"))
+            self.assertEqual(len(index), 1)
+
+    def test_libraries_share_an_index(self):
+        other_library = os.path.join(self.temp_dir, "other")
+        os.makedirs(other_library)
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertEqual(len(index), 1)
+        with DuplicateIndex(self.index_path, other_library, {"mkv"}) as index:
+            self.assertEqual(len(index), 0)
+        with DuplicateIndex(self.index_path, self.library, {"mkv"}) as index:
+            self.assertEqual(len(index), 1)
+
+
+class TestMediaScanDedup(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        self.index_path = os.path.join(self.temp_dir, "dedup.sqlite3")
+        data = os.urandom(10_000)
+        write(os.path.join(self.input_path, "Movie.Name.2021.mkv"), data)
+        write(
+            os.path.join(self.input_path, "Movie Name (2021).1080p.mkv"), data
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def scan(self, **kwargs) -> MediaScan:
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            dedup_index_path=self.index_path,
+            **kwargs,
+        )
+        media_scan.scan()
+        return media_scan
+
+    def organized(self):
+        return sorted(
+            path.name
+            for path in Path(self.output_dir).rglob("*")
+            if path.is_file()
+        )
+
+    def test_skip(self):
+        for workers in [1, 4]:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            self.scan(dedup="skip", workers=workers, transfers=workers)
+            self.assertEqual(len(self.organized()), 1)
+
+    def test_report(self):
+        self.scan(dedup="report")
+        self.assertEqual(len(self.organized()), 2)
+
+    def test_plan_matches_scan(self):
+        for mode, actions in [
+            ("skip", ["copy", SKIP]),
+            ("report", ["copy", "copy"]),
+        ]:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            media_scan = MediaScan(
+                self.input_path,
+                self.output_dir,
+                action="copy",
+                min_video_size=0,
+                dedup=mode,
+                dedup_index_path=f"{self.index_path}.{mode}",
+            )
+            entries = list(media_scan.plan())
+            self.assertEqual([entry.action for entry in entries], actions)
+            if mode == "skip":
+                self.assertEqual(entries[1].reason, DUPLICATE)
+
+            # Planning claims nothing, so the scan decides the same
+            media_scan.scan()
+            self.assertEqual(len(self.organized()), actions.count("copy"))
+
+    def test_skips_duplicates_of_earlier_runs(self):
+        self.scan(dedup="skip")
+        write(
+            os.path.join(self.input_path, "Later", "Movie.2021.mkv"),
+            open(
+                os.path.join(self.input_path, "Movie.Name.2021.mkv"), "rb"
+            ).read(),
+        )
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            dedup="skip",
+            dedup_index_path=self.index_path,
+        )
+        source = Path(self.input_path, "Later", "Movie.2021.mkv")
+        destination = Path(self.output_dir, "Movies", "Later.mkv")
+        self.assertEqual(
+            media_scan._perform_action(source, destination), DUPLICATE
+        )
+        self.assertFalse(destination.exists())
+
+    def test_verify_rejects_false_match(self):
+        # Large enough that byte 100000 falls between the sampled blocks
+        data = bytearray(os.urandom(1_000_000))
+        original = write(os.path.join(self.temp_dir, "a.mkv"), bytes(data))
+        data[100_000] ^= 0xFF
+        other = write(os.path.join(self.temp_dir, "b.mkv"), bytes(data))
+        self.assertEqual(fingerprint(original), fingerprint(other))
+
+        for verify, outcome in [(False, DUPLICATE), (True, ORGANIZED)]:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            media_scan = MediaScan(
+                self.input_path,
+                self.output_dir,
+                action="copy",
+                dedup="skip",
+                dedup_index_path=f"{self.index_path}.{verify}",
+                dedup_verify=verify,
+            )
+            movies = Path(self.output_dir, "Movies")
+            media_scan._perform_action(Path(original), movies / "a.mkv")
+            self.assertEqual(
+                media_scan._perform_action(Path(other), movies / "b.mkv"),
+                outcome,
+            )
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.scan(dedup="delete")
+
+
+if __name__ == "__main__":
+    unittest.main()
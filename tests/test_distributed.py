@@ -0,0 +1,276 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.config import Config
+from src.mediascan.distributed import (
+    ABORTED,
+    Coordinator,
+    WorkQueue,
+    Worker,
+    connect,
+)
+from src.mediascan.index import EXISTS, ORGANIZED
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.walker import FileRecord, stat_record
+
+
+def setUpModule():
+    # One redislite server for every test, each using its own job name
+    global TEMP_DIR, CLIENT
+    TEMP_DIR = tempfile.mkdtemp()
+    CLIENT = connect(os.path.join(TEMP_DIR, "queue.db"))
+
+
+def tearDownModule():
+    CLIENT.shutdown()
+    shutil.rmtree(TEMP_DIR)
+
+
+def record(path):
+    return FileRecord(path, 1, 0.0, 0, 0)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def work_queue(self, **kwargs):
+        work_queue = WorkQueue(CLIENT, self.id(), **kwargs)
+        self.addCleanup(work_queue.clear)
+        return work_queue
+
+    def test_claim_and_done(self):
+        work_queue = self.work_queue()
+        work_queue.start()
+        self.assertEqual(work_queue.push(map(record, "abc")), 3)
+        self.assertFalse(work_queue.is_done())
+
+        claimed = work_queue.claim(2)
+        self.assertEqual([r.path for _, r in claimed], ["a", "b"])
+        self.assertEqual(claimed[0][1], record("a"))
+        for item, _ in claimed:
+            work_queue.done(item, ORGANIZED)
+        work_queue.finish()
+        self.assertFalse(work_queue.is_done())
+
+        [(item, _)] = work_queue.claim(2)
+        self.assertEqual(work_queue.claim(2), [])
+        work_queue.done(item, EXISTS)
+        self.assertTrue(work_queue.is_done())
+        self.assertEqual(
+            work_queue.status()["outcomes"], {ORGANIZED: 2, EXISTS: 1}
+        )
+
+    def test_expired_leases_are_retried(self):
+        work_queue = self.work_queue(lease_time=0.2, max_attempts=2)
+        work_queue.push([record("a")])
+        self.assertEqual(len(work_queue.claim()), 1)
+        self.assertEqual(work_queue.claim(), [])
+
+        time.sleep(0.3)
+        [(item, retried)] = work_queue.claim()
+        self.assertEqual(retried, record("a"))
+
+        # Renewed leases keep the file
+        for _ in range(3):
+            time.sleep(0.1)
+            work_queue.renew([item])
+        self.assertEqual(work_queue.claim(), [])
+
+        # A file is given up after max_attempts
+        time.sleep(0.3)
+        self.assertEqual(work_queue.claim(), [])
+        self.assertEqual(work_queue.failed(), [record("a")])
+        work_queue.finish()
+        self.assertTrue(work_queue.is_done())
+
+    def test_retry(self):
+        work_queue = self.work_queue()
+        work_queue.push(map(record, "ab"))
+        [(item, _)] = work_queue.claim()
+        work_queue.retry(item)
+        self.assertEqual([r.path for _, r in work_queue.claim(2)], ["b", "a"])
+
+    def test_reservations(self):
+        work_queue = self.work_queue()
+        self.assertIsNone(work_queue.reserve("/out/a.mkv", "/in/1.mkv"))
+        # Held for the same source, as when it is retried
+        self.assertIsNone(work_queue.reserve("/out/a.mkv", "/in/1.mkv"))
+        self.assertEqual(
+            work_queue.reserve("/out/a.mkv", "/in/2.mkv"), "/in/1.mkv"
+        )
+
+        # Only the holder releases it
+        work_queue.release("/out/a.mkv", "/in/2.mkv")
+        self.assertEqual(
+            work_queue.reserve("/out/a.mkv", "/in/2.mkv"), "/in/1.mkv"
+        )
+        work_queue.release("/out/a.mkv", "/in/1.mkv")
+        self.assertIsNone(work_queue.reserve("/out/a.mkv", "/in/2.mkv"))
+
+
+class TestDistributedScan(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        self.names = [f"Show.Name.S01E{i:02d}.mkv" for i in range(1, 21)] + [
+            f"Movie.{year}.1080p.mkv" for year in range(2001, 2011)
+        ]
+        for name in self.names + ["notes.txt", "Movie.2001.sample.mkv"]:
+            path = Path(self.input_path, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(name.encode())
+        self.work_queue = WorkQueue(CLIENT, self.id(), lease_time=0.5)
+        self.addCleanup(self.work_queue.clear)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def media_scan(self, **kwargs):
+        return MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            **kwargs,
+        )
+
+    def organized(self):
+        return sorted(
+            os.path.relpath(os.path.join(path, name), self.output_dir)
+            for path, _, names in os.walk(self.output_dir)
+            for name in names
+        )
+
+    def test_workers_split_the_job(self):
+        self.media_scan().coordinate(self.work_queue)
+        self.assertEqual(self.work_queue.status()["pending"], 30)
+
+        # Each worker as if on its own node, with its own MediaScan
+        workers = [
+            threading.Thread(
+                target=self.media_scan().work, args=(self.work_queue,)
+            )
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertTrue(self.work_queue.is_done())
+        self.assertEqual(self.work_queue.status()["outcomes"], {ORGANIZED: 30})
+        organized = self.organized()
+        self.assertEqual(len(organized), 30)
+        self.assertIn(
+            os.path.join(
+                Config.MOVIES_DIR,
+                "Movie (2001)",
+                "Movie (2001) [1080p].mkv",
+            ),
+            organized,
+        )
+
+    def test_crashed_worker_is_retried(self):
+        self.media_scan().coordinate(self.work_queue)
+        # Claimed by a worker that then never comes back
+        self.assertEqual(len(self.work_queue.claim(5)), 5)
+
+        self.media_scan().work(self.work_queue)
+        self.assertTrue(self.work_queue.is_done())
+        self.assertEqual(len(self.organized()), 30)
+
+    def test_destination_written_once(self):
+        # Both names map to one destination
+        sources = [
+            os.path.join(self.input_path, name)
+            for name in ["Other.Show.S01E01.mkv", "Other Show S01E01.mkv"]
+        ]
+        for source in sources:
+            Path(source).touch()
+        self.work_queue.push(stat_record(source) for source in sources)
+        self.work_queue.finish()
+
+        # Two nodes, neither seeing the other's writes in its library
+        first, second = self.media_scan(), self.media_scan()
+        second._load_library()
+        first.reservations = self.work_queue
+        Worker(first, self.work_queue, batch_size=1)._handle(
+            *self.work_queue.claim()[0]
+        )
+        with mock.patch.object(second, "_load_library"), mock.patch(
+            "src.mediascan.mediascan.copy_file"
+        ) as copy_file:
+            Worker(second, self.work_queue).run()
+        copy_file.assert_not_called()
+        self.assertIsNone(second.reservations)
+        self.assertEqual(
+            self.work_queue.status()["outcomes"], {ORGANIZED: 1, EXISTS: 1}
+        )
+        self.assertEqual(len(self.organized()), 1)
+
+    def test_failed_action_releases_reservation(self):
+        source = os.path.join(self.input_path, self.names[0])
+        media_scan = self.media_scan()
+        media_scan.reservations = self.work_queue
+        with mock.patch(
+            "src.mediascan.mediascan.copy_file", side_effect=OSError
+        ):
+            with self.assertRaises(OSError):
+                media_scan._scan_record(stat_record(source))
+
+        self.assertEqual(CLIENT.hlen(self.work_queue.reserved_key), 0)
+
+        # Kept once written, for any later source
+        media_scan._scan_record(stat_record(source))
+        self.assertEqual(CLIENT.hlen(self.work_queue.reserved_key), 1)
+
+    def test_start_forgets_the_last_job(self):
+        self.work_queue.start()
+        self.work_queue.reserve("/out/a.mkv", "/in/1.mkv")
+        self.work_queue.done(b"item", ORGANIZED)
+        self.work_queue.finish()
+
+        work_queue = WorkQueue(CLIENT, self.id())
+        work_queue.start()
+        # Started once however many times it is called, as in both modes
+        work_queue.start()
+        self.assertIsNone(work_queue.reserve("/out/a.mkv", "/in/2.mkv"))
+        self.assertEqual(work_queue.status()["outcomes"], {})
+
+    def test_start_refuses_an_unfinished_job(self):
+        self.work_queue.start()
+        with self.assertRaises(RuntimeError):
+            WorkQueue(CLIENT, self.id()).start()
+
+        self.work_queue.push([record("a")])
+        self.work_queue.finish()
+        with self.assertRaises(RuntimeError):
+            WorkQueue(CLIENT, self.id()).start()
+
+        self.work_queue.clear()
+        WorkQueue(CLIENT, self.id()).start()
+
+    def test_stopped_coordinator_aborts(self):
+        stop = threading.Event()
+        coordinator = Coordinator(
+            self.media_scan(), self.work_queue, batch_size=5, max_pending=5
+        )
+        # Stopped while waiting for workers to make room
+        with mock.patch.object(stop, "wait", return_value=True):
+            queued = coordinator.run(stop)
+        self.assertEqual(queued, 5)
+        self.assertEqual(self.work_queue.status()["state"], ABORTED)
+
+        # Workers finish what was queued rather than waiting forever
+        self.media_scan().work(self.work_queue)
+        self.assertTrue(self.work_queue.is_done())
+        self.assertEqual(len(self.organized()), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
 import unittest
 import json
+import os
+import subprocess
+import sys
 
 from src.mediascan.interpreter import Interpreter
 
@@ -125,6 +128,49 @@ class TestInterpreter(unittest.TestCase):
             success_rate, 0.99, f"Success rate {success_rate:.2%} is below 99%"
         )
 
+    def test_interpret_many(self):
+        with open("tests/examples.jsonl", "r") as f:
+            names = [json.loads(line)["name"] for line in f]
+        expected = [self.interpreter.interpret(name) for name in names]
+
+        # Generators are consumed lazily
+        results = self.interpreter.interpret_many(name for name in names)
+        self.assertEqual(list(results), expected)
+
+        results = self.interpreter.interpret_many(
+            iter(names), processes=2, chunksize=100
+        )
+        self.assertEqual(list(results), expected)
+
+    def test_patterns_are_shared_between_instances(self):
+        other = Interpreter()
+        self.assertIs(self.interpreter.source_pattern, other.source_pattern)
+        self.assertIs(self.interpreter.tokenizer, other.tokenizer)
+
+        # Token lists belong to each instance, and are read on first use
+        custom = Interpreter()
+        custom.resolutions.append("900p")
+        self.assertNotIn("900p", self.interpreter.resolutions)
+        self.assertEqual(custom.find_resolution("Movie.900p")["value"], "900p")
+        self.assertNotEqual(self.interpreter.version, custom.version)
+
+    def test_import_is_lazy(self):
+        # A fresh interpreter, as the command line would run in
+        code = (
+            "import sys, mediascan; "
+            "print(sorted(m for m in ('loguru', 'yaml', 'dotenv', "
+            "'mediascan.interpreter') if m in sys.modules))"
+        )
+        src = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            env={**os.environ, "PYTHONPATH": src},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(output.strip(), "[]")
+
 
 if __name__ == "__main__":
     unittest.main()
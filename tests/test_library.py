@@ -0,0 +1,78 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.library import LibraryIndex
+
+
+class TestLibraryIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.temp_dir, "library")
+        show = os.path.join(self.root, "TV Shows", "Show (2020)", "Season 01")
+        os.makedirs(show)
+        self.episode = os.path.join(show, "Show (2020) - S01E01.mkv")
+        Path(self.episode).touch()
+
+        self.library = LibraryIndex(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_exists_from_memory(self):
+        self.library.load()
+        os.remove(self.episode)
+
+        # Answered from the index, not the disk
+        self.assertTrue(self.library.exists(self.episode))
+        self.assertTrue(self.library.is_file(self.episode))
+        self.assertTrue(
+            self.library.exists(os.path.join(self.root, "TV Shows"))
+        )
+        self.assertFalse(
+            self.library.exists(os.path.join(self.root, "Movies"))
+        )
+
+    def test_unloaded_index_uses_disk(self):
+        self.assertTrue(self.library.exists(self.episode))
+        os.remove(self.episode)
+        self.assertFalse(self.library.exists(self.episode))
+
+    def test_makedirs_only_creates_missing_directories(self):
+        self.library.load()
+        season = os.path.join(
+            self.root, "TV Shows", "Show (2020)", "Season 02"
+        )
+        with mock.patch("os.mkdir", wraps=os.mkdir) as mkdir:
+            self.library.makedirs(season)
+            self.library.makedirs(season)
+        mkdir.assert_called_once_with(season)
+        self.assertTrue(os.path.isdir(season))
+        self.assertTrue(self.library.exists(season))
+
+    def test_add_and_remove_file(self):
+        self.library.load()
+        path = os.path.join(self.root, "Movies", "Movie.mkv")
+        self.library.add_file(path)
+        self.assertTrue(self.library.exists(path))
+        self.library.remove_file(path)
+        self.assertFalse(self.library.exists(path))
+
+    def test_list_subdirectories(self):
+        tv_shows = os.path.join(self.root, "TV Shows")
+        self.assertEqual(
+            self.library.list_subdirectories(tv_shows), ["Show (2020)"]
+        )
+        self.library.load()
+        self.library.makedirs(os.path.join(tv_shows, "Another Show (2021)"))
+        self.assertEqual(
+            self.library.list_subdirectories(tv_shows),
+            ["Another Show (2021)", "Show (2020)"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
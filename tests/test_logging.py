@@ -0,0 +1,85 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from src.mediascan.logging import FileLog, logger
+from src.mediascan.mediascan import MediaScan
+
+
+class TestFileLog(unittest.TestCase):
+    def setUp(self):
+        self.messages = []
+        handler = logger.add(
+            lambda message: self.messages.append(message.record),
+            level="DEBUG",
+        )
+        self.addCleanup(logger.remove, handler)
+
+    def levels(self, prefix):
+        return [
+            record["level"].name
+            for record in self.messages
+            if record["message"].startswith(prefix)
+        ]
+
+    def test_files_after_limit_are_logged_at_debug(self):
+        file_log = FileLog(limit=2, interval=3600)
+        for i in range(4):
+            file_log.file("Processing file: {}", i)
+            file_log.action("copy: {}", i)
+
+        self.assertEqual(
+            self.levels("Processing"), ["INFO", "INFO", "DEBUG", "DEBUG"]
+        )
+        self.assertEqual(
+            self.levels("copy"), ["INFO", "INFO", "DEBUG", "DEBUG"]
+        )
+        self.assertEqual(len(self.levels("Logged 2 files")), 1)
+
+    def test_no_limit(self):
+        file_log = FileLog(limit=0, interval=3600)
+        for i in range(3):
+            file_log.file("Processing file: {}", i)
+        self.assertEqual(self.levels("Processing"), ["INFO"] * 3)
+
+    def test_finish_summarizes_outcomes(self):
+        file_log = FileLog(limit=10, interval=3600)
+        for outcome in ["organized", "exists", "organized"]:
+            file_log.file("Processing file: {}", outcome)
+            file_log.outcome(outcome)
+        file_log.finish()
+
+        summary = [
+            r["message"] for r in self.messages if "Processed" in r["message"]
+        ]
+        self.assertEqual(summary, ["Processed 3 files, 1 exists, 2 organized"])
+        self.assertEqual(file_log.files, 0)
+        self.assertFalse(file_log.outcomes)
+
+    def test_progress_is_logged_every_interval(self):
+        file_log = FileLog(limit=10, interval=0)
+        file_log.file("Processing file: {}", 1)
+        file_log.outcome("organized")
+        self.assertEqual(
+            self.levels("Progress: 1 files, 1 organized"), ["INFO"]
+        )
+
+    def test_braces_in_arguments_are_not_formatted(self):
+        file_log = FileLog(limit=10, interval=3600)
+        file_log.file("Processing file: {}", "/media/{title}.mkv")
+        self.assertEqual(
+            self.messages[-1]["message"], "Processing file: /media/{title}.mkv"
+        )
+
+    def test_media_scan_keeps_handlers(self):
+        # Applications configure loguru themselves, only the CLI adds sinks
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        MediaScan(temp_dir, os.path.join(temp_dir, "output"))
+        logger.info("Still handled")
+        self.assertEqual(self.messages[-1]["message"], "Still handled")
+
+
+if __name__ == "__main__":
+    unittest.main()
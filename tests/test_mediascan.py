@@ -1,11 +1,15 @@
 import unittest
 import os
 import shutil
+import sqlite3
 import tempfile
+import threading
 from pathlib import Path
 
 from src.mediascan.mediascan import MediaScan
 from src.mediascan.config import Config
+from src.mediascan.index import ScanIndex
+from src.mediascan.walker import FileRecord
 
 
 class TestMediaScan(unittest.TestCase):
@@ -106,6 +110,24 @@ class TestMediaScan(unittest.TestCase):
             f"Movie file not found: {expected_path}",
         )
 
+    def test_scan_single_file(self):
+        file_path = os.path.join(self.input_path, "Movie.Name.2021.mp4")
+        self.create_empty_file(file_path)
+
+        media_scan = MediaScan(
+            input_path=file_path,
+            output_dir=self.output_dir,
+            min_video_size=0,
+        )
+        media_scan.scan()
+
+        expected_path = os.path.join(
+            self.movies_path,
+            "Movie Name (2021)",
+            "Movie Name (2021) [Unknown].mp4",
+        )
+        self.assertTrue(os.path.exists(expected_path))
+
     def test_scan_with_different_actions(self):
         # Create a test media file
         source_file = os.path.join(self.input_path, "test movie.mp4")
@@ -167,6 +189,31 @@ class TestMediaScan(unittest.TestCase):
             f"Source file still exists after move: {source_file}",
         )
 
+    def test_move_keeps_file_added_after_library_loaded(self):
+        media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            action="move",
+            min_video_size=0,
+        )
+        media_scan._load_library()
+        source_file = os.path.join(self.input_path, "Movie.Name.2021.mp4")
+        with open(source_file, "wb") as f:
+            f.write(b"new")
+        destination = os.path.join(
+            self.movies_path,
+            "Movie Name (2021)",
+            "Movie Name (2021) [Unknown].mp4",
+        )
+        os.makedirs(os.path.dirname(destination))
+        with open(destination, "wb") as f:
+            f.write(b"existing")
+
+        self.assertEqual(media_scan.process(source_file), "exists")
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), b"existing")
+        self.assertTrue(os.path.exists(source_file))
+
     def test_scan_with_delete_non_media(self):
         # Create test files
         self.create_empty_file(os.path.join(self.input_path, "movie.mp4"))
@@ -246,6 +293,267 @@ class TestMediaScan(unittest.TestCase):
             f"TV show file not found without year: {expected_path}",
         )
 
+    def test_scan_with_index_skips_unchanged_files(self):
+        index_path = os.path.join(self.temp_dir, "index.sqlite3")
+        media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            min_video_size=0,
+            min_audio_size=0,
+            index_path=index_path,
+        )
+        source_file = os.path.join(self.input_path, "Movie.Name.2021.mp4")
+        self.create_empty_file(source_file)
+
+        media_scan.scan()
+        entry = media_scan.index.get(source_file)
+        self.assertEqual(entry["outcome"], "organized")
+
+        # A second scan must not process the file again
+        processed = []
+        original_process = media_scan._process
+
+        def tracking_process(record):
+            processed.append(record.path)
+            return original_process(record)
+
+        media_scan._process = tracking_process
+        media_scan.scan()
+        self.assertEqual(processed, [])
+
+        # Changing the file makes it eligible again
+        with open(source_file, "wb") as f:
+            f.write(b"changed")
+        media_scan.scan()
+        self.assertEqual(processed, [source_file])
+
+    def test_index_kept_apart_by_output(self):
+        index_path = os.path.join(self.temp_dir, "index.sqlite3")
+        self.create_empty_file(
+            os.path.join(self.input_path, "Movie.Name.2021.mp4")
+        )
+        for output_dir in ["first", "second"]:
+            output_dir = os.path.join(self.temp_dir, output_dir)
+            media_scan = MediaScan(
+                input_path=self.input_path,
+                output_dir=output_dir,
+                min_video_size=0,
+                index_path=index_path,
+            )
+            media_scan.scan()
+            media_scan.index.close()
+            self.assertTrue(
+                os.path.exists(
+                    os.path.join(
+                        output_dir,
+                        Config.MOVIES_DIR,
+                        "Movie Name (2021)",
+                        "Movie Name (2021) [Unknown].mp4",
+                    )
+                ),
+                output_dir,
+            )
+
+    def test_index_from_before_settings(self):
+        index_path = os.path.join(self.temp_dir, "index.sqlite3")
+        connection = sqlite3.connect(index_path)
+        connection.execute(
+            "CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER, "
+            "mtime INTEGER, inode INTEGER, outcome TEXT, destination TEXT)"
+        )
+        connection.execute(
+            "INSERT INTO files VALUES ('/in/a.mkv', 1, 1, 1, 'organized', '')"
+        )
+        connection.commit()
+        connection.close()
+
+        with ScanIndex(index_path, "digest") as index:
+            self.assertEqual(len(index), 0)
+            index.add(FileRecord("/in/a.mkv", 1, 1, 1, 0), "organized")
+            self.assertEqual(index.get("/in/a.mkv")["outcome"], "organized")
+
+    def test_index_used_from_another_thread(self):
+        # As by watch(), serve() and work() when given a stop event
+        media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            min_video_size=0,
+            index_path=os.path.join(self.temp_dir, "index.sqlite3"),
+        )
+        self.create_empty_file(
+            os.path.join(self.input_path, "Movie.Name.2021.mp4")
+        )
+        errors = []
+
+        def scan():
+            try:
+                media_scan.scan()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=scan)
+        thread.start()
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(media_scan.index), 1)
+        media_scan.index.close()
+
+    def test_rebuild_index(self):
+        index_path = os.path.join(self.temp_dir, "index.sqlite3")
+        self.create_empty_file(os.path.join(self.input_path, "movie.mp4"))
+        media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            min_video_size=0,
+            index_path=index_path,
+        )
+        media_scan.scan()
+        self.assertEqual(len(media_scan.index), 1)
+        media_scan.index.close()
+
+        media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            index_path=index_path,
+            rebuild_index=True,
+        )
+        self.assertEqual(len(media_scan.index), 0)
+        media_scan.index.close()
+
+    def test_scan_with_workers(self):
+        names = [f"Show.Name.S01E{episode:02d}.mp4" for episode in range(20)]
+        for name in names:
+            self.create_empty_file(os.path.join(self.input_path, name))
+
+        for executor in ["thread", "process"]:
+            shutil.rmtree(self.tv_shows_path)
+            self.media_scan.workers = 4
+            self.media_scan.executor = executor
+            self.media_scan.scan()
+
+            for episode in range(20):
+                expected_path = os.path.join(
+                    self.tv_shows_path,
+                    "Show Name",
+                    "Season 01",
+                    f"Show Name - S01E{episode:02d} [Unknown].mp4",
+                )
+                self.assertTrue(
+                    os.path.exists(expected_path),
+                    f"TV show file not found: {expected_path}",
+                )
+
+    def test_process_executor_matches_sequential_scan(self):
+        names = [f"Show.Name.S01E{episode:02d}.mp4" for episode in range(12)]
+        names += [f"Movie.{year}.1080p.mkv" for year in range(2001, 2007)]
+        # The first two share a destination
+        names += ["Movie (2001).mkv", "Movie.2001.mkv"]
+        names += ["Other.Movie.sample.mkv", "notes.txt"]
+        for name in names:
+            with open(os.path.join(self.input_path, name), "w") as f:
+                f.write(name)
+
+        trees = []
+        for workers, executor in [(1, "thread"), (4, "process")]:
+            output_dir = os.path.join(self.temp_dir, executor)
+            MediaScan(
+                input_path=self.input_path,
+                output_dir=output_dir,
+                action="copy",
+                min_video_size=0,
+                workers=workers,
+                executor=executor,
+                transfers=1,
+            ).scan()
+            trees.append(
+                {
+                    os.path.relpath(os.path.join(path, name), output_dir): (
+                        Path(path, name).read_text()
+                    )
+                    for path, _, files in os.walk(output_dir)
+                    for name in files
+                }
+            )
+        self.assertEqual(len(trees[0]), 19)
+        self.assertEqual(trees[1], trees[0])
+
+    def test_pipeline_releases_claims(self):
+        from src.mediascan.pipeline import Pipeline
+
+        for episode in range(10):
+            self.create_empty_file(
+                os.path.join(self.input_path, f"Show.S01E{episode:02d}.mp4")
+            )
+        pipeline = Pipeline(self.media_scan, workers=2)
+        pipeline.run(self.media_scan._input_records())
+        self.assertEqual(pipeline.claimed, {})
+
+    def test_scan_with_workers_resolves_collisions_in_walk_order(self):
+        # Both files map to the same destination
+        first = os.path.join(self.input_path, "Movie (2021).mp4")
+        second = os.path.join(self.input_path, "Movie.2021.mp4")
+        self.create_empty_file(first)
+        self.create_empty_file(second)
+
+        self.media_scan.workers = 4
+        self.media_scan.scan()
+
+        destination = os.path.join(
+            self.movies_path, "Movie (2021)", "Movie (2021) [Unknown].mp4"
+        )
+        self.assertEqual(os.stat(destination).st_ino, os.stat(first).st_ino)
+
+    def test_scan_multiple_inputs(self):
+        second_input = os.path.join(self.temp_dir, "second")
+        os.makedirs(second_input)
+        self.create_empty_file(os.path.join(self.input_path, "Movie.2001.mp4"))
+        self.create_empty_file(
+            os.path.join(second_input, "Show.Name.S01E02.mp4")
+        )
+        # Both map to the same destination, and only one is organized
+        self.create_empty_file(os.path.join(self.input_path, "Film.1999.mp4"))
+        self.create_empty_file(os.path.join(second_input, "Film.1999.mp4"))
+
+        for workers in [1, 4]:
+            shutil.rmtree(self.output_dir)
+            media_scan = MediaScan(
+                input_path=[self.input_path, second_input],
+                output_dir=self.output_dir,
+                min_video_size=0,
+                workers=workers,
+            )
+            media_scan.scan()
+
+            # Names are interpreted relative to their own input
+            for path in [
+                os.path.join(
+                    self.movies_path,
+                    "Movie (2001)",
+                    "Movie (2001) [Unknown].mp4",
+                ),
+                os.path.join(
+                    self.tv_shows_path,
+                    "Show Name",
+                    "Season 01",
+                    "Show Name - S01E02 [Unknown].mp4",
+                ),
+                os.path.join(
+                    self.movies_path,
+                    "Film (1999)",
+                    "Film (1999) [Unknown].mp4",
+                ),
+            ]:
+                self.assertTrue(os.path.exists(path), path)
+
+    def test_nested_inputs_are_dropped(self):
+        nested = os.path.join(self.input_path, "nested")
+        os.makedirs(nested)
+        media_scan = MediaScan(
+            input_path=[nested, self.input_path, self.input_path],
+            output_dir=self.output_dir,
+        )
+        self.assertEqual(media_scan.input_paths, [Path(self.input_path)])
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+import unittest
+import os
+import shutil
+import tempfile
+import urllib.request
+from pathlib import Path
+
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.metrics import Counter, Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_labels(self):
+        counter = Counter("files_total", "Files.", ["action"])
+        counter.inc(action="copy")
+        counter.inc(2, action="copy")
+        counter.inc(action='sym"link')
+        self.assertEqual(counter.get(action="copy"), 3)
+        self.assertEqual(
+            counter.render(),
+            [
+                "# HELP files_total Files.",
+                "# TYPE files_total counter",
+                'files_total{action="copy"} 3',
+                'files_total{action="sym\\"link"} 1',
+            ],
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5, count=2)
+        histogram.observe(5.0)
+        self.assertEqual(
+            histogram.render()[2:],
+            [
+                'latency_bucket{le="0.1"} 1',
+                'latency_bucket{le="1"} 3',
+                'latency_bucket{le="+Inf"} 4',
+                "latency_sum 6.05",
+                "latency_count 4",
+            ],
+        )
+
+    def test_write_textfile(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, "mediascan.prom")
+        metrics = Metrics()
+        metrics.files_scanned.inc(5)
+        metrics.write_textfile(path)
+
+        with open(path, "r") as f:
+            self.assertIn("mediascan_files_scanned_total 5\n", f.read())
+        self.assertEqual(os.listdir(temp_dir), ["mediascan.prom"])
+
+    def test_serve(self):
+        metrics = Metrics()
+        metrics.files_deleted.inc()
+        port = metrics.serve(0)
+        self.addCleanup(metrics.close)
+
+        url = f"http://127.0.0.1:{port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertTrue(
+                response.headers["Content-Type"].startswith("text/plain")
+            )
+            body = response.read().decode("utf-8")
+        self.assertIn("mediascan_files_deleted_total 1\n", body)
+
+
+class TestMediaScanMetrics(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(self.input_path)
+        with open(os.path.join(self.input_path, "Movie.2001.mkv"), "wb") as f:
+            f.write(b"\0" * 1000)
+        Path(self.input_path, "Show.S01E01.mkv").touch()
+        Path(self.input_path, "notes.txt").touch()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_disabled_by_default(self):
+        media_scan = MediaScan(self.input_path, self.output_dir)
+        self.assertIsNone(media_scan.metrics)
+
+    def test_scan_updates_metrics(self):
+        textfile = os.path.join(self.temp_dir, "metrics", "mediascan.prom")
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            transfers=1,
+            metrics_textfile=textfile,
+        )
+        media_scan.scan()
+
+        metrics = media_scan.metrics
+        self.assertEqual(metrics.files_organized.get(action="copy"), 2)
+        self.assertEqual(metrics.bytes_transferred.get(action="copy"), 1000)
+        self.assertEqual(metrics.interpret_seconds.values[()][1][1], 2)
+        self.assertEqual(metrics.action_seconds.values[("copy",)][1][1], 2)
+
+        # A second scan finds both destinations taken
+        media_scan.scan()
+        self.assertEqual(metrics.files_skipped.get(reason="exists"), 2)
+        with open(textfile, "r") as f:
+            self.assertIn('files_organized_total{action="copy"} 2', f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from src.mediascan.config import Config
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.planner import (
+    CLAIMED,
+    DESTINATION_EXISTS,
+    NEW,
+    SKIP,
+    PlanEntry,
+    read_plan,
+    write_plan,
+)
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(self.input_path)
+        os.makedirs(self.output_dir)
+
+        for name in [
+            "Movie.2001.1080p.mkv",
+            "Movie.2001.1080p.mp4",
+            "Show.S01E01.720p.mkv",
+            "Old.Movie.1950.mkv",
+        ]:
+            Path(self.input_path, name).touch()
+
+        # Already in the library
+        self.existing = os.path.join(
+            self.output_dir,
+            Config.MOVIES_DIR,
+            "Old Movie (1950)",
+            "Old Movie (1950).mkv",
+        )
+        os.makedirs(os.path.dirname(self.existing))
+        Path(self.existing).touch()
+
+        self.media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            action="copy",
+            min_video_size=0,
+            movie_path="{title} ({year})/{title} ({year}).mkv",
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _tree(self):
+        return sorted(
+            os.path.join(root, name)
+            for root, dirs, files in os.walk(self.temp_dir)
+            for name in dirs + files
+        )
+
+    def test_plan(self):
+        before = self._tree()
+        plan = {
+            os.path.basename(entry.source): entry
+            for entry in self.media_scan.plan()
+        }
+        self.assertEqual(self._tree(), before)
+
+        self.assertEqual(
+            (
+                plan["Movie.2001.1080p.mkv"].action,
+                plan["Movie.2001.1080p.mkv"].reason,
+            ),
+            ("copy", NEW),
+        )
+        # Same destination as the .mkv, which was walked first
+        self.assertEqual(
+            (
+                plan["Movie.2001.1080p.mp4"].action,
+                plan["Movie.2001.1080p.mp4"].reason,
+            ),
+            (SKIP, CLAIMED),
+        )
+        self.assertEqual(plan["Show.S01E01.720p.mkv"].reason, NEW)
+        self.assertEqual(
+            plan["Old.Movie.1950.mkv"],
+            PlanEntry(
+                os.path.join(self.input_path, "Old.Movie.1950.mkv"),
+                self.existing,
+                SKIP,
+                DESTINATION_EXISTS,
+            ),
+        )
+
+    def test_plan_checks_destinations_in_memory(self):
+        with mock.patch("os.path.lexists", side_effect=AssertionError):
+            entries = list(self.media_scan.plan())
+        self.assertEqual(len(entries), 4)
+
+    def test_plan_with_workers(self):
+        self.media_scan.workers = 2
+        with_workers = list(self.media_scan.plan())
+        self.media_scan.workers = 1
+        self.assertEqual(with_workers, list(self.media_scan.plan()))
+
+    def test_write_and_read_plan(self):
+        entries = list(self.media_scan.plan())
+        output = io.StringIO()
+        self.assertEqual(write_plan(entries, output), 4)
+        output.seek(0)
+        self.assertEqual(list(read_plan(output)), entries)
+
+        with self.assertRaises(ValueError):
+            list(read_plan(io.StringIO('{"source": "a"}\n')))
+
+    def test_execute_plan(self):
+        plan_path = os.path.join(self.temp_dir, "plan.jsonl")
+        with open(plan_path, "w") as f:
+            write_plan(self.media_scan.plan(), f)
+
+        self.media_scan.workers = 4
+        self.media_scan.scan(plan=plan_path)
+
+        movie = os.path.join(
+            self.output_dir,
+            Config.MOVIES_DIR,
+            "Movie (2001)",
+            "Movie (2001).mkv",
+        )
+        self.assertTrue(os.path.isfile(movie))
+        self.assertEqual(len(list(Path(self.output_dir).rglob("*.mkv"))), 3)
+        # Copies leave the sources in place
+        self.assertEqual(len(os.listdir(self.input_path)), 4)
+
+    def test_execute_plan_skips_missing_sources(self):
+        entries = list(self.media_scan.plan())
+        for entry in entries:
+            os.remove(entry.source)
+        self.media_scan.scan(plan=entries)
+        self.assertEqual(
+            list(Path(self.output_dir).rglob("*.mkv")), [Path(self.existing)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import pstats
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.profiling import NullProfiler, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_stages_and_counters(self):
+        profiler = Profiler()
+        profiler.start()
+        with profiler.stage("interpret"):
+            pass
+        with profiler.stage("interpret"):
+            pass
+        self.assertEqual(list(profiler.iterate("walk", [1, 2])), [1, 2])
+        profiler.count("files", 2)
+        profiler.stop()
+
+        stats = profiler.stats()
+        self.assertEqual(stats["stages"]["interpret"]["calls"], 2)
+        self.assertEqual(stats["stages"]["walk"]["calls"], 3)
+        self.assertEqual(stats["counters"], {"files": 2})
+        self.assertGreater(stats["wall"], 0)
+        self.assertIn("2 files", profiler.summary())
+
+    def test_nested_runs_count_once(self):
+        profiler = Profiler()
+        profiler.start()
+        profiler.start()
+        profiler.stop()
+        self.assertIsNotNone(profiler._started)
+        profiler.stop()
+        self.assertIsNone(profiler._started)
+
+    def test_null_profiler_matches_profiler(self):
+        for name in ["start", "stop", "stage", "add_time", "count", "iterate"]:
+            self.assertTrue(callable(getattr(NullProfiler, name)), name)
+        profiler = NullProfiler()
+        with profiler.stage("walk"):
+            profiler.count("files")
+        items = [1, 2]
+        self.assertIs(profiler.iterate("walk", items), items)
+
+
+class TestMediaScanProfile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(self.input_path)
+        with open(os.path.join(self.input_path, "Movie.2001.mkv"), "wb") as f:
+            f.write(b"\0" * 1000)
+        Path(self.input_path, "Show.S01E01.mkv").touch()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_disabled_by_default(self):
+        media_scan = MediaScan(self.input_path, self.output_dir)
+        self.assertFalse(media_scan.profiler.enabled)
+
+    def test_profile_scan(self):
+        cprofile_path = os.path.join(self.temp_dir, "scan.pstats")
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            action="copy",
+            min_video_size=0,
+            transfers=1,
+            profile_path=cprofile_path,
+        )
+        media_scan.scan()
+
+        stats = media_scan.profiler.stats()
+        self.assertEqual(stats["counters"]["files"], 2)
+        self.assertEqual(stats["counters"]["organized"], 2)
+        self.assertEqual(stats["counters"]["bytes copied"], 1000)
+        for stage in ["walk", "interpret", "act", "library"]:
+            self.assertIn(stage, stats["stages"])
+        self.assertGreater(stats["files_per_second"], 0)
+        pstats.Stats(cprofile_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.planner import SKIP
+from src.mediascan.rules import (
+    EXCLUDED_PATTERN,
+    NOT_INCLUDED,
+    NOT_MEDIA_EXTENSION,
+    TOO_SMALL,
+    FileRules,
+)
+from src.mediascan.walker import FileRecord
+
+EXTENSIONS = {"video": ["mkv", "MP4"], "audio": ["mp3"]}
+MIN_SIZES = {"video": 100, "audio": 10}
+
+
+def record(path, size=1000):
+    return FileRecord(path, size, 0.0, 0, 0)
+
+
+class TestFileRules(unittest.TestCase):
+    def test_extensions_and_sizes(self):
+        rules = FileRules(EXTENSIONS, MIN_SIZES)
+        self.assertEqual(rules.extensions, {"mkv", "mp4", "mp3"})
+        self.assertIsNone(rules.reject(record("/in/Movie.2001.MP4")))
+        self.assertIsNone(rules.reject(record("/in/song.mp3", 10)))
+        self.assertEqual(
+            rules.reject(record("/in/notes.txt")), NOT_MEDIA_EXTENSION
+        )
+        self.assertEqual(rules.reject(record("/in/movie.mkv", 99)), TOO_SMALL)
+
+    def test_default_excludes_samples(self):
+        rules = FileRules(EXTENSIONS, MIN_SIZES)
+        self.assertEqual(
+            rules.reject(record("/in/Movie.2001.SAMPLE.mkv")), "sample"
+        )
+        self.assertIsNone(rules.reject(record("/in/Movie.Trailer.mkv")))
+        # Only the name counts, not the folder
+        self.assertIsNone(rules.reject(record("/in/samples/Movie.2001.mkv")))
+
+    def test_excluded_kinds(self):
+        rules = FileRules(EXTENSIONS, MIN_SIZES, exclude=["trailer", "extras"])
+        self.assertEqual(
+            rules.reject(record("/in/Movie.2001.Trailer.mkv")), "trailer"
+        )
+        for name in [
+            "Movie.2001.Extras.mkv",
+            "Behind the Scenes.mkv",
+            "Movie - Featurette.mkv",
+            "deleted_scene_1.mkv",
+        ]:
+            self.assertEqual(rules.reject(record("/in/" + name)), "extras")
+        for name in ["Movie.2001.sample.mkv", "Extraction.2020.mkv"]:
+            self.assertIsNone(rules.reject(record("/in/" + name)), name)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            FileRules(EXTENSIONS, MIN_SIZES, exclude=["bloopers"])
+
+    def test_patterns(self):
+        rules = FileRules(
+            EXTENSIONS,
+            MIN_SIZES,
+            exclude=[],
+            exclude_patterns=["*.part.mkv", "*/Incomplete/*"],
+            include_patterns=["*.mkv", "/music/*"],
+        )
+        self.assertIsNone(rules.reject(record("/in/Movie.2001.MKV")))
+        self.assertIsNone(rules.reject(record("/music/song.mp3")))
+        self.assertEqual(
+            rules.reject(record("/in/Movie.2001.part.mkv")), EXCLUDED_PATTERN
+        )
+        self.assertEqual(
+            rules.reject(record("/in/Incomplete/Movie.2001.mkv")),
+            EXCLUDED_PATTERN,
+        )
+        self.assertEqual(
+            rules.reject(record("/in/Movie.2001.mp4")), NOT_INCLUDED
+        )
+
+
+class TestMediaScanRules(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        for name in [
+            "Movie.2001.mkv",
+            "Movie.2001.Trailer.mkv",
+            "Movie.2002.sample.mkv",
+            "Movie.2003.part.mkv",
+        ]:
+            path = Path(self.input_path, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.touch()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def media_scan(self, **kwargs):
+        return MediaScan(
+            self.input_path,
+            self.output_dir,
+            min_video_size=0,
+            exclude=["sample", "trailer"],
+            exclude_patterns=["*.part.*"],
+            **kwargs,
+        )
+
+    def test_plan_gives_reasons(self):
+        reasons = {
+            os.path.basename(entry.source): entry.reason
+            for entry in self.media_scan().plan()
+            if entry.action == SKIP
+        }
+        self.assertEqual(
+            reasons,
+            {
+                "Movie.2001.Trailer.mkv": "trailer",
+                "Movie.2002.sample.mkv": "sample",
+                "Movie.2003.part.mkv": EXCLUDED_PATTERN,
+            },
+        )
+
+    def test_scan(self):
+        for workers in [1, 4]:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+            self.media_scan(workers=workers).scan()
+            organized = [
+                name
+                for _, _, names in os.walk(self.output_dir)
+                for name in names
+            ]
+            self.assertEqual(len(organized), 1)
+            self.assertTrue(organized[0].startswith("Movie (2001)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.mediascan.config import Config
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.templates import (
+    EPISODE_FIELDS,
+    MOVIE_FIELDS,
+    PathTemplate,
+    TemplateError,
+)
+
+EPISODE = {
+    "title": "Show Name",
+    "year": 2020,
+    "season": "01",
+    "episode": "02",
+    "quality": "720p",
+    "ext": "mkv",
+}
+
+
+class TestPathTemplate(unittest.TestCase):
+    def test_render_matches_format(self):
+        root = Path("/library/TV Shows")
+        for template in [
+            Config.EPISODE_PATH,
+            Config.EPISODE_PATH_NO_YEAR,
+            "{title} S{season}E{episode}.{ext}",
+        ]:
+            self.assertEqual(
+                PathTemplate(template, EPISODE_FIELDS).render(root, EPISODE),
+                root / template.format(**EPISODE),
+            )
+
+    def test_episodes_share_parent(self):
+        template = PathTemplate(Config.EPISODE_PATH, EPISODE_FIELDS)
+        root = Path("/library")
+        first = template.render(root, EPISODE)
+        second = template.render(root, {**EPISODE, "episode": "03"})
+        self.assertEqual(first.parent, second.parent)
+        self.assertEqual(len(template._parents), 1)
+
+        # A new season gets a new parent
+        third = template.render(root, {**EPISODE, "season": "02"})
+        self.assertEqual(third.parent.name, "Season 02")
+
+    def test_parent_cache_is_bounded(self):
+        template = PathTemplate(
+            Config.EPISODE_PATH, EPISODE_FIELDS, cache_size=2
+        )
+        for season in range(5):
+            template.render(Path("/"), {**EPISODE, "season": season})
+            self.assertLessEqual(len(template._parents), 2)
+
+    def test_unknown_field(self):
+        with self.assertRaisesRegex(TemplateError, "{episode}"):
+            PathTemplate("{title}/{title} E{episode}.{ext}", MOVIE_FIELDS)
+
+    def test_invalid_templates(self):
+        for template in [
+            "{title}/{}.{ext}",
+            "{title}/{title:d}.{ext}",
+            "{title}/{title.{ext}",
+            "{title}/",
+        ]:
+            with self.assertRaises(TemplateError, msg=template):
+                PathTemplate(template, MOVIE_FIELDS)
+
+    def test_sanitize(self):
+        values = {**EPISODE, "title": 'What? "Show": A/B'}
+        template = PathTemplate(
+            Config.EPISODE_PATH_NO_YEAR, EPISODE_FIELDS, sanitize=True
+        )
+        path = template.render(Path("/library"), values)
+        self.assertEqual(
+            path,
+            Path(
+                "/library/What Show AB/Season 01/"
+                "What Show AB - S01E02 [720p].mkv"
+            ),
+        )
+
+        # Otherwise values are used as they are
+        template = PathTemplate(Config.EPISODE_PATH_NO_YEAR, EPISODE_FIELDS)
+        path = template.render(Path("/library"), values)
+        self.assertEqual(path.parts[2:4], ('What? "Show": A', "B"))
+
+
+class TestMediaScanTemplates(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(self.input_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_invalid_template_fails_at_start(self):
+        with self.assertRaises(TemplateError):
+            MediaScan(
+                self.input_path,
+                self.output_dir,
+                movie_path="{title}/{title} S{season}.{ext}",
+            )
+
+    def test_invalid_path_template_fails_at_start(self):
+        with self.assertRaises(TemplateError):
+            MediaScan(
+                self.input_path,
+                self.output_dir,
+                movie_path=PathTemplate("{title} S{season}E{episode}.{ext}"),
+            )
+
+    def test_path_template_sanitized(self):
+        template = PathTemplate("{title}/{title}.{ext}")
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            movie_path=template,
+            sanitize_paths=True,
+        )
+        self.assertTrue(media_scan.movie_path.sanitize)
+        self.assertFalse(template.sanitize)
+
+    def test_custom_template(self):
+        media_scan = MediaScan(
+            self.input_path,
+            self.output_dir,
+            movie_path=PathTemplate("{year}/{title}.{ext}", MOVIE_FIELDS),
+        )
+        file_path = Path(self.input_path, "Movie.Name.2021.1080p.mkv")
+        file_info = media_scan.interpreter.interpret(file_path.name)
+        self.assertEqual(
+            media_scan._get_new_path(file_path, file_info),
+            Path(self.output_dir, "Movies", "2021", "Movie Name.mkv"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import json
+import re
+
+from src.mediascan.interpreter import Interpreter
+from src.mediascan.tokenizer import MetadataTokenizer
+
+
+class TestMetadataTokenizer(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = Interpreter()
+        self.tokenizer = self.interpreter.tokenizer
+
+    def assertSameAsPerPattern(self, tokenizer, name):
+        expected = {}
+        for category, pattern in tokenizer.patterns.items():
+            match = pattern.search(name)
+            expected[category] = (
+                (match.group(), match.start()) if match else None
+            )
+        self.assertEqual(tokenizer.search(name), expected, name)
+
+    def test_examples_match_per_pattern_search(self):
+        with open("tests/examples.jsonl", "r") as f:
+            for line in f:
+                self.assertSameAsPerPattern(
+                    self.tokenizer, json.loads(line)["name"]
+                )
+
+    def test_overlapping_tokens(self):
+        for name in [
+            "Movie.2020.DTS-HD.HDTS",
+            "Movie.2020.MPEG-4K",
+            "Movie 2020 proper PROPER 1080p",
+            "Movie_2020_DD5.1_DDP5.1",
+            "Movie.2020.WEB-DL.TS",
+            "Movie.2020.x264-AAC",
+        ]:
+            self.assertSameAsPerPattern(self.tokenizer, name)
+
+    def test_complex_patterns_are_searched_separately(self):
+        tokenizer = MetadataTokenizer(
+            {
+                "resolution": self.interpreter.resolution_pattern,
+                "hdr": re.compile(r"\b(HDR(?:10)?\+?)\b", re.IGNORECASE),
+            }
+        )
+        self.assertEqual(tokenizer.separate, ["hdr"])
+        self.assertSameAsPerPattern(tokenizer, "Movie.2020.2160p.HDR10")
+
+    def test_find_metadata(self):
+        metadata = self.interpreter.find_metadata(
+            "The.Matrix.1999.REPACK.1080p.BluRay.DTS.x264-GROUP"
+        )
+        self.assertEqual(
+            metadata["source"],
+            {"value": "bluray", "raw": "BluRay", "index": 29},
+        )
+        self.assertEqual(metadata["proper"]["value"], True)
+        self.assertEqual(metadata["language"]["value"], None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src.mediascan.transfer import BandwidthLimiter, TransferScheduler
+
+
+class TestTransferScheduler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.destination = Path(self.temp_dir) / "Movies" / "Movie.mkv"
+        self.device = os.stat(self.temp_dir).st_dev
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.order = []
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def transfer(self, name, duration):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(duration)
+        with self.lock:
+            self.running -= 1
+            self.order.append(name)
+        return name
+
+    def test_limits_transfers_per_device(self):
+        scheduler = TransferScheduler(workers=4, per_device=2)
+        futures = [
+            scheduler.submit(
+                1, self.device, self.destination, self.transfer, i, 0.05
+            )
+            for i in range(6)
+        ]
+        scheduler.shutdown()
+        self.assertEqual([f.result() for f in futures], list(range(6)))
+        self.assertEqual(self.peak, 2)
+
+    def test_small_files_pass_large_ones(self):
+        scheduler = TransferScheduler(
+            workers=2, per_device=2, large_file_size=100
+        )
+        large = scheduler.submit(
+            1000, self.device, self.destination, self.transfer, "large", 0.3
+        )
+        small = [
+            scheduler.submit(
+                10, self.device, self.destination, self.transfer, i, 0.01
+            )
+            for i in range(5)
+        ]
+        scheduler.shutdown()
+        self.assertEqual(large.result(), "large")
+        self.assertEqual([f.result() for f in small], list(range(5)))
+        self.assertEqual(self.order[-1], "large")
+
+    def test_errors_are_returned(self):
+        def fail():
+            raise OSError("No space left on device")
+
+        scheduler = TransferScheduler()
+        future = scheduler.submit(1, self.device, self.destination, fail)
+        scheduler.shutdown()
+        self.assertIsInstance(future.exception(), OSError)
+        self.assertEqual(scheduler.pending(), (0, 0))
+
+
+class TestBandwidthLimiter(unittest.TestCase):
+    def test_limits_rate(self):
+        limiter = BandwidthLimiter(1000, burst=100)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.consume(100)
+        # The burst is free, the other 400 bytes take 0.4 seconds
+        self.assertGreaterEqual(time.monotonic() - start, 0.35)
+
+    def test_rejects_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            BandwidthLimiter(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
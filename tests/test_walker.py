@@ -0,0 +1,98 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.mediascan.walker import (
+    FileRecord,
+    split_extension,
+    walk,
+    walk_roots,
+)
+
+
+class TestWalker(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in [
+            "b.mkv",
+            "a.mp4",
+            "notes.txt",
+            "Show/Season 1/Show.S01E01.mkv",
+            "Show/cover.jpg",
+        ]:
+            path = Path(self.temp_dir) / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * len(name))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def relative(self, records):
+        return [
+            os.path.relpath(record.path, self.temp_dir) for record in records
+        ]
+
+    def test_walk_all_files_sorted(self):
+        self.assertEqual(
+            self.relative(walk(self.temp_dir)),
+            [
+                "a.mp4",
+                "b.mkv",
+                "notes.txt",
+                "Show/cover.jpg",
+                "Show/Season 1/Show.S01E01.mkv",
+            ],
+        )
+
+    def test_walk_filters_extensions(self):
+        records = list(walk(self.temp_dir, {"mkv", "mp4"}))
+        self.assertEqual(
+            self.relative(records),
+            ["a.mp4", "b.mkv", "Show/Season 1/Show.S01E01.mkv"],
+        )
+
+        record = records[0]
+        self.assertIsInstance(record, FileRecord)
+        st = os.stat(record.path)
+        self.assertEqual(record.size, st.st_size)
+        self.assertEqual(record.mtime, st.st_mtime_ns)
+        self.assertEqual(record.inode, st.st_ino)
+        self.assertEqual(record.device, st.st_dev)
+
+    def test_walk_does_not_follow_directory_symlinks(self):
+        os.symlink(
+            os.path.join(self.temp_dir, "Show"),
+            os.path.join(self.temp_dir, "Link"),
+        )
+        self.assertNotIn("Link/cover.jpg", self.relative(walk(self.temp_dir)))
+
+    def test_walk_roots(self):
+        roots = [self.temp_dir, os.path.join(self.temp_dir, "Show")]
+        for batch_size in [1, 256]:
+            records = list(walk_roots(roots, {"mkv"}, batch_size))
+            self.assertEqual(
+                sorted(self.relative(records)),
+                [
+                    "Show/Season 1/Show.S01E01.mkv",
+                    "Show/Season 1/Show.S01E01.mkv",
+                    "b.mkv",
+                ],
+            )
+            self.assertIsInstance(records[0], FileRecord)
+
+    def test_walk_roots_closed_early(self):
+        roots = [self.temp_dir, self.temp_dir]
+        records = walk_roots(roots, batch_size=1)
+        next(records)
+        records.close()
+
+    def test_split_extension(self):
+        self.assertEqual(split_extension("Movie.2020.MKV"), "mkv")
+        self.assertEqual(split_extension("README"), "")
+        self.assertEqual(split_extension(".hidden"), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
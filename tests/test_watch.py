@@ -0,0 +1,121 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from src.mediascan.config import Config
+from src.mediascan.mediascan import MediaScan
+from src.mediascan.watch import PollingBackend, Watcher
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.temp_dir, "input")
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        os.makedirs(self.input_path)
+        os.makedirs(self.output_dir)
+
+        self.media_scan = MediaScan(
+            input_path=self.input_path,
+            output_dir=self.output_dir,
+            min_video_size=0,
+            min_audio_size=0,
+        )
+        self.destination = os.path.join(
+            self.output_dir,
+            Config.MOVIES_DIR,
+            "The Matrix (1999)",
+            "The Matrix (1999) [1080p].mkv",
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _watch(self, backend):
+        watcher = Watcher(
+            self.media_scan,
+            settle_time=0.2,
+            poll_interval=0.05,
+            backend=backend,
+        )
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        return stop, thread
+
+    def _wait_for(self, path, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.exists(path):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _organizes_new_files(self, backend):
+        stop, thread = self._watch(backend)
+        try:
+            time.sleep(0.2)
+            subdirectory = os.path.join(
+                self.input_path, "The.Matrix.1999.1080p.BluRay"
+            )
+            os.makedirs(subdirectory)
+            source = os.path.join(
+                subdirectory, "The.Matrix.1999.1080p.BluRay.mkv"
+            )
+            with open(source, "wb") as f:
+                f.write(b"\0" * 1024)
+            with open(os.path.join(subdirectory, "notes.txt"), "w") as f:
+                f.write("ignored")
+
+            self.assertTrue(self._wait_for(self.destination))
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_polling_backend(self):
+        self._organizes_new_files("poll")
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "requires Linux")
+    def test_inotify_backend(self):
+        self._organizes_new_files("inotify")
+
+    def test_waits_for_file_to_settle(self):
+        watcher = Watcher(self.media_scan, settle_time=0.1)
+        path = os.path.join(self.input_path, "Movie.2001.mkv")
+        with open(path, "wb") as f:
+            f.write(b"\0")
+        watcher._changed(path)
+
+        # First check records the size, a later one confirms it is stable
+        time.sleep(0.15)
+        self.assertEqual(watcher._ready(), [])
+        with open(path, "ab") as f:
+            f.write(b"\0")
+        time.sleep(0.15)
+        self.assertEqual(watcher._ready(), [])
+        time.sleep(0.15)
+        self.assertEqual([r.path for r in watcher._ready()], [path])
+
+    def test_polling_backend_reports_only_changes(self):
+        path = os.path.join(self.input_path, "Movie.2001.mkv")
+        with open(path, "wb") as f:
+            f.write(b"\0")
+        backend = PollingBackend(self.input_path)
+        self.assertEqual(backend.poll(0), set())
+
+        other = os.path.join(self.input_path, "Movie.2002.mkv")
+        with open(other, "wb") as f:
+            f.write(b"\0")
+        self.assertEqual(backend.poll(0), {other})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Watcher(self.media_scan, backend="kqueue")
+
+
+if __name__ == "__main__":
+    unittest.main()